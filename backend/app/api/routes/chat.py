@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import List
 from app.models.chat import ChatRequest, ChatResponse, ChatSession
 from app.services.chat_service import ChatService
+from app.api.streaming import ndjson_response
 import uuid
 
 router = APIRouter()
@@ -24,6 +25,19 @@ async def send_message(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/message/stream")
+async def stream_message(request: ChatRequest, http_request: Request):
+    if not request.session_id:
+        request.session_id = str(uuid.uuid4())
+    
+    frames = chat_service.stream_message(
+        message=request.message,
+        session_id=request.session_id,
+        context=request.context
+    )
+    
+    return ndjson_response(http_request, frames)
+
 @router.get("/sessions", response_model=List[str])
 async def get_sessions():
     try:
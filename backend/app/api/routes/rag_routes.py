@@ -1,17 +1,32 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Body
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Body, Request
+from typing import Optional, Dict, Any, List
 from app.models.rag_models import (
-    DocumentUploadResponse,
+    IngestionJob,
+    JobSubmitResponse,
+    BatchPathRequest,
+    ReindexRequest,
     QueryRequest,
+    RetrievalFilters,
     QueryResponse,
     SearchRequest,
     SearchResult,
     ConversationHistory,
     DocumentDeleteRequest,
-    StatusResponse
+    DocumentsDeleteRequest,
+    DocumentsDeleteResponse,
+    DocumentList,
+    StatusResponse,
+    CollectionCreateRequest,
+    CollectionInfo
 )
 from app.core.rag import RAGService
-from app.config import settings
+from app.core.rag.jobs import JobQueueFullError, ACTIVE_JOB_STATES
+from app.core.rag.batch_ingest import resolve_batch_path
+from app.core.rag.executor import executor
+from app.core.rag.filters import build_where
+from app.core.rag.collection_pool import CollectionNotFoundError, validate_collection_id
+from app.api.streaming import ndjson_response
+from app.api.uploads import read_pdf_upload, read_pdf_uploads, PDF_UPLOAD_OPENAPI, BATCH_UPLOAD_OPENAPI
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,66 +35,219 @@ router = APIRouter(prefix="/rag", tags=["RAG"])
 rag_service = RAGService()
 
 
-@router.post("/upload", response_model=DocumentUploadResponse)
+@router.post("/upload", response_model=JobSubmitResponse, status_code=202, openapi_extra=PDF_UPLOAD_OPENAPI)
 async def upload_document(
-    file: UploadFile = File(...),
-    metadata: Optional[str] = None
+    request: Request,
+    metadata: Optional[str] = None,
+    collection_id: Optional[str] = None
 ):
     try:
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are supported")
+        # The body is parsed as it arrives, so oversized or non-PDF uploads are rejected before being buffered;
+        # the file is written once, straight to the job payload
+        staging = await rag_service.jobs.new_staging_file()
+        submitted = False
+        try:
+            upload = await read_pdf_upload(request, staging)
+            file_size = upload.size_mb
+            metadata = metadata or upload.fields.get("metadata")
+            collection_id = _collection_id(collection_id or upload.fields.get("collection_id"))
+            
+            # Parsing and embedding happen on the ingestion workers; poll /rag/jobs/{job_id} for progress
+            job = await rag_service.jobs.submit_pdf(
+                staging,
+                file_name=upload.filename,
+                metadata={"file_size_mb": file_size} if not metadata else {"file_size_mb": file_size, "custom": metadata},
+                document_id=upload.sha256,
+                collection_id=collection_id
+            )
+            submitted = True
+        finally:
+            if not submitted:
+                await rag_service.jobs.discard_staging(staging)
         
-        file_size = 0
-        contents = await file.read()
-        file_size = len(contents) / (1024 * 1024)  # Convert to MB
+        return _job_submitted(job)
         
-        if file_size > settings.MAX_FILE_SIZE_MB:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE_MB}MB"
+    except HTTPException:
+        raise
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to upload document: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch/upload", response_model=JobSubmitResponse, status_code=202, openapi_extra=BATCH_UPLOAD_OPENAPI)
+async def upload_batch(
+    request: Request,
+    metadata: Optional[str] = None,
+    collection_id: Optional[str] = None
+):
+    try:
+        # Files are staged on disk as they arrive and ingested together by one job
+        staging = await rag_service.jobs.new_staging_directory()
+        submitted = False
+        try:
+            uploads, fields = await read_pdf_uploads(request, staging)
+            metadata = metadata or fields.get("metadata")
+            collection_id = _collection_id(collection_id or fields.get("collection_id"))
+            
+            job = await rag_service.jobs.submit_batch(
+                staging,
+                file_name=f"{len(uploads)} uploaded files",
+                metadata={"custom": metadata} if metadata else None,
+                collection_id=collection_id
             )
+            submitted = True
+        finally:
+            if not submitted:
+                await rag_service.jobs.discard_staging(staging)
+        
+        return _job_submitted(job)
         
-        result = rag_service.process_pdf_file(
-            file_content=contents,
-            file_name=file.filename,
-            metadata={"file_size_mb": file_size} if not metadata else {"file_size_mb": file_size, "custom": metadata}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to upload batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch/path", response_model=JobSubmitResponse, status_code=202)
+async def ingest_batch_path(request: BatchPathRequest):
+    try:
+        collection_id = _collection_id(request.collection_id)
+        path = await executor.run_io(resolve_batch_path, request.path)
+        job = await rag_service.jobs.submit_batch(
+            path,
+            file_name=request.path,
+            metadata={"custom": request.metadata} if request.metadata else None,
+            collection_id=collection_id
         )
         
-        return DocumentUploadResponse(**result)
+        return _job_submitted(job)
         
     except HTTPException:
         raise
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Failed to upload document: {e}")
+        logger.error(f"Failed to queue batch from {request.path}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs", response_model=List[IngestionJob])
+async def list_jobs(limit: int = 50, status: Optional[str] = None):
+    try:
+        return await rag_service.jobs.list(limit=limit, status=status)
+        
+    except Exception as e:
+        logger.error(f"Failed to list ingestion jobs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJob)
+async def get_job(job_id: str):
+    try:
+        job = await rag_service.jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return job
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get ingestion job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IngestionJob)
+async def cancel_job(job_id: str):
+    try:
+        job = await rag_service.jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] not in ACTIVE_JOB_STATES:
+            raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+        
+        return await rag_service.jobs.cancel(job_id)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to cancel ingestion job: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/query", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
     try:
-        result = rag_service.query_documents(
+        result = await rag_service.aquery_documents(
             question=request.question,
             session_id=request.session_id,
-            use_conversation=request.use_conversation
+            use_conversation=request.use_conversation,
+            k=request.k,
+            filter=_where(request.filters),
+            collection_id=_collection_id(request.collection_id)
         )
         
+        if not request.include_timings:
+            result = {**result, "timings": None}
         return QueryResponse(**result)
         
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
     except Exception as e:
         logger.error(f"Failed to query documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/query/stream")
+async def stream_query_documents(request: QueryRequest, http_request: Request):
+    # Checked up front, as errors raised once the stream has started can only be sent as an error frame
+    collection_id = _collection_id(request.collection_id)
+    if collection_id and not rag_service.vector_store_manager.collection_exists(collection_id):
+        raise _collection_not_found(CollectionNotFoundError(collection_id))
+    
+    frames = rag_service.astream_query(
+        question=request.question,
+        session_id=request.session_id,
+        use_conversation=request.use_conversation,
+        k=request.k,
+        filter=_where(request.filters),
+        collection_id=collection_id
+    )
+    
+    return ndjson_response(http_request, frames)
+
+
 @router.post("/search")
 async def search_documents(request: SearchRequest):
     try:
-        results = rag_service.search_similar_documents(
+        results = await rag_service.asearch_similar_documents(
             query=request.query,
-            k=request.k
+            k=request.k,
+            filter=_where(request.filters),
+            collection_id=_collection_id(request.collection_id)
         )
         
         return results
         
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
     except Exception as e:
         logger.error(f"Failed to search documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -114,18 +282,63 @@ async def clear_conversation(session_id: str):
 @router.delete("/document")
 async def delete_document(request: DocumentDeleteRequest):
     try:
-        result = rag_service.delete_document(request.document_id)
+        result = await rag_service.executor.run_io(
+            rag_service.delete_document,
+            request.document_id,
+            _collection_id(request.collection_id)
+        )
         return result
         
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
     except Exception as e:
         logger.error(f"Failed to delete document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/documents", response_model=DocumentList)
+async def list_documents(collection_id: Optional[str] = None, limit: int = 100, offset: int = 0):
+    try:
+        return await rag_service.executor.run_io(
+            rag_service.list_documents,
+            _collection_id(collection_id),
+            max(1, min(limit, 1000)),
+            max(0, offset)
+        )
+        
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
+    except Exception as e:
+        logger.error(f"Failed to list documents: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/documents/delete", response_model=DocumentsDeleteResponse)
+async def delete_documents(request: DocumentsDeleteRequest):
+    try:
+        return await rag_service.executor.run_io(
+            rag_service.delete_documents,
+            request.document_ids,
+            _collection_id(request.collection_id)
+        )
+        
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
+    except Exception as e:
+        logger.error(f"Failed to delete documents: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/documents/all")
 async def clear_all_documents():
     try:
-        result = rag_service.clear_all_documents()
+        result = await rag_service.executor.run_io(rag_service.clear_all_documents)
         return result
         
     except Exception as e:
@@ -133,10 +346,93 @@ async def clear_all_documents():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/compact")
+async def compact_storage():
+    try:
+        return await rag_service.executor.run_io(rag_service.compact)
+        
+    except Exception as e:
+        logger.error(f"Failed to compact storage: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/reindex", response_model=JobSubmitResponse, status_code=202)
+async def reindex_collection(request: ReindexRequest = Body(default_factory=ReindexRequest)):
+    try:
+        collection_id = _collection_id(request.collection_id)
+        if collection_id and not rag_service.vector_store_manager.collection_exists(collection_id):
+            raise _collection_not_found(CollectionNotFoundError(collection_id))
+        
+        job = await rag_service.jobs.submit_reindex(collection_id, force=request.force)
+        return _job_submitted(job)
+        
+    except HTTPException:
+        raise
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue re-index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collections")
+async def list_collections():
+    try:
+        return rag_service.list_collections()
+        
+    except Exception as e:
+        logger.error(f"Failed to list collections: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/collections", response_model=CollectionInfo, status_code=201)
+async def create_collection(request: CollectionCreateRequest):
+    try:
+        collection_id = _collection_id(request.collection_id)
+        if rag_service.vector_store_manager.collection_exists(collection_id):
+            raise HTTPException(status_code=409, detail=f"Collection {collection_id} already exists")
+        
+        return await rag_service.executor.run_io(rag_service.create_collection, collection_id)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to create collection: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/collection/{collection_id}/info", response_model=CollectionInfo)
+async def get_collection_info(collection_id: str):
+    try:
+        return await rag_service.executor.run_io(rag_service.get_collection_info, _collection_id(collection_id))
+        
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
+    except Exception as e:
+        logger.error(f"Failed to get collection info: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/collection/{collection_id}")
+async def delete_collection(collection_id: str):
+    try:
+        return await rag_service.executor.run_io(rag_service.delete_collection, _collection_id(collection_id))
+        
+    except HTTPException:
+        raise
+    except CollectionNotFoundError as e:
+        raise _collection_not_found(e)
+    except Exception as e:
+        logger.error(f"Failed to delete collection: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/status", response_model=StatusResponse)
 async def get_rag_status():
     try:
-        stats = rag_service.get_stats()
+        stats = await rag_service.executor.run_io(rag_service.get_stats)
         return StatusResponse(**stats)
         
     except Exception as e:
@@ -148,17 +444,66 @@ async def get_rag_status():
 async def process_text(
     text: str = Body(...),
     source: str = Body(...),
-    metadata: Optional[Dict[str, Any]] = Body(None)
+    metadata: Optional[Dict[str, Any]] = Body(None),
+    background: bool = Body(False),
+    collection_id: Optional[str] = Body(None)
 ):
     try:
-        result = rag_service.process_text(
+        collection_id = _collection_id(collection_id)
+        if background:
+            job = await rag_service.jobs.submit_text(
+                text=text,
+                source=source,
+                metadata=metadata,
+                collection_id=collection_id
+            )
+            return _job_submitted(job)
+        
+        result = await rag_service.aprocess_text(
             text=text,
             source=source,
-            metadata=metadata
+            metadata=metadata,
+            collection_id=collection_id
         )
         
         return result
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to process text: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _where(filters: Optional[RetrievalFilters]) -> Optional[Dict[str, Any]]:
+    if filters is None:
+        return None
+    return build_where(filters.document_ids, filters.sources, filters.page_from, filters.page_to)
+
+
+def _collection_id(collection_id: Optional[str]) -> Optional[str]:
+    if collection_id is None:
+        return None
+    try:
+        return validate_collection_id(collection_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _collection_not_found(e: CollectionNotFoundError) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"Collection {e.args[0]} not found")
+
+
+def _job_submitted(job: Dict[str, Any]) -> JobSubmitResponse:
+    return JobSubmitResponse(
+        success=True,
+        message=f"Queued {job['file_name']} for processing",
+        job_id=job["job_id"],
+        status=job["status"],
+        document_id=job["document_id"],
+        collection_id=job.get("collection_id")
+    )
@@ -0,0 +1,31 @@
+from typing import Any, AsyncIterator, Dict
+from contextlib import aclosing
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_response(request: Request, frames: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    async def body():
+        # Closing the frame generator closes the upstream LLM stream, so abandoned requests stop spending tokens
+        async with aclosing(frames):
+            try:
+                async for frame in frames:
+                    if await request.is_disconnected():
+                        logger.info("Client disconnected, cancelling stream")
+                        return
+                    yield json.dumps(frame, default=str) + "\n"
+            except Exception as e:
+                logger.error(f"Stream failed: {e}")
+                yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(
+        body(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
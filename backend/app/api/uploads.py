@@ -0,0 +1,231 @@
+from typing import Dict, List, Optional, BinaryIO, Callable, Tuple
+from fastapi import HTTPException, Request
+import hashlib
+import os
+import logging
+from app.config import settings
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+PDF_MAGIC = b"%PDF"
+MAX_FIELD_BYTES = 64 * 1024
+# Boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+PDF_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+BATCH_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                    "required": ["files"]
+                }
+            }
+        }
+    }
+}
+
+
+class StagedUpload:
+    # Written straight to its own file as it streams in; the file becomes the ingestion job's payload
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.file: BinaryIO = open(path, "wb")
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+        self.fields: Dict[str, str] = {}
+        self._sha256 = hashlib.sha256()
+        self._head = b""
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def is_pdf(self) -> bool:
+        return self._head == PDF_MAGIC
+
+    @property
+    def size_mb(self) -> float:
+        return self.size / (1024 * 1024)
+
+    def write(self, data: bytes):
+        if len(self._head) < len(PDF_MAGIC):
+            self._head += data[:len(PDF_MAGIC) - len(self._head)]
+            if len(self._head) == len(PDF_MAGIC) and self._head != PDF_MAGIC:
+                raise HTTPException(status_code=400, detail="File is not a valid PDF")
+
+        self.file.write(data)
+        self._sha256.update(data)
+
+    def close(self):
+        self.file.close()
+
+
+async def read_pdf_upload(
+    request: Request,
+    path: str,
+    field_name: str = "file",
+    max_bytes: Optional[int] = None
+) -> StagedUpload:
+    max_bytes = max_bytes or settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+    def open_upload(uploads: List[StagedUpload], filename: str) -> StagedUpload:
+        if uploads:
+            raise HTTPException(status_code=400, detail="Only one file can be uploaded per request")
+        return StagedUpload(path)
+
+    uploads, fields = await _read_multipart(request, field_name, open_upload, max_bytes, max_bytes)
+    upload = uploads[0]
+    upload.close()
+    upload.fields = fields
+    return upload
+
+
+async def read_pdf_uploads(
+    request: Request,
+    directory: str,
+    field_name: str = "files",
+    max_files: Optional[int] = None,
+    max_bytes: Optional[int] = None
+) -> Tuple[List[StagedUpload], Dict[str, str]]:
+    max_files = max_files or settings.BATCH_INGEST_MAX_FILES
+    max_bytes = max_bytes or settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+    def open_upload(uploads: List[StagedUpload], filename: str) -> StagedUpload:
+        if len(uploads) >= max_files:
+            raise HTTPException(status_code=400, detail=f"At most {max_files} files can be uploaded per batch")
+        # One subdirectory per file, so two papers with the same name do not collide
+        name = os.path.basename(filename.replace("\\", "/")).lstrip(".")
+        if not name.lower().endswith(".pdf"):
+            name = "upload.pdf"
+        return StagedUpload(os.path.join(directory, str(len(uploads)), name))
+
+    uploads, fields = await _read_multipart(request, field_name, open_upload, max_bytes, max_bytes * max_files)
+    for upload in uploads:
+        upload.close()
+    return uploads, fields
+
+
+async def _read_multipart(
+    request: Request,
+    field_name: str,
+    open_upload: Callable[[List[StagedUpload], str], StagedUpload],
+    max_bytes: int,
+    max_body_bytes: int
+) -> Tuple[List[StagedUpload], Dict[str, str]]:
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE_MB}MB"
+    )
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise too_large
+
+    uploads: List[StagedUpload] = []
+    fields: Dict[str, str] = {}
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "name": None, "upload": None, "field": b""}
+
+    def on_part_begin():
+        state.update(headers={}, name=None, upload=None, field=b"")
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        state["name"] = name
+
+        if name == field_name and filename is not None:
+            filename = filename.decode("utf-8", "replace")
+            if not filename.lower().endswith(".pdf"):
+                raise HTTPException(status_code=400, detail="Only PDF files are supported")
+            upload = open_upload(uploads, filename)
+            uploads.append(upload)
+            upload.filename = filename
+            upload.content_type = state["headers"].get(b"content-type", b"").decode("latin-1")
+            state["upload"] = upload
+
+    def on_part_data(data: bytes, start: int, end: int):
+        upload = state["upload"]
+        if upload is not None:
+            upload.size += end - start
+            if upload.size > max_bytes:
+                raise too_large
+            upload.write(data[start:end])
+        else:
+            state["field"] += data[start:end]
+            if len(state["field"]) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=400, detail="Form field too large")
+
+    def on_part_end():
+        upload = state["upload"]
+        if upload is not None:
+            if not upload.is_pdf:
+                raise HTTPException(status_code=400, detail=f"File is not a valid PDF: {upload.filename}")
+        elif state["name"]:
+            fields[state["name"]] = state["field"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+
+        if not uploads:
+            raise HTTPException(status_code=400, detail=f"Missing '{field_name}' file field")
+
+        return uploads, fields
+    except Exception:
+        for upload in uploads:
+            upload.close()
+        raise
@@ -13,21 +13,127 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    OPENAI_EMBEDDING_BASE_URL: Optional[str] = None
+    
+    # Model Providers ("openai", or "fake" for offline benchmarks)
+    EMBEDDING_PROVIDER: str = "openai"
+    LLM_PROVIDER: str = "openai"
+    FAKE_EMBEDDING_DIMENSIONS: int = 384
     
     # Chroma Configuration
     CHROMA_PERSIST_DIRECTORY: str = "./chroma_db"
     CHROMA_COLLECTION_NAME: str = "research_papers"
     
-    # Document Processing
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
+    # Collections (one index per project or session; CHROMA_COLLECTION_NAME is the default one)
+    MAX_OPEN_COLLECTIONS: int = 32
+    
+    # Deletion and Compaction (the document registry defaults to <CHROMA_PERSIST_DIRECTORY>/document_registry.sqlite3)
+    DOCUMENT_REGISTRY_PATH: Optional[str] = None
+    DELETE_BATCH_SIZE: int = 500
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_MIN_DELETED_CHUNKS: int = 1000
+    COMPACTION_DELAY_SECONDS: float = 30.0
+    
+    # Vector Backend ("chroma", "numpy" for the in-process memory-mapped index, or "ivf" for ANN search over it)
+    VECTOR_BACKEND: str = "chroma"
+    NUMPY_INDEX_DIRECTORY: Optional[str] = None
+    NUMPY_INDEX_DTYPE: str = "float32"
+    NUMPY_SEARCH_BLOCK_ROWS: int = 8192
+    
+    # IVF Index (VECTOR_BACKEND="ivf"; brute force until IVF_TRAIN_MIN_VECTORS chunks are stored)
+    IVF_NLIST: int = 1024
+    IVF_NPROBE: int = 16
+    IVF_TRAIN_MIN_VECTORS: int = 50000
+    IVF_TRAIN_SAMPLE: int = 100000
+    IVF_KMEANS_ITERATIONS: int = 10
+    IVF_RETRAIN_GROWTH: float = 4.0
+    IVF_COMPACTION_TOMBSTONE_RATIO: float = 0.2
+    
+    # Embedding Engine
+    EMBEDDING_BATCH_MAX_TOKENS: int = 20000
+    EMBEDDING_BATCH_MAX_SIZE: int = 256
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 6
+    EMBEDDING_BACKOFF_BASE_SECONDS: float = 1.0
+    EMBEDDING_BACKOFF_MAX_SECONDS: float = 60.0
+    
+    # Embedding Cache
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+    
+    # Page Text Cache (extracted text kept so documents can be re-chunked without the original file)
+    PAGE_TEXT_CACHE_ENABLED: bool = True
+    PAGE_TEXT_CACHE_PATH: Optional[str] = None
+    
+    # Document Processing (CHUNK_SIZE and CHUNK_OVERLAP are counted in CHUNK_UNIT, "tokens" or "characters")
+    CHUNK_SIZE: int = 256
+    CHUNK_OVERLAP: int = 48
+    CHUNK_UNIT: str = "tokens"
     MAX_FILE_SIZE_MB: int = 50
+    INGEST_BATCH_CHUNKS: int = 64
+    INGEST_PREFETCH_BATCHES: int = 2
+    
+    # Ingestion Jobs (state defaults to <CHROMA_PERSIST_DIRECTORY>/ingest_jobs.sqlite3)
+    INGEST_JOB_WORKERS: int = 2
+    INGEST_JOB_QUEUE_SIZE: int = 100
+    INGEST_JOB_DB_PATH: Optional[str] = None
     
-    # RAG Configuration
-    MAX_CONTEXT_LENGTH: int = 4000
+    # Batch Ingestion (server-side directory and ZIP paths must be under BATCH_INGEST_ROOT; unset disables them)
+    BATCH_INGEST_ROOT: Optional[str] = None
+    BATCH_INGEST_MAX_FILES: int = 500
+    BATCH_INGEST_WRITE_CHUNKS: int = 1024
+    
+    # RAG Configuration (the model window is split between history, retrieved chunks and the answer)
+    MAX_CONTEXT_LENGTH: int = 8192
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    ANSWER_MAX_TOKENS: int = 1024
     TOP_K_RESULTS: int = 5
     TEMPERATURE: float = 0.7
     
+    # Follow-up Questions ("auto" condenses only questions that look like follow-ups, "always" or "never")
+    CONDENSE_MODE: str = "auto"
+    CONDENSE_MODEL: Optional[str] = None
+    CONDENSE_MAX_TOKENS: int = 128
+    
+    # Hybrid Retrieval (BM25 index defaults to <CHROMA_PERSIST_DIRECTORY>/lexical_index.sqlite3)
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    LEXICAL_INDEX_PATH: Optional[str] = None
+    
+    # Reranking ("lexical", "cross-encoder" for a local sentence-transformers model, or "none")
+    RERANKER: str = "lexical"
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_DEDUPE_THRESHOLD: float = 0.8
+    
+    # Query Caches
+    QUERY_EMBEDDING_CACHE_MAX_MB: int = 64
+    QUERY_RESULT_MEMO_ENABLED: bool = True
+    QUERY_RESULT_MEMO_MAX_ENTRIES: int = 4096
+    
+    # Answer Cache (non-conversational queries)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_SEMANTIC_ENABLED: bool = False
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    
+    # Conversation Memory
+    MEMORY_MAX_SESSIONS: int = 1000
+    MEMORY_SESSION_TTL_SECONDS: int = 3600
+    MEMORY_MAX_TURNS: int = 50
+    MEMORY_HISTORY_TOKEN_BUDGET: int = 1500
+    
+    # Execution Pools
+    IO_POOL_SIZE: int = 16
+    CPU_POOL_SIZE: int = max(1, (os.cpu_count() or 2) - 1)
+    
+    # Metrics (Prometheus text format at /metrics)
+    METRICS_ENABLED: bool = True
+    
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
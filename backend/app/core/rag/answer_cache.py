@@ -0,0 +1,175 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import copy
+import re
+import threading
+import time
+import logging
+import numpy as np
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_question(question: str) -> str:
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", question.strip().lower()))
+
+
+class CachedAnswer:
+    def __init__(
+        self,
+        response: Dict[str, Any],
+        corpus_version: int,
+        embedding: Optional[np.ndarray],
+        collection: Optional[str] = None
+    ):
+        self.response = response
+        self.corpus_version = corpus_version
+        self.embedding = embedding
+        self.collection = collection
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.ANSWER_CACHE_TTL_SECONDS,
+        semantic: bool = settings.ANSWER_CACHE_SEMANTIC_ENABLED,
+        similarity_threshold: float = settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    def get(
+        self,
+        question: str,
+        corpus_version: int,
+        scope: str,
+        embedding: Optional[List[float]] = None
+    ) -> Optional[Dict[str, Any]]:
+        key = (normalize_question(question), scope)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._usable(entry, corpus_version):
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return copy.deepcopy(entry.response)
+
+            if embedding is not None:
+                match = self._nearest(_unit(embedding), corpus_version, scope)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self._stats["semantic_hits"] += 1
+                    return copy.deepcopy(self._entries[match].response)
+
+            # Exact misses that will be retried semantically are only counted once
+            if embedding is not None or not self.semantic:
+                self._stats["misses"] += 1
+            return None
+
+    def put(
+        self,
+        question: str,
+        corpus_version: int,
+        scope: str,
+        response: Dict[str, Any],
+        embedding: Optional[List[float]] = None,
+        collection: Optional[str] = None
+    ):
+        # scope must already tell collections apart; collection only decides which entries a new version retires
+        key = (normalize_question(question), scope)
+        entry = CachedAnswer(
+            copy.deepcopy(response),
+            corpus_version,
+            _unit(embedding) if embedding is not None else None,
+            collection
+        )
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict(corpus_version, collection)
+
+    def invalidate(self, collection: Optional[str] = None):
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if collection is None or entry.collection == collection]
+            if keys:
+                self._stats["invalidations"] += 1
+                logger.info(f"Invalidated {len(keys)} cached answers")
+            for key in keys:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        lookups = hits + stats["misses"]
+        stats.update({
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic": self.semantic,
+            "similarity_threshold": self.similarity_threshold,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        })
+        return stats
+
+    def _usable(self, entry: CachedAnswer, corpus_version: int) -> bool:
+        return entry.corpus_version == corpus_version and not self._expired(entry)
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry.created_at > self.ttl_seconds
+
+    def _nearest(self, embedding: np.ndarray, corpus_version: int, scope: str) -> Optional[Tuple[str, str]]:
+        candidates = [
+            (key, entry.embedding)
+            for key, entry in self._entries.items()
+            if key[1] == scope and entry.embedding is not None and self._usable(entry, corpus_version)
+        ]
+        if not candidates:
+            return None
+
+        similarities = np.stack([vector for _, vector in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return candidates[best][0]
+
+    def _evict(self, corpus_version: int, collection: Optional[str]):
+        # Answers from an older version of the collection can never match again, so they go before live LRU entries
+        stale = [
+            key for key, entry in self._entries.items()
+            if (entry.collection == collection and entry.corpus_version != corpus_version) or self._expired(entry)
+        ]
+        for key in stale:
+            del self._entries[key]
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+        self._stats["evictions"] += len(stale)
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,39 @@
+from typing import List, Optional
+from app.config import settings
+from app.core.rag.backends.base import VectorBackend, QueryHit, vacuum_sqlite
+from app.core.rag.backends.chroma_backend import ChromaBackend
+from app.core.rag.backends.numpy_backend import NumpyBackend
+from app.core.rag.backends.ivf_backend import IVFBackend
+
+BACKENDS = {
+    ChromaBackend.name: ChromaBackend,
+    NumpyBackend.name: NumpyBackend,
+    IVFBackend.name: IVFBackend
+}
+
+
+def create_backend(collection_name: Optional[str] = None, name: Optional[str] = None) -> VectorBackend:
+    name = name or settings.VECTOR_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](collection_name)
+
+
+def list_collections(name: Optional[str] = None) -> List[str]:
+    name = name or settings.VECTOR_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name].list_collections()
+
+
+__all__ = [
+    "VectorBackend",
+    "QueryHit",
+    "ChromaBackend",
+    "NumpyBackend",
+    "IVFBackend",
+    "BACKENDS",
+    "create_backend",
+    "list_collections",
+    "vacuum_sqlite"
+]
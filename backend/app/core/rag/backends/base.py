@@ -0,0 +1,84 @@
+from typing import List, Dict, Any, Optional, Tuple
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+
+# (chunk id, text, metadata, squared L2 distance)
+QueryHit = Tuple[str, str, Dict[str, Any], float]
+
+
+class VectorBackend(ABC):
+    # Storage for chunk embeddings behind VectorStoreManager; filters use Chroma's where syntax
+    name = "base"
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        documents: List[str]
+    ):
+        ...
+
+    @abstractmethod
+    def query(self, embedding: List[float], k: int, where: Optional[Dict[str, Any]] = None) -> List[QueryHit]:
+        ...
+
+    @abstractmethod
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include_content: bool = True
+    ) -> Dict[str, List[Any]]:
+        # {"ids": [...], "documents": [...], "metadatas": [...]}; content lists are empty unless requested
+        ...
+
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        # Stored vectors by chunk id, so a re-index can copy chunks it does not need to re-embed
+        ...
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def reset(self):
+        ...
+
+    @abstractmethod
+    def drop(self):
+        ...
+
+    @classmethod
+    def list_collections(cls) -> List[str]:
+        # Names of the collections already stored by this backend
+        return []
+
+    def reclaim_space(self):
+        # Returns disk freed by deletes to the filesystem; run by the background compactor
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "count": self.count()}
+
+    def close(self):
+        pass
+
+
+def vacuum_sqlite(path: str):
+    # From a connection of its own: with WAL, readers on the owner's connection carry on meanwhile
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
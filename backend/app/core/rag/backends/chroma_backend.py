@@ -0,0 +1,114 @@
+from typing import List, Dict, Any, Optional
+import os
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+import logging
+from app.config import settings
+from app.core.rag.backends.base import VectorBackend, QueryHit, vacuum_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, collection_name: Optional[str] = None, persist_directory: Optional[str] = None):
+        self.collection_name = collection_name or settings.CHROMA_COLLECTION_NAME
+        self.persist_directory = persist_directory or settings.CHROMA_PERSIST_DIRECTORY
+        self.client = _client(self.persist_directory)
+        self.collection = self._open_collection()
+        logger.info(f"Opened Chroma collection {self.collection_name} at {self.persist_directory}")
+
+    def _open_collection(self):
+        # No embedding function: vectors always come from the embedding engine
+        return self.client.get_or_create_collection(name=self.collection_name, embedding_function=None)
+
+    @classmethod
+    def list_collections(cls) -> List[str]:
+        # Chroma < 0.6 returns Collection objects, later versions return names
+        collections = _client(settings.CHROMA_PERSIST_DIRECTORY).list_collections()
+        return [getattr(collection, "name", collection) for collection in collections]
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        documents: List[str]
+    ):
+        self.collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def query(self, embedding: List[float], k: int, where: Optional[Dict[str, Any]] = None) -> List[QueryHit]:
+        response = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            (doc_id, text, metadata or {}, distance)
+            for doc_id, text, metadata, distance in zip(
+                response["ids"][0],
+                response["documents"][0],
+                response["metadatas"][0],
+                response["distances"][0]
+            )
+        ]
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include_content: bool = True
+    ) -> Dict[str, List[Any]]:
+        response = self.collection.get(
+            ids=ids,
+            where=where or None,
+            include=["documents", "metadatas"] if include_content else []
+        )
+        return {
+            "ids": response["ids"],
+            "documents": response.get("documents") or [],
+            "metadatas": [metadata or {} for metadata in response.get("metadatas") or []]
+        }
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        if not ids:
+            return {}
+        response = self.collection.get(ids=ids, include=["embeddings"])
+        return {doc_id: list(embedding) for doc_id, embedding in zip(response["ids"], response["embeddings"])}
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def reset(self):
+        self.drop()
+        self.collection = self._open_collection()
+
+    def drop(self):
+        self.client.delete_collection(self.collection_name)
+
+    def reclaim_space(self):
+        # Deleted chunks leave free pages in the SQLite file every collection in the directory shares
+        vacuum_sqlite(os.path.join(self.persist_directory, "chroma.sqlite3"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "count": self.count(),
+            "collection": self.collection_name,
+            "path": self.persist_directory
+        }
+
+
+def _client(persist_directory: str):
+    # Chroma shares one system per settings, so every collection in a directory uses the same client
+    return chromadb.Client(ChromaSettings(
+        is_persistent=True,
+        persist_directory=persist_directory,
+        anonymized_telemetry=False
+    ))
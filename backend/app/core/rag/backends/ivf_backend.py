@@ -0,0 +1,312 @@
+from typing import List, Dict, Any, Optional
+import os
+import threading
+import logging
+import numpy as np
+from app.config import settings
+from app.core.rag.backends.base import QueryHit
+from app.core.rag.backends.numpy_backend import NumpyBackend
+
+logger = logging.getLogger(__name__)
+
+_ASSIGN_BLOCK = 8192
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = vectors[start:start + _ASSIGN_BLOCK]
+        labels[start:start + len(block)] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = nearest_centroids(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+
+        # Empty clusters restart from random points instead of staying dead
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class IVFBackend(NumpyBackend):
+    # Inverted-file ANN on top of the NumPy store: rows are bucketed by nearest k-means centroid and
+    # a query only scores the nprobe closest buckets. Deletes leave tombstones that compaction drops.
+    name = "ivf"
+
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        directory: Optional[str] = None,
+        dtype: Optional[str] = None,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        background: bool = True
+    ):
+        self.nlist = nlist or settings.IVF_NLIST
+        self.nprobe = nprobe or settings.IVF_NPROBE
+        self.train_min_vectors = settings.IVF_TRAIN_MIN_VECTORS
+        self.train_sample = settings.IVF_TRAIN_SAMPLE
+        self.kmeans_iterations = settings.IVF_KMEANS_ITERATIONS
+        self.compaction_ratio = settings.IVF_COMPACTION_TOMBSTONE_RATIO
+        self.retrain_growth = settings.IVF_RETRAIN_GROWTH
+        self.background = background
+        self._generation = 0
+        self._assignments: Optional[np.memmap] = None
+        self._maintenance: Optional[threading.Thread] = None
+        super().__init__(collection_name, directory, dtype)
+
+    def _open(self):
+        super()._open()
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._pending: List[List[int]] = []
+        self._dead = np.zeros(self._capacity, dtype=bool)
+        self._tombstones = 0
+        self._dirty: Optional[List[np.ndarray]] = None
+        self._trained_count = int(self._meta.get("ivf_trained_count", 0))
+        self._needs_reassign = False
+
+        centroids_path = self._path("centroids.npy")
+        if self._dim is not None and os.path.exists(centroids_path):
+            centroids = np.load(centroids_path)
+            if centroids.shape[1] == self._dim:
+                self._centroids = centroids
+                self._rebuild_lists()
+                # Rows written by the plain NumPy backend have no bucket yet
+                self._needs_reassign = self._meta.get("writer") not in (None, self.name) or self._unassigned_rows()
+        self._schedule_maintenance()
+
+    def _row_files(self):
+        return super()._row_files() + [("lists.bin", 4)]
+
+    def _map_files(self):
+        super()._map_files()
+        # Bucket per row, stored as list index + 1 so zero-filled space (a grown file, or an index
+        # first written by the plain NumPy backend) means unassigned
+        with open(self._path("lists.bin"), "ab") as f:
+            if f.tell() < self._capacity * 4:
+                f.truncate(self._capacity * 4)
+        self._assignments = self._map("lists.bin", np.int32, (self._capacity,))
+
+    def _flush(self):
+        super()._flush()
+        if self._assignments is not None:
+            self._assignments.flush()
+
+    def _grow(self, needed: int):
+        super()._grow(needed)
+        self._dead = np.concatenate([self._dead, np.zeros(self._capacity - len(self._dead), dtype=bool)])
+
+    def _reusable_rows(self) -> np.ndarray:
+        # Tombstoned rows may still sit in a bucket, so they are only reused after compaction
+        return ~self._valid[:self._size] & ~self._dead[:self._size]
+
+    def _after_write(self, rows: np.ndarray, vectors: np.ndarray):
+        if self._dirty is not None:
+            self._dirty.append(rows.copy())
+        if self._centroids is None:
+            return
+
+        previous = np.asarray(self._assignments[rows])
+        labels = nearest_centroids(vectors, self._centroids) + 1
+        self._assignments[rows] = labels
+        moved = previous != labels
+        # An updated vector that changed bucket leaves a stale entry behind in the old one
+        self._tombstones += int((moved & (previous > 0)).sum())
+        for row, label in zip(rows[moved].tolist(), labels[moved].tolist()):
+            self._pending[label - 1].append(row)
+
+    def _after_delete(self, rows: List[int]):
+        if not rows:
+            return
+        if self._assignments is not None:
+            self._assignments[rows] = 0
+        self._dead[rows] = True
+        self._tombstones += len(rows)
+        self._schedule_maintenance()
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        super().upsert(ids, embeddings, metadatas, documents)
+        self._schedule_maintenance()
+
+    def query(self, embedding: List[float], k: int, where: Optional[Dict[str, Any]] = None) -> List[QueryHit]:
+        # Filtered searches score only the matching rows exactly, which is already cheap
+        if where or self._centroids is None:
+            return super().query(embedding, k, where)
+
+        query = np.asarray(embedding, dtype=np.float32)
+        candidates = self._candidates(query, k)
+        return self._top_hits(candidates, self._score_rows(candidates, query), k, query)
+
+    def _candidates(self, query: np.ndarray, k: int) -> np.ndarray:
+        with self._lock:
+            centroids = self._centroids
+            order = np.argsort(np.einsum("ij,ij->i", centroids, centroids) - 2 * centroids @ query)
+            nprobe = min(self.nprobe, len(order))
+
+            # Probe more buckets if the nearest ones hold fewer than k live rows
+            while True:
+                probes = order[:nprobe]
+                parts = []
+                for probe in probes.tolist():
+                    if self._pending[probe]:
+                        self._lists[probe] = np.concatenate([self._lists[probe], self._pending[probe]]).astype(np.int64)
+                        self._pending[probe] = []
+                    parts.append(self._lists[probe])
+                rows = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                labels = np.repeat(probes + 1, [len(part) for part in parts])
+                rows = rows[self._assignments[rows] == labels]
+                if len(rows) >= k or nprobe >= len(order):
+                    return rows
+                nprobe = min(nprobe * 2, len(order))
+
+    def _unassigned_rows(self) -> bool:
+        live = np.flatnonzero(self._valid[:self._size])
+        return bool(len(live)) and bool((self._assignments[live] == 0).any())
+
+    def _rebuild_lists(self):
+        live = np.flatnonzero(self._valid[:self._size])
+        labels = np.asarray(self._assignments[live]).astype(np.int64)
+        live, labels = live[labels > 0], labels[labels > 0] - 1
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=len(self._centroids))
+        self._lists = np.split(live[order], np.cumsum(counts)[:-1])
+        self._pending = [[] for _ in range(len(self._centroids))]
+        self._dead[:] = False
+        self._tombstones = 0
+
+    def _schedule_maintenance(self):
+        if not self._maintenance_due():
+            return
+        if not self.background:
+            self.maintain()
+            return
+        if self._maintenance is None or not self._maintenance.is_alive():
+            self._maintenance = threading.Thread(target=self._run_maintenance, name="ivf-maintenance", daemon=True)
+            self._maintenance.start()
+
+    def _maintenance_due(self) -> bool:
+        return self._training_due() or self._compaction_due()
+
+    def _training_due(self) -> bool:
+        if self._dim is None or self._count < self.train_min_vectors:
+            return False
+        if self._centroids is None or self._needs_reassign:
+            return True
+        return self._count >= self.retrain_growth * max(self._trained_count, 1)
+
+    def _compaction_due(self) -> bool:
+        return self._centroids is not None and self._tombstones > self.compaction_ratio * max(self._count, 1)
+
+    def _run_maintenance(self):
+        try:
+            self.maintain()
+        except Exception as e:
+            logger.error(f"IVF maintenance failed for {self.collection_name}: {e}")
+
+    def maintain(self):
+        generation = self._generation
+        while generation == self._generation:
+            if self._training_due():
+                if not self.train():
+                    return
+            elif self._compaction_due():
+                self.compact()
+            else:
+                return
+
+    def train(self) -> bool:
+        with self._lock:
+            generation = self._generation
+            size = self._size
+            live = np.flatnonzero(self._valid[:size])
+            if not len(live):
+                return False
+            self._dirty = []
+
+        try:
+            # Trained on a sample, then every row is bucketed; writes meanwhile are replayed below
+            rng = np.random.default_rng(len(live))
+            sample = np.sort(rng.choice(live, min(self.train_sample, len(live)), replace=False))
+            # Roughly 39 training points per list keeps k-means stable on small collections
+            nlist = max(1, min(self.nlist, len(sample) // 39))
+            centroids = kmeans(self._restore(sample), nlist, self.kmeans_iterations)
+            labels = np.zeros(size, dtype=np.int32)
+            for start in range(0, len(live), _ASSIGN_BLOCK):
+                rows = live[start:start + _ASSIGN_BLOCK]
+                labels[rows] = nearest_centroids(self._restore(rows), centroids) + 1
+
+            with self._lock:
+                if generation != self._generation:
+                    return False
+                self._assignments[:size] = np.where(self._valid[:size], labels, 0)
+                dirty = np.unique(np.concatenate(self._dirty)) if self._dirty else np.empty(0, dtype=np.int64)
+                dirty = dirty[self._valid[dirty]]
+                if len(dirty):
+                    self._assignments[dirty] = nearest_centroids(self._restore(dirty), centroids) + 1
+                self._assignments.flush()
+
+                np.save(self._path("centroids.tmp.npy"), centroids)
+                os.replace(self._path("centroids.tmp.npy"), self._path("centroids.npy"))
+                self._centroids = centroids
+                self._rebuild_lists()
+                self._trained_count = self._count
+                self._needs_reassign = False
+                self._set_meta(ivf_trained_count=self._trained_count, writer=self.name)
+                self._conn.commit()
+                logger.info(
+                    f"Trained IVF index {self.collection_name}: {len(centroids)} lists over {self._count} vectors"
+                )
+                return True
+        finally:
+            with self._lock:
+                self._dirty = None
+
+    def compact(self):
+        with self._lock:
+            if self._centroids is None:
+                return
+            removed = self._tombstones
+            for probe in range(len(self._lists)):
+                rows = np.concatenate([self._lists[probe], self._pending[probe]]).astype(np.int64)
+                self._lists[probe] = rows[self._assignments[rows] == probe + 1]
+                self._pending[probe] = []
+            self._dead[:] = False
+            self._tombstones = 0
+            logger.info(f"Compacted IVF index {self.collection_name} ({removed} tombstones dropped)")
+
+    def reclaim_space(self):
+        if self._tombstones:
+            self.compact()
+        super().reclaim_space()
+
+    def close(self):
+        with self._lock:
+            self._generation += 1
+            super().close()
+            self._assignments = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = super().get_stats()
+            stats.update({
+                "trained": self._centroids is not None,
+                "nlist": len(self._centroids) if self._centroids is not None else self.nlist,
+                "nprobe": self.nprobe,
+                "trained_count": self._trained_count,
+                "tombstones": self._tombstones,
+                "maintenance_running": bool(self._maintenance and self._maintenance.is_alive())
+            })
+            return stats
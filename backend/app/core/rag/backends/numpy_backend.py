@@ -0,0 +1,435 @@
+from typing import List, Dict, Any, Optional, Tuple
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import logging
+import numpy as np
+from app.config import settings
+from app.core.rag.backends.base import VectorBackend, QueryHit, vacuum_sqlite
+
+logger = logging.getLogger(__name__)
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# SQLite's default limit on bound parameters is 999
+_SQL_BATCH = 500
+
+
+def where_to_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    # Translates Chroma's where syntax to SQL over the JSON metadata column
+    clauses: List[str] = []
+    params: List[Any] = []
+
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(item) for item in value]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+
+        field = "json_extract(metadata, ?)"
+        path = '$."' + key.replace('"', '\\"') + '"'
+        conditions = value if isinstance(value, dict) else {"$eq": value}
+        for operator, operand in conditions.items():
+            if operator in ("$in", "$nin"):
+                if not operand:
+                    clauses.append("0" if operator == "$in" else "1")
+                    continue
+                negate = "NOT " if operator == "$nin" else ""
+                clauses.append(f"{field} {negate}IN ({','.join('?' * len(operand))})")
+                params.extend([path, *operand])
+            elif operator in _COMPARISONS:
+                clauses.append(f"{field} {_COMPARISONS[operator]} ?")
+                params.extend([path, operand])
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+
+    return " AND ".join(clauses) or "1", params
+
+
+def index_root(directory: Optional[str] = None) -> str:
+    return directory or settings.NUMPY_INDEX_DIRECTORY or os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "numpy_index")
+
+
+class NumpyBackend(VectorBackend):
+    # Embeddings live in a memory-mapped array; ids, text and metadata in a SQLite sidecar keyed by row
+    name = "numpy"
+
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        directory: Optional[str] = None,
+        dtype: Optional[str] = None,
+        block_rows: Optional[int] = None
+    ):
+        self.collection_name = collection_name or settings.CHROMA_COLLECTION_NAME
+        self.directory = os.path.join(index_root(directory), self.collection_name)
+        self.dtype = dtype or settings.NUMPY_INDEX_DTYPE
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported NUMPY_INDEX_DTYPE {self.dtype!r}, expected one of {sorted(DTYPES)}")
+        self.block_rows = block_rows or settings.NUMPY_SEARCH_BLOCK_ROWS
+        self._lock = threading.RLock()
+        self._open()
+
+    @classmethod
+    def list_collections(cls) -> List[str]:
+        root = index_root()
+        if not os.path.isdir(root):
+            return []
+        return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "index.sqlite3")))
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+        )
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self._meta = meta
+        if meta.get("dtype", self.dtype) != self.dtype:
+            raise ValueError(
+                f"Index at {self.directory} stores {meta['dtype']} vectors but NUMPY_INDEX_DTYPE is {self.dtype}; "
+                f"clear the collection or change the setting back"
+            )
+
+        self._dim = int(meta["dim"]) if "dim" in meta else None
+        self._capacity = int(meta.get("capacity", 0))
+        self._size = int(meta.get("size", 0))
+        self._vectors = self._norms = self._scales = None
+        if self._dim is not None:
+            self._map_files()
+
+        # Rows present in the sidecar are the live ones; vectors are flushed before their rows commit
+        self._valid = np.zeros(self._capacity, dtype=bool)
+        rows = np.fromiter((row for (row,) in self._conn.execute("SELECT row FROM chunks")), dtype=np.int64)
+        self._valid[rows] = True
+        self._count = len(rows)
+        logger.info(f"Opened NumPy index {self.collection_name} ({self._count} vectors, {self.dtype}) at {self.directory}")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _row_files(self) -> List[Tuple[str, int]]:
+        # (file name, bytes per row) for every array that grows with capacity
+        files = [("vectors.bin", np.dtype(DTYPES[self.dtype]).itemsize * self._dim), ("norms.bin", 4)]
+        if self.dtype == "int8":
+            files.append(("scales.bin", 4))
+        return files
+
+    def _map(self, name: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+        return np.memmap(self._path(name), dtype=dtype, mode="r+", shape=shape)
+
+    def _map_files(self):
+        self._vectors = self._map("vectors.bin", DTYPES[self.dtype], (self._capacity, self._dim))
+        self._norms = self._map("norms.bin", np.float32, (self._capacity,))
+        if self.dtype == "int8":
+            self._scales = self._map("scales.bin", np.float32, (self._capacity,))
+
+    def _flush(self):
+        for vector in (self._vectors, self._norms, self._scales):
+            if vector is not None:
+                vector.flush()
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * self._capacity, 1024)
+        self._flush()
+        # Extending the files keeps existing rows; readers holding the old maps still see valid memory
+        for name, row_bytes in self._row_files():
+            with open(self._path(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+
+        self._capacity = capacity
+        self._map_files()
+        self._valid = np.concatenate([self._valid, np.zeros(capacity - len(self._valid), dtype=bool)])
+        self._set_meta(capacity=capacity)
+
+    def _set_meta(self, **values):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()]
+        )
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        if self.dtype == "int8":
+            # Symmetric per-row quantization; the scale restores magnitudes at query time
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            encoded = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            restored = encoded.astype(np.float32) * scales[:, None]
+            return encoded, np.einsum("ij,ij->i", restored, restored), scales.astype(np.float32)
+
+        encoded = vectors.astype(DTYPES[self.dtype])
+        restored = encoded.astype(np.float32)
+        return encoded, np.einsum("ij,ij->i", restored, restored), None
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        documents: List[str]
+    ):
+        if not ids:
+            return
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate ids in a single upsert")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._set_meta(dim=self._dim, dtype=self.dtype)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self._dim}")
+
+            rows = self._assign_rows(ids)
+            if rows.max() >= self._capacity:
+                self._grow(int(rows.max()) + 1)
+
+            encoded, norms, scales = self._encode(vectors)
+            self._vectors[rows] = encoded
+            self._norms[rows] = norms
+            if scales is not None:
+                self._scales[rows] = scales
+            self._after_write(rows, vectors)
+            self._flush()
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (int(row), doc_id, document, json.dumps(metadata or {}))
+                    for row, doc_id, document, metadata in zip(rows, ids, documents, metadatas)
+                ]
+            )
+            self._size = max(self._size, int(rows.max()) + 1)
+            # Lets a subclass that keeps extra per-row state notice rows written by a plain NumPy backend
+            self._set_meta(size=self._size, writer=self.name)
+            self._conn.commit()
+
+            self._count += int((~self._valid[rows]).sum())
+            self._valid[rows] = True
+
+    def _after_write(self, rows: np.ndarray, vectors: np.ndarray):
+        pass
+
+    def _after_delete(self, rows: List[int]):
+        pass
+
+    def _reusable_rows(self) -> np.ndarray:
+        return ~self._valid[:self._size]
+
+    def _free_rows(self, count: int) -> List[int]:
+        # Rows freed by deletes are reused before the array grows
+        return np.flatnonzero(self._reusable_rows())[:count].tolist()
+
+    def _assign_rows(self, ids: List[str]) -> np.ndarray:
+        existing = self._rows_for_ids(ids)
+        new_count = sum(1 for doc_id in ids if doc_id not in existing)
+
+        free = iter(self._free_rows(new_count))
+        next_row = self._size
+        rows = []
+        for doc_id in ids:
+            row = existing.get(doc_id)
+            if row is None:
+                row = next(free, None)
+            if row is None:
+                row = next_row
+                next_row += 1
+            rows.append(row)
+        return np.asarray(rows, dtype=np.int64)
+
+    def _rows_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        found = {}
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            found.update(self._conn.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall())
+        return found
+
+    def query(self, embedding: List[float], k: int, where: Optional[Dict[str, Any]] = None) -> List[QueryHit]:
+        query = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            if not self._count:
+                return []
+            if where:
+                rows = self._rows_where(where)
+            else:
+                size = self._size
+                valid = self._valid[:size].copy()
+
+        if where:
+            return self._top_hits(rows, self._score_rows(rows, query), k, query)
+        return self._top_hits(np.arange(size), self._scan(query, size, valid), k, query)
+
+    def _rows_where(self, where: Dict[str, Any]) -> np.ndarray:
+        sql, params = where_to_sql(where)
+        return np.fromiter(
+            (row for (row,) in self._conn.execute(f"SELECT row FROM chunks WHERE {sql}", params)),
+            dtype=np.int64
+        )
+
+    def _scan(self, query: np.ndarray, size: int, valid: np.ndarray) -> np.ndarray:
+        # Squared L2 like Chroma's default space: |v|^2 - 2 v.q + |q|^2, with |q|^2 added for the final hits only
+        vectors, norms, scales = self._vectors, self._norms, self._scales
+        distances = np.empty(size, dtype=np.float32)
+        for start in range(0, size, self.block_rows):
+            end = min(start + self.block_rows, size)
+            block_scales = scales[start:end] if scales is not None else None
+            distances[start:end] = norms[start:end] - 2 * self._dot(vectors[start:end], query, block_scales)
+        distances[~valid] = np.inf
+        return distances
+
+    def _score_rows(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        vectors, norms, scales = self._vectors, self._norms, self._scales
+        return norms[rows] - 2 * self._dot(vectors[rows], query, scales[rows] if scales is not None else None)
+
+    def _top_hits(self, rows: np.ndarray, distances: np.ndarray, k: int, query: np.ndarray) -> List[QueryHit]:
+        if not len(rows):
+            return []
+        top = min(k, len(distances))
+        best = np.argpartition(distances, top - 1)[:top] if top < len(distances) else np.arange(len(distances))
+        best = best[np.argsort(distances[best])]
+        best = best[np.isfinite(distances[best])]
+        hit_distances = np.maximum(distances[best] + float(query @ query), 0.0)
+        return self._hits(rows[best].tolist(), hit_distances.tolist())
+
+    def _dot(self, vectors: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        if vectors.dtype != np.float32:
+            vectors = vectors.astype(np.float32)
+        dots = vectors @ query
+        return dots * scales if scales is not None else dots
+
+    def _hits(self, rows: List[int], distances: List[float]) -> List[QueryHit]:
+        with self._lock:
+            stored = {
+                row: (doc_id, document, metadata)
+                for row, doc_id, document, metadata in self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(rows))})",
+                    rows
+                )
+            }
+        # A row deleted while the scan ran simply drops out of the results
+        return [
+            (stored[row][0], stored[row][1], json.loads(stored[row][2]), distance)
+            for row, distance in zip(rows, distances)
+            if row in stored
+        ]
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include_content: bool = True
+    ) -> Dict[str, List[Any]]:
+        columns = "id, document, metadata" if include_content else "id"
+        where_sql, where_params = where_to_sql(where) if where else ("1", [])
+        result = {"ids": [], "documents": [], "metadatas": []}
+
+        with self._lock:
+            if ids is None:
+                batches = [(f"SELECT {columns} FROM chunks WHERE {where_sql}", where_params)]
+            else:
+                batches = [
+                    (
+                        f"SELECT {columns} FROM chunks WHERE id IN ({','.join('?' * len(batch))}) AND {where_sql}",
+                        [*batch, *where_params]
+                    )
+                    for batch in (ids[start:start + _SQL_BATCH] for start in range(0, len(ids), _SQL_BATCH))
+                ]
+            for sql, params in batches:
+                for row in self._conn.execute(sql, params):
+                    result["ids"].append(row[0])
+                    if include_content:
+                        result["documents"].append(row[1])
+                        result["metadatas"].append(json.loads(row[2]))
+        return result
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            found = self._rows_for_ids(ids)
+            if not found:
+                return {}
+            vectors = self._restore(np.asarray(list(found.values()), dtype=np.int64))
+        return dict(zip(found, vectors.tolist()))
+
+    def _restore(self, rows: np.ndarray) -> np.ndarray:
+        # int8 rows come back dequantized, as queries see them
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows][:, None]
+        return vectors
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+
+        with self._lock:
+            rows = list(self._rows_for_ids(ids).values())
+            for start in range(0, len(rows), _SQL_BATCH):
+                batch = rows[start:start + _SQL_BATCH]
+                self._conn.execute(f"DELETE FROM chunks WHERE row IN ({','.join('?' * len(batch))})", batch)
+            self._conn.commit()
+            self._valid[rows] = False
+            self._count -= len(rows)
+            self._after_delete(rows)
+
+    def count(self) -> int:
+        return self._count
+
+    def reset(self):
+        with self._lock:
+            self.drop()
+            self._open()
+
+    def drop(self):
+        with self._lock:
+            self.close()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def reclaim_space(self):
+        with self._lock:
+            # Free rows at the end no longer need scanning. The files keep their capacity: a scan that
+            # snapshotted the old size may still be reading them, and freed rows are reused by inserts.
+            used = np.flatnonzero(~self._reusable_rows())
+            size = int(used[-1]) + 1 if len(used) else 0
+            if size < self._size:
+                self._size = size
+                self._set_meta(size=size)
+                self._conn.commit()
+        vacuum_sqlite(self._path("index.sqlite3"))
+
+    def close(self):
+        with self._lock:
+            self._vectors = self._norms = self._scales = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            vector_bytes = self._capacity * (self._dim or 0) * np.dtype(DTYPES[self.dtype]).itemsize
+            return {
+                "backend": self.name,
+                "count": self._count,
+                "collection": self.collection_name,
+                "path": self.directory,
+                "dtype": self.dtype,
+                "dimensions": self._dim,
+                "capacity": self._capacity,
+                "free_rows": self._size - self._count,
+                "vector_bytes": vector_bytes
+            }
@@ -0,0 +1,241 @@
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+import asyncio
+import os
+import time
+import zipfile
+import logging
+from langchain.schema import Document
+from app.config import settings
+from app.core.rag.document_processor import process_pdf_source
+from app.core.rag.executor import executor
+from app.core.rag import metrics
+
+logger = logging.getLogger(__name__)
+
+# (file name, path, ZIP member or None, size in bytes)
+BatchSource = Tuple[str, str, Optional[str], int]
+
+FILE_COMPLETED = "completed"
+FILE_FAILED = "failed"
+
+
+def resolve_batch_path(path: str, root: Optional[str] = None) -> str:
+    root = root or settings.BATCH_INGEST_ROOT
+    if not root:
+        raise PermissionError("Server-side batch ingestion is disabled; set BATCH_INGEST_ROOT to enable it")
+
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise PermissionError("Path is outside BATCH_INGEST_ROOT")
+    if not os.path.exists(resolved):
+        raise FileNotFoundError(f"Path not found: {path}")
+    return resolved
+
+
+def list_batch_sources(path: str, max_files: int = settings.BATCH_INGEST_MAX_FILES) -> List[BatchSource]:
+    if os.path.isdir(path):
+        sources = _directory_sources(path)
+    elif zipfile.is_zipfile(path):
+        sources = _archive_sources(path)
+    else:
+        raise ValueError("Batch path must be a directory or a ZIP archive")
+
+    if not sources:
+        raise ValueError("No PDF files found")
+    if len(sources) > max_files:
+        raise ValueError(f"Batch has {len(sources)} PDF files, more than the limit of {max_files}")
+    return sources
+
+
+def _directory_sources(path: str) -> List[BatchSource]:
+    sources = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            # Symlinks could point outside the directory that was allowed
+            if _is_pdf_name(name) and not os.path.islink(full_path):
+                sources.append((name, full_path, None, os.path.getsize(full_path)))
+    return sources
+
+
+def _archive_sources(path: str) -> List[BatchSource]:
+    with zipfile.ZipFile(path) as archive:
+        return [
+            (os.path.basename(info.filename), path, info.filename, info.file_size)
+            for info in sorted(archive.infolist(), key=lambda info: info.filename)
+            if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+            and _is_pdf_name(os.path.basename(info.filename))
+        ]
+
+
+def _is_pdf_name(name: str) -> bool:
+    # Dot files are editor and Finder leftovers such as ._paper.pdf
+    return name.lower().endswith(".pdf") and not name.startswith(".")
+
+
+class BatchIngestor:
+    # PDFs are extracted in parallel on the CPU pool while one writer pools their chunks, so many small
+    # papers share each embedding batch and vector store write instead of paying for their own
+    def __init__(
+        self,
+        service,
+        write_chunks: int = settings.BATCH_INGEST_WRITE_CHUNKS,
+        max_file_bytes: int = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    ):
+        self.service = service
+        self.write_chunks = max(1, write_chunks)
+        self.max_file_bytes = max_file_bytes
+
+    async def ingest(
+        self,
+        path: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        sources = await executor.run_io(list_batch_sources, path)
+        files = [_new_file_result(name) for name, _, _, _ in sources]
+        totals = self.service._new_index_totals()
+        totals.update(files_total=len(sources), files_done=0, files_failed=0, write_batches=0)
+
+        # Extracted files wait here for the writer; the bound keeps extraction from running far ahead of it
+        extracted: asyncio.Queue = asyncio.Queue(maxsize=executor.cpu_pool.max_workers)
+        pending = iter(range(len(sources)))
+
+        async def extract():
+            for index in pending:
+                name, source_path, member, size = sources[index]
+                if size > self.max_file_bytes:
+                    error = ValueError(f"File size exceeds maximum limit of {settings.MAX_FILE_SIZE_MB}MB")
+                    await extracted.put((index, None, 0, error))
+                    continue
+                try:
+                    documents, pages = await executor.run_cpu(process_pdf_source, source_path, name, member, metadata)
+                    await extracted.put((index, documents, pages, None))
+                except Exception as e:
+                    await extracted.put((index, None, 0, e))
+
+        extractors = [
+            asyncio.create_task(extract())
+            for _ in range(min(executor.cpu_pool.max_workers, len(sources)))
+        ]
+        buffer: List[Document] = []
+        owners: List[int] = []
+        remaining: Dict[int, int] = {}
+        try:
+            for _ in range(len(sources)):
+                index, documents, pages, error = await extracted.get()
+                if error is not None:
+                    logger.error(f"Failed to process {files[index]['file_name']} in batch: {error}")
+                    self._fail(files[index], totals, str(error))
+                else:
+                    files[index].update(document_id=documents[0].metadata.get("document_id"), pages=pages)
+                    remaining[index] = len(documents)
+                    totals["pages_parsed"] += pages
+                    metrics.PAGES_PARSED.inc(pages)
+                    buffer.extend(documents)
+                    owners.extend([index] * len(documents))
+
+                while len(buffer) >= self.write_chunks:
+                    await self._write(
+                        buffer[:self.write_chunks], owners[:self.write_chunks], files, remaining, totals, collection_id
+                    )
+                    del buffer[:self.write_chunks], owners[:self.write_chunks]
+                if progress:
+                    await progress(totals)
+
+            if buffer:
+                await self._write(buffer, owners, files, remaining, totals, collection_id)
+                if progress:
+                    await progress(totals)
+        finally:
+            for task in extractors:
+                task.cancel()
+            await asyncio.gather(*extractors, return_exceptions=True)
+
+        seconds = time.perf_counter() - started
+        metrics.STAGE_SECONDS.labels("ingest_batch").observe(seconds)
+        completed = totals["files_done"] - totals["files_failed"]
+        chunks = totals["added"] + totals["duplicates"]
+        logger.info(
+            f"Ingested {completed} of {len(sources)} files from {path} in {round(seconds, 2)} s "
+            f"({totals['pages_parsed']} pages, {chunks} chunks in {totals['write_batches']} writes)"
+        )
+        return {
+            "success": completed > 0,
+            "message": f"Processed {completed} of {len(sources)} files",
+            "files": files,
+            "files_total": len(sources),
+            "files_completed": completed,
+            "files_failed": totals["files_failed"],
+            "pages": totals["pages_parsed"],
+            "chunks_created": totals["added"],
+            "duplicate_chunks": totals["duplicates"],
+            "cache_hits": totals["cache_hits"],
+            "cache_misses": totals["cache_misses"],
+            "write_batches": totals["write_batches"],
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(totals["pages_parsed"] / seconds, 2) if seconds else 0.0,
+            "chunks_per_second": round(chunks / seconds, 2) if seconds else 0.0
+        }
+
+    async def _write(
+        self,
+        documents: List[Document],
+        owners: List[int],
+        files: List[Dict[str, Any]],
+        remaining: Dict[int, int],
+        totals: Dict[str, Any],
+        collection_id: Optional[str]
+    ):
+        # One embedding pass and one vector store write for chunks from however many files are buffered
+        try:
+            result = await self.service.vector_store_manager.aindex_documents(documents, collection_id=collection_id)
+        except Exception as e:
+            logger.error(f"Failed to store a batch of {len(documents)} chunks: {e}")
+            for index in dict.fromkeys(owners):
+                self._fail(files[index], totals, f"Failed to store chunks: {e}")
+            return
+
+        self.service._accumulate(totals, result)
+        totals["write_batches"] += 1
+        metrics.CHUNKS_INGESTED.labels("added").inc(result["added"])
+        metrics.CHUNKS_INGESTED.labels("duplicate").inc(result["duplicates"])
+
+        # Identical files share chunk IDs; the first to be written is credited with them
+        added = set(result["added_ids"])
+        for index, chunk_id in zip(owners, result["ids"]):
+            file = files[index]
+            if chunk_id in added:
+                added.discard(chunk_id)
+                file["chunks_created"] += 1
+            else:
+                file["duplicate_chunks"] += 1
+            remaining[index] -= 1
+            if not remaining[index] and file["status"] is None:
+                file["status"] = FILE_COMPLETED
+                totals["files_done"] += 1
+                metrics.DOCUMENTS_INGESTED.labels("pdf").inc()
+
+    def _fail(self, file: Dict[str, Any], totals: Dict[str, Any], error: str):
+        if file["status"] is not None:
+            return
+        file["status"] = FILE_FAILED
+        file["error"] = error
+        totals["files_done"] += 1
+        totals["files_failed"] += 1
+
+
+def _new_file_result(file_name: str) -> Dict[str, Any]:
+    return {
+        "file_name": file_name,
+        "status": None,
+        "document_id": None,
+        "pages": 0,
+        "chunks_created": 0,
+        "duplicate_chunks": 0,
+        "error": None
+    }
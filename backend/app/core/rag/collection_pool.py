@@ -0,0 +1,264 @@
+from typing import List, Dict, Any, Optional, Iterator
+from collections import OrderedDict
+from contextlib import contextmanager
+import itertools
+import os
+import re
+import threading
+import logging
+from app.config import settings
+from app.core.rag.backends import VectorBackend, create_backend, list_collections
+from app.core.rag.lexical_index import LexicalIndex
+from app.core.rag.document_registry import DocumentRegistry
+
+logger = logging.getLogger(__name__)
+
+# Safe as a Chroma collection name and as a directory or file name
+COLLECTION_ID_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_-]{1,61}[A-Za-z0-9]$"
+_COLLECTION_ID = re.compile(COLLECTION_ID_PATTERN)
+
+
+class CollectionNotFoundError(KeyError):
+    pass
+
+
+class CollectionRetiredError(RuntimeError):
+    # The handle was swapped out by a re-index while a write was being prepared; retry with a fresh one
+    pass
+
+
+def validate_collection_id(collection_id: str) -> str:
+    if collection_id != settings.CHROMA_COLLECTION_NAME and not _COLLECTION_ID.match(collection_id):
+        raise ValueError(
+            f"Invalid collection id {collection_id!r}: use 3-63 letters, digits, '-' or '_', "
+            "starting and ending with a letter or digit"
+        )
+    return collection_id
+
+
+def lexical_index_path(collection_id: str) -> Optional[str]:
+    # The default collection keeps the original index file; others get one each alongside it
+    if collection_id == settings.CHROMA_COLLECTION_NAME:
+        return None
+    default_path = settings.LEXICAL_INDEX_PATH or os.path.join(
+        settings.CHROMA_PERSIST_DIRECTORY, "lexical_index.sqlite3"
+    )
+    return os.path.join(os.path.dirname(os.path.abspath(default_path)), "lexical_indexes", f"{collection_id}.sqlite3")
+
+
+class Collection:
+    # An open collection: its vector backend and BM25 index, searched only by requests scoped to it.
+    # Both live in storage, which is the collection's own name until a re-index swaps in another.
+    def __init__(
+        self,
+        name: str,
+        lexical: bool,
+        storage: Optional[str] = None,
+        embedding_model: Optional[str] = None
+    ):
+        self.name = name
+        self.storage = storage or name
+        self.embedding_model = embedding_model
+        self.backend: VectorBackend = create_backend(self.storage)
+        self.lexical_index = LexicalIndex(lexical_index_path(self.storage)) if lexical else None
+        self.lexical_ready = False
+        self.lexical_lock = threading.Lock()
+        self.registry_ready = False
+        self.registry_lock = threading.Lock()
+        self.users = 0
+        self.evicted = False
+        self.retired = False
+        self.building = False
+
+    def drop(self):
+        self.backend.drop()
+        if self.lexical_index is not None:
+            self.lexical_index.clear()
+            self.lexical_index.close()
+            _remove_file(self.lexical_index.path)
+
+    def close(self):
+        self.backend.close()
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+
+
+class CollectionPool:
+    # Handles are opened on first use and kept in an LRU of max_open. A handle evicted while requests
+    # still use it is closed when the last of them finishes, and reused if asked for again before that.
+    def __init__(
+        self,
+        registry: DocumentRegistry,
+        embedding_model: str,
+        max_open: int = settings.MAX_OPEN_COLLECTIONS,
+        lexical: bool = settings.HYBRID_SEARCH_ENABLED
+    ):
+        self.registry = registry
+        self.embedding_model = embedding_model
+        self.max_open = max(1, max_open)
+        self.lexical = lexical
+        self.default_name = settings.CHROMA_COLLECTION_NAME
+        self._open: "OrderedDict[str, Collection]" = OrderedDict()
+        self._closing: Dict[str, Collection] = {}
+        # Storages swapped in by a re-index, or still being built by one, are not collections of their own
+        manifest = registry.storages()
+        hidden = {entry["storage"] for entry in manifest.values()} | {
+            entry["building"] for entry in manifest.values() if entry["building"]
+        }
+        self._known = (set(list_collections()) - hidden) | set(manifest) | {self.default_name}
+        self._write_locks: Dict[str, threading.Lock] = {}
+        # Versions come from one counter, so a dropped and recreated collection never reuses one
+        self._versions: Dict[str, int] = {}
+        self._version_counter = itertools.count(1)
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "opens": 0, "evictions": 0}
+
+    def exists(self, name: str) -> bool:
+        with self._lock:
+            return name in self._known
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._known)
+
+    def open_names(self) -> List[str]:
+        with self._lock:
+            return list(self._open)
+
+    def version(self, name: str) -> int:
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def bump_version(self, name: str):
+        with self._lock:
+            self._versions[name] = next(self._version_counter)
+
+    def write_lock(self, name: str) -> threading.Lock:
+        # Held around each write to a collection, and by a re-index for its final catch-up and swap
+        with self._lock:
+            return self._write_locks.setdefault(name, threading.Lock())
+
+    def open_storage(self, name: str, storage: str, embedding_model: str) -> Collection:
+        # Outside the pool until swapped in; the caller closes or drops it otherwise
+        collection = Collection(name, self.lexical, validate_collection_id(storage), embedding_model)
+        collection.building = True
+        return collection
+
+    def swap(self, name: str, collection: Collection):
+        # Requests already holding the old handle finish on it; new ones get the swapped-in storage
+        with self._lock:
+            for old in (self._open.pop(name, None), self._closing.pop(name, None)):
+                if old is None:
+                    continue
+                old.retired = old.evicted = True
+                if not old.users:
+                    self._discard(old)
+            collection.building = False
+            self._open[name] = collection
+            self._evict()
+        self.bump_version(name)
+
+    @contextmanager
+    def use(self, name: str, create: bool = False) -> Iterator[Collection]:
+        collection = self._acquire(name, create)
+        try:
+            yield collection
+        finally:
+            self._release(collection)
+
+    def drop(self, name: str) -> str:
+        # Returns the storage that was dropped, whose registry entries the caller clears
+        with self.use(name) as collection:
+            with self._lock:
+                self._open.pop(name, None)
+                # The default collection always exists; it is recreated empty on next use
+                if name != self.default_name:
+                    self._known.discard(name)
+                collection.evicted = True
+            collection.drop()
+            self.registry.remove_storage(name)
+        self.bump_version(name)
+        logger.info(f"Dropped collection {name}")
+        return collection.storage
+
+    def close(self):
+        with self._lock:
+            for collection in list(self._open.values()) + list(self._closing.values()):
+                collection.close()
+            self._open.clear()
+            self._closing.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "known": len(self._known),
+                "open": len(self._open),
+                "max_open": self.max_open,
+                **self._stats
+            }
+
+    def _acquire(self, name: str, create: bool) -> Collection:
+        with self._lock:
+            collection = self._open.get(name)
+            if collection is not None:
+                self._open.move_to_end(name)
+                self._stats["hits"] += 1
+            elif name in self._closing:
+                collection = self._closing.pop(name)
+                collection.evicted = False
+                self._open[name] = collection
+                self._evict()
+            else:
+                if name not in self._known and not create:
+                    raise CollectionNotFoundError(name)
+                collection = self._open_collection(validate_collection_id(name))
+                self._open[name] = collection
+                self._known.add(name)
+                self._stats["opens"] += 1
+                self._evict()
+            collection.users += 1
+            return collection
+
+    def _open_collection(self, name: str) -> Collection:
+        entry = self.registry.storages().get(name)
+        if entry is None:
+            # Collections created before storages were recorded are served by the model in use when first seen
+            self.registry.set_storage(name, name, self.embedding_model)
+            return Collection(name, self.lexical, name, self.embedding_model)
+        return Collection(name, self.lexical, entry["storage"], entry["embedding_model"])
+
+    def _release(self, collection: Collection):
+        with self._lock:
+            collection.users -= 1
+            if collection.evicted and collection.users == 0:
+                if self._closing.get(collection.name) is collection:
+                    del self._closing[collection.name]
+                if collection.retired:
+                    self._discard(collection)
+                else:
+                    collection.close()
+
+    def _discard(self, collection: Collection):
+        # A storage replaced by a re-index is dropped once no request is reading it
+        collection.drop()
+        self.registry.clear(collection.storage)
+        logger.info(f"Dropped storage {collection.storage} replaced by a re-index of collection {collection.name}")
+
+    def _evict(self):
+        while len(self._open) > self.max_open:
+            name, collection = self._open.popitem(last=False)
+            collection.evicted = True
+            self._stats["evictions"] += 1
+            if collection.users:
+                self._closing[name] = collection
+            else:
+                collection.close()
+            logger.info(f"Closed collection {name} (least recently used)")
+
+
+def _remove_file(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
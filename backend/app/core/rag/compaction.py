@@ -0,0 +1,132 @@
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import os
+import threading
+import time
+import logging
+from app.config import settings
+from app.core.rag import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # Removed while walking, e.g. a WAL file checkpointed away
+                pass
+    return total
+
+
+class Compactor:
+    # Deletes only mark space free. Once enough chunks are gone, the storage files are rewritten by a
+    # background thread after a short wait, so a burst of deletes is compacted once and off the request path.
+    def __init__(
+        self,
+        manager,
+        enabled: bool = settings.COMPACTION_ENABLED,
+        min_deleted: int = settings.COMPACTION_MIN_DELETED_CHUNKS,
+        delay: float = settings.COMPACTION_DELAY_SECONDS
+    ):
+        self.manager = manager
+        self.enabled = enabled
+        self.min_deleted = max(1, min_deleted)
+        self.delay = delay
+        self._pending: Dict[str, int] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        # One compaction at a time, whether scheduled or requested through the API
+        self._run_lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "bytes_reclaimed": 0,
+            "last_run_at": None,
+            "last_duration_ms": None,
+            "last_error": None
+        }
+
+    def note_deleted(self, collection: str, chunks: int):
+        if chunks <= 0:
+            return
+
+        with self._lock:
+            self._pending[collection] = self._pending.get(collection, 0) + chunks
+            if not self.enabled or self._timer is not None or sum(self._pending.values()) < self.min_deleted:
+                return
+            self._timer = threading.Timer(self.delay, self._run_scheduled)
+            self._timer.name = "compactor"
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_scheduled(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Background compaction failed: {e}")
+
+    def compact(self, collections: Optional[List[str]] = None) -> Dict[str, Any]:
+        # Without a list, only collections with deletes since the last run are compacted
+        with self._run_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending, self._pending = self._pending, {}
+
+            names = list(pending) if collections is None else collections
+            started = time.perf_counter()
+            before = directory_size(self.manager.persist_directory)
+            try:
+                with metrics.timed("compaction"):
+                    compacted = [name for name in names if self.manager.reclaim_space(name)]
+                    self.manager.reclaim_registry_space()
+            except Exception as e:
+                with self._lock:
+                    self._stats["last_error"] = str(e)
+                    # Retried with the next scheduled run
+                    for name, chunks in pending.items():
+                        self._pending[name] = self._pending.get(name, 0) + chunks
+                raise
+
+            reclaimed = max(0, before - directory_size(self.manager.persist_directory))
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            metrics.BYTES_RECLAIMED.inc(reclaimed)
+            with self._lock:
+                self._stats["runs"] += 1
+                self._stats["bytes_reclaimed"] += reclaimed
+                self._stats["last_run_at"] = datetime.utcnow().isoformat()
+                self._stats["last_duration_ms"] = duration_ms
+                self._stats["last_error"] = None
+
+            logger.info(
+                f"Compacted {len(compacted)} collections in {duration_ms} ms "
+                f"({reclaimed} bytes reclaimed, {sum(pending.values())} chunks deleted since the last run)"
+            )
+            return {
+                "collections": compacted,
+                "deleted_chunks": sum(pending.values()),
+                "bytes_before": before,
+                "bytes_reclaimed": reclaimed,
+                "duration_ms": duration_ms
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "min_deleted_chunks": self.min_deleted,
+                "delay_seconds": self.delay,
+                "pending_deleted_chunks": sum(self._pending.values()),
+                "scheduled": self._timer is not None,
+                **self._stats
+            }
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
@@ -0,0 +1,120 @@
+from typing import List, Dict, Any, Optional, Tuple
+import re
+from langchain.schema import Document
+from app.config import settings
+from app.core.rag.tokens import count_tokens
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s|$)")
+
+# A chunk cut down to fewer tokens than this is left out rather than sent as a fragment
+MIN_TRIMMED_TOKENS = 32
+
+
+def context_budget(reserved_tokens: int) -> int:
+    # Tokens left for retrieved chunks once the answer and the rest of the prompt (template, question,
+    # history) are taken out of the model window, capped at CONTEXT_TOKEN_BUDGET
+    available = settings.MAX_CONTEXT_LENGTH - settings.ANSWER_MAX_TOKENS - reserved_tokens
+    return max(0, min(settings.CONTEXT_TOKEN_BUDGET, available))
+
+
+def chunk_tokens(doc: Document) -> int:
+    # Counted once at ingestion; older chunks are counted on the fly
+    tokens = doc.metadata.get("chunk_tokens")
+    return tokens if isinstance(tokens, int) else count_tokens(doc.page_content)
+
+
+def trim_to_sentence(text: str, max_tokens: int) -> str:
+    # Longest prefix that ends a sentence and fits max_tokens
+    ends = [match.end() for match in _SENTENCE_END.finditer(text)]
+    best, low, high = "", 0, len(ends) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = text[:ends[middle]]
+        if count_tokens(candidate) <= max_tokens:
+            best, low = candidate, middle + 1
+        else:
+            high = middle - 1
+    return best
+
+
+def overlap_length(first: str, second: str, probe_chars: int = 64) -> int:
+    # Length of the longest suffix of first that second starts with, i.e. the CHUNK_OVERLAP text two
+    # neighbouring chunks share
+    probe = second[:probe_chars]
+    start = first.find(probe) if probe else -1
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    return 0
+
+
+class ContextPacker:
+    # Fills the context budget greedily in relevance order. Text a neighbouring chunk already carries is
+    # cut, and the chunk that would overflow the budget is trimmed back to its last complete sentence.
+    def __init__(self, min_trimmed_tokens: int = MIN_TRIMMED_TOKENS):
+        self.min_trimmed_tokens = min_trimmed_tokens
+
+    def pack(
+        self,
+        ranked: List[Tuple[Document, float]],
+        budget: int,
+        max_chunks: Optional[int] = None
+    ) -> Tuple[List[Tuple[Document, float]], Dict[str, Any]]:
+        packed: List[Tuple[Document, float]] = []
+        neighbours: Dict[tuple, str] = {}
+        used, trimmed, overlap_removed = 0, 0, 0
+
+        for doc, score in ranked:
+            if max_chunks is not None and len(packed) >= max_chunks:
+                break
+            if budget - used < self.min_trimmed_tokens and packed:
+                break
+
+            original = text = doc.page_content
+            position = _position(doc)
+            if position is not None:
+                document_id, chunk_index = position
+                previous = neighbours.get((document_id, chunk_index - 1))
+                following = neighbours.get((document_id, chunk_index + 1))
+                if previous is not None:
+                    text = text[overlap_length(previous, text):]
+                if following is not None:
+                    text = text[:len(text) - overlap_length(text, following)]
+                text = text.strip()
+                if not text:
+                    continue
+
+            tokens = chunk_tokens(doc) if text == original else count_tokens(text)
+            was_trimmed = used + tokens > budget
+            if was_trimmed:
+                text = trim_to_sentence(text, budget - used)
+                tokens = count_tokens(text)
+                if not text or tokens < min(self.min_trimmed_tokens, budget - used):
+                    continue
+                trimmed += 1
+
+            if text != original:
+                if not was_trimmed:
+                    overlap_removed += 1
+                doc = Document(id=doc.id, page_content=text, metadata=doc.metadata)
+            # A trimmed chunk may have lost the text its next neighbour overlaps, so it is not matched
+            if position is not None and not was_trimmed:
+                neighbours[position] = original
+            packed.append((doc, score))
+            used += tokens
+
+        return packed, {
+            "budget": budget,
+            "context_tokens": used,
+            "trimmed": trimmed,
+            "overlaps_removed": overlap_removed
+        }
+
+
+def _position(doc: Document) -> Optional[tuple]:
+    document_id = doc.metadata.get("document_id")
+    chunk_index = doc.metadata.get("chunk_index")
+    if document_id is None or not isinstance(chunk_index, int):
+        return None
+    return document_id, chunk_index
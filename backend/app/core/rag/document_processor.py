@@ -1,60 +1,90 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union, Iterator, Iterable, Tuple
+from contextlib import contextmanager
+import html
+import json
+import zipfile
 import logging
+import bisect
+import re
 import fitz  # PyMuPDF
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from app.config import settings
-import hashlib
+from app.core.rag.hashing import content_hash
+from app.core.rag.tokens import count_tokens
+from app.core.rag.page_cache import PageTextCache, CachedDocument
+from app.core.rag.metrics import timed, PAGES_PARSED
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+PDFSource = Union[str, bytes, bytearray, memoryview]
+
+# (text, is_heading) for each text block of a page, in reading order
+PageBlock = Tuple[str, bool]
+
+# Text only (no inline images), with words hyphenated across a line break joined back up
+_TEXT_FLAGS = fitz.TEXTFLAGS_XHTML & ~fitz.TEXT_PRESERVE_IMAGES | fitz.TEXT_DEHYPHENATE
+
+# MuPDF's XHTML output marks each text block as a paragraph, or as h1-h6 when set in a larger font
+_BLOCK = re.compile(r"<(h[1-6]|p)\b[^>]*>(.*?)</\1>", re.S)
+_BOLD_RUN = re.compile(r"<b>.*?</b>", re.S)
+_TAG = re.compile(r"<[^>]+>")
+
+HEADING_MAX_CHARS = 120
+
+# Pages extracted between writes to the page text cache
+PAGE_CACHE_WRITE_PAGES = 8
+
+# Bumped whenever a change to the chunking code alters the chunks it produces
+CHUNKING_REVISION = 2
+
+
+def chunking_version() -> str:
+    # Documents chunked under another version are re-chunked by /reindex
+    config = {
+        "revision": CHUNKING_REVISION,
+        "unit": settings.CHUNK_UNIT,
+        "size": settings.CHUNK_SIZE,
+        "overlap": settings.CHUNK_OVERLAP
+    }
+    return content_hash(json.dumps(config, sort_keys=True))[:16]
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, page_cache: Optional[PageTextCache] = None):
+        self.page_cache = page_cache
+        self.chunking_version = chunking_version()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.CHUNK_SIZE,
             chunk_overlap=settings.CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+            length_function=self._length_function(),
+            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""],
+            # Punctuation stays with the sentence it ends, so chunk boundaries fall at sentence ends
+            keep_separator="end"
         )
     
-    def process_pdf(self, file_path: str, file_name: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
+    def _length_function(self):
+        # Token-sized chunks make the prompt cost of each retrieved chunk predictable
+        if settings.CHUNK_UNIT == "tokens":
+            return count_tokens
+        if settings.CHUNK_UNIT == "characters":
+            return len
+        raise ValueError(f"Unknown CHUNK_UNIT: {settings.CHUNK_UNIT}")
+    
+    def process_pdf(
+        self,
+        file_path: PDFSource,
+        file_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None
+    ) -> List[Document]:
         try:
-            text = self._extract_text_from_pdf(file_path)
-            
-            if not text.strip():
-                raise ValueError("No text content found in PDF")
-            
-            document_id = self._generate_document_id(file_name)
-            
-            base_metadata = {
-                "source": file_name,
-                "document_id": document_id,
-                "file_type": "pdf",
-                "processed_at": datetime.utcnow().isoformat(),
-                "total_characters": len(text)
-            }
-            
-            if metadata:
-                base_metadata.update(metadata)
-            
-            chunks = self.text_splitter.split_text(text)
-            
-            documents = []
-            for i, chunk in enumerate(chunks):
-                chunk_metadata = base_metadata.copy()
-                chunk_metadata.update({
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "chunk_size": len(chunk)
-                })
-                
-                doc = Document(
-                    page_content=chunk,
-                    metadata=chunk_metadata
-                )
-                documents.append(doc)
+            documents = [
+                doc
+                for batch in self.iter_pdf_documents(file_path, file_name, metadata, document_id)
+                for doc in batch
+            ]
             
             logger.info(f"Processed PDF into {len(documents)} chunks")
             return documents
@@ -63,56 +93,221 @@ class DocumentProcessor:
             logger.error(f"Failed to process PDF: {e}")
             raise
     
-    def _extract_text_from_pdf(self, file_path: str) -> str:
-        text = ""
+    def iter_pdf_documents(
+        self,
+        source: PDFSource,
+        file_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None,
+        batch_size: int = settings.INGEST_BATCH_CHUNKS
+    ) -> Iterator[List[Document]]:
+        if not document_id:
+            if isinstance(source, str):
+                with open(source, "rb") as f:
+                    document_id = self._generate_document_id(f.read())
+            else:
+                document_id = self._generate_document_id(source)
+        
+        pages = self.iter_pdf_pages(source)
+        if self.page_cache is not None:
+            cache_key = self.page_cache.start_pages(document_id)
+            pages = _caching(pages, self.page_cache, cache_key)
+        
+        finished = False
         try:
-            pdf_document = fitz.open(file_path)
+            batch = []
+            total = 0
+            for doc in self._iter_chunks(pages, self._pdf_metadata(file_name, document_id, metadata)):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    total += len(batch)
+                    yield batch
+                    batch = []
             
-            for page_num in range(pdf_document.page_count):
-                page = pdf_document[page_num]
-                page_text = page.get_text()
-                
-                if page_text:
-                    text += f"\n--- Page {page_num + 1} ---\n"
-                    text += page_text
+            if batch:
+                total += len(batch)
+                yield batch
             
+            if not total:
+                raise ValueError("No text content found in PDF")
+            if self.page_cache is not None:
+                self.page_cache.finish_pages(cache_key, document_id, "pdf", file_name, metadata)
+            finished = True
+        finally:
+            # Pages of a document that failed or was abandoned part way are not kept
+            if not finished and self.page_cache is not None:
+                self.page_cache.discard_pages(cache_key)
+    
+    def process_cached(self, document_id: str, cached: CachedDocument) -> List[Document]:
+        # Re-chunks a document from its cached text with the current chunking settings
+        kind, source, metadata, content = cached
+        if kind == "text":
+            return self.process_text(content, source, metadata)
+        
+        documents = list(self._iter_chunks(content, self._pdf_metadata(source, document_id, metadata)))
+        if not documents:
+            raise ValueError("No text content found in PDF")
+        return documents
+    
+    def _pdf_metadata(self, file_name: str, document_id: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        base_metadata = {
+            "source": file_name,
+            "document_id": document_id,
+            "file_type": "pdf",
+            "chunking_version": self.chunking_version,
+            "processed_at": datetime.utcnow().isoformat()
+        }
+        
+        if metadata:
+            base_metadata.update(metadata)
+        return base_metadata
+    
+    def count_pdf_pages(self, source: PDFSource) -> int:
+        pdf_document = self._open_pdf(source)
+        try:
+            return pdf_document.page_count
+        finally:
             pdf_document.close()
-            
-            text = self._clean_text(text)
-            logger.info(f"Extracted {len(text)} characters from PDF")
-            return text
-            
+    
+    def iter_pdf_pages(self, source: PDFSource) -> Iterator[Tuple[int, List[PageBlock]]]:
+        pdf_document = self._open_pdf(source)
+        
+        try:
+            for page_num in range(pdf_document.page_count):
+                with timed("extract_page"):
+                    blocks = self._page_blocks(pdf_document[page_num])
+                PAGES_PARSED.inc()
+                if blocks:
+                    yield page_num + 1, blocks
         except Exception as e:
             logger.error(f"Failed to extract text from PDF: {e}")
             raise
+        finally:
+            pdf_document.close()
+    
+    def _page_blocks(self, page: fitz.Page) -> List[PageBlock]:
+        # One linear pass over the page's blocks; MuPDF joins wrapped lines, so each block is a paragraph
+        blocks = []
+        for match in _BLOCK.finditer(page.get_text("xhtml", flags=_TEXT_FLAGS)):
+            tag, markup = match.groups()
+            text = " ".join(html.unescape(_TAG.sub("", markup)).replace("\x00", "").split())
+            if len(text) < 2:
+                continue
+            # A paragraph set entirely in bold is a heading in the body font size
+            emphasis = tag != "p" or not _TAG.sub("", _BOLD_RUN.sub("", markup)).strip()
+            blocks.append((text, emphasis and _is_heading(text)))
+        return blocks
+    
+    def _open_pdf(self, source: PDFSource) -> fitz.Document:
+        # Bytes-like sources are read in place, so uploads never touch a temp file
+        if isinstance(source, str):
+            return fitz.open(source)
+        return fitz.open(stream=source, filetype="pdf")
     
-    def _clean_text(self, text: str) -> str:
-        text = text.replace('\x00', '')
-        text = ' '.join(text.split())
+    def _iter_chunks(
+        self,
+        pages: Iterable[Tuple[int, List[PageBlock]]],
+        base_metadata: Dict[str, Any]
+    ) -> Iterator[Document]:
+        # Only the unfinished tail chunk is carried between pages, so work stays linear in document length.
+        # Blocks are joined as paragraphs, which the splitter prefers as chunk boundaries.
+        buffer = ""
+        page_starts: List[int] = []
+        page_numbers: List[int] = []
+        heading_starts: List[int] = []
+        headings: List[str] = []
+        chunk_index = 0
+        
+        for page_num, blocks in pages:
+            if buffer:
+                buffer += "\n\n"
+            page_starts.append(len(buffer))
+            page_numbers.append(page_num)
+            offset = len(buffer)
+            for text, is_heading in blocks:
+                if is_heading:
+                    heading_starts.append(offset)
+                    headings.append(text)
+                offset += len(text) + 2
+            buffer += "\n\n".join(text for text, _ in blocks)
+            
+            pieces = self._locate_chunks(buffer)
+            if len(pieces) < 2:
+                continue
+            
+            for start, chunk in pieces[:-1]:
+                yield self._make_chunk(
+                    chunk, chunk_index, start, page_starts, page_numbers, heading_starts, headings, base_metadata
+                )
+                chunk_index += 1
+            
+            carry_start = pieces[-1][0]
+            buffer = buffer[carry_start:]
+            page_starts, page_numbers = _rebase(page_starts, page_numbers, carry_start)
+            heading_starts, headings = _rebase(heading_starts, headings, carry_start)
         
-        lines = text.split('\n')
-        cleaned_lines = []
+        if buffer.strip():
+            for start, chunk in self._locate_chunks(buffer):
+                yield self._make_chunk(
+                    chunk, chunk_index, start, page_starts, page_numbers, heading_starts, headings, base_metadata
+                )
+                chunk_index += 1
+    
+    def _locate_chunks(self, text: str) -> List[Tuple[int, str]]:
+        located = []
+        cursor = 0
+        with timed("split_chunks"):
+            chunks = self.text_splitter.split_text(text)
+        for chunk in chunks:
+            start = text.find(chunk, cursor)
+            if start == -1:
+                start = cursor
+            located.append((start, chunk))
+            cursor = start + 1
+        return located
+    
+    def _make_chunk(
+        self,
+        chunk: str,
+        chunk_index: int,
+        start: int,
+        page_starts: List[int],
+        page_numbers: List[int],
+        heading_starts: List[int],
+        headings: List[str],
+        base_metadata: Dict[str, Any]
+    ) -> Document:
+        first = max(0, bisect.bisect_right(page_starts, start) - 1)
+        last = max(0, bisect.bisect_right(page_starts, start + len(chunk) - 1) - 1)
+        section = bisect.bisect_right(heading_starts, start) - 1
         
-        for line in lines:
-            line = line.strip()
-            if line and len(line) > 1:
-                cleaned_lines.append(line)
+        chunk_metadata = base_metadata.copy()
+        chunk_metadata.update({
+            "chunk_index": chunk_index,
+            "chunk_size": len(chunk),
+            "chunk_tokens": count_tokens(chunk),
+            "chunk_hash": content_hash(chunk),
+            "page_start": page_numbers[first],
+            "page_end": page_numbers[last]
+        })
+        # The heading the chunk starts under; text before a document's first heading has none
+        if section >= 0:
+            chunk_metadata["section"] = headings[section]
         
-        return '\n'.join(cleaned_lines)
+        return Document(page_content=chunk, metadata=chunk_metadata)
     
-    def _generate_document_id(self, file_name: str) -> str:
-        timestamp = datetime.utcnow().isoformat()
-        unique_string = f"{file_name}_{timestamp}"
-        return hashlib.md5(unique_string.encode()).hexdigest()
+    def _generate_document_id(self, content: Union[str, bytes, bytearray, memoryview]) -> str:
+        return content_hash(content)
     
     def process_text(self, text: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
         try:
-            document_id = self._generate_document_id(source)
+            document_id = self._generate_document_id(text)
             
             base_metadata = {
                 "source": source,
                 "document_id": document_id,
                 "file_type": "text",
+                "chunking_version": self.chunking_version,
                 "processed_at": datetime.utcnow().isoformat(),
                 "total_characters": len(text)
             }
@@ -121,6 +316,8 @@ class DocumentProcessor:
                 base_metadata.update(metadata)
             
             chunks = self.text_splitter.split_text(text)
+            if self.page_cache is not None:
+                self.page_cache.put(document_id, "text", source, metadata, text)
             
             documents = []
             for i, chunk in enumerate(chunks):
@@ -128,7 +325,9 @@ class DocumentProcessor:
                 chunk_metadata.update({
                     "chunk_index": i,
                     "total_chunks": len(chunks),
-                    "chunk_size": len(chunk)
+                    "chunk_size": len(chunk),
+                    "chunk_tokens": count_tokens(chunk),
+                    "chunk_hash": content_hash(chunk)
                 })
                 
                 doc = Document(
@@ -142,4 +341,81 @@ class DocumentProcessor:
             
         except Exception as e:
             logger.error(f"Failed to process text: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+def _is_heading(text: str) -> bool:
+    # Large or bold text that reads like a sentence, or has no words, is not taken as a heading
+    return len(text) <= HEADING_MAX_CHARS and text[-1] not in ".,;:" and any(c.isalpha() for c in text)
+
+
+def _caching(
+    pages: Iterator[Tuple[int, List[PageBlock]]],
+    page_cache: PageTextCache,
+    cache_key: str
+) -> Iterator[Tuple[int, List[PageBlock]]]:
+    # Written a few pages at a time as they stream past, so the cache never holds up the whole document
+    pending = []
+    for page in pages:
+        pending.append(page)
+        if len(pending) >= PAGE_CACHE_WRITE_PAGES:
+            page_cache.put_pages(cache_key, pending)
+            pending = []
+        yield page
+    if pending:
+        page_cache.put_pages(cache_key, pending)
+
+
+def _rebase(starts: List[int], values: List[Any], carry_start: int) -> Tuple[List[int], List[Any]]:
+    # Offsets into a buffer that now begins at carry_start; the entry covering carry_start is kept at 0
+    first = max(0, bisect.bisect_right(starts, carry_start) - 1)
+    return [max(0, offset - carry_start) for offset in starts[first:]], values[first:]
+
+
+@contextmanager
+def _worker_processor() -> Iterator[DocumentProcessor]:
+    # Worker processes open the page text cache themselves; SQLite serialises their writes
+    page_cache = PageTextCache() if settings.PAGE_TEXT_CACHE_ENABLED else None
+    try:
+        yield DocumentProcessor(page_cache)
+    finally:
+        if page_cache is not None:
+            page_cache.close()
+
+
+def process_pdf_bytes(file_content: bytes, file_name: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
+    # Module-level so it can be shipped to the CPU process pool
+    with _worker_processor() as processor:
+        return processor.process_pdf(
+            file_content,
+            file_name,
+            metadata=metadata,
+            document_id=content_hash(file_content)
+        )
+
+
+def process_pdf_source(
+    path: str,
+    file_name: str,
+    member: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Document], int]:
+    # Reads the file, or a member of a ZIP archive, in the worker process so only chunks are sent back
+    if member is None:
+        with open(path, "rb") as f:
+            content = f.read()
+    else:
+        with zipfile.ZipFile(path) as archive:
+            content = archive.read(member)
+    if not content.startswith(b"%PDF"):
+        raise ValueError("File is not a valid PDF")
+    
+    metadata = {"file_size_mb": len(content) / (1024 * 1024), **(metadata or {})}
+    with _worker_processor() as processor:
+        documents = processor.process_pdf(content, file_name, metadata=metadata, document_id=content_hash(content))
+        return documents, processor.count_pdf_pages(content)
+
+
+def process_text_content(text: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
+    with _worker_processor() as processor:
+        return processor.process_text(text=text, source=source, metadata=metadata)
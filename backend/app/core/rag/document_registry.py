@@ -0,0 +1,266 @@
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from datetime import datetime
+import os
+import sqlite3
+import threading
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Stay under SQLite's bound-parameter limit
+_SQL_BATCH = 500
+
+# (chunk id, document id, source, tokens, bytes, chunking version)
+ChunkEntry = Tuple[str, str, Optional[str], int, int, Optional[str]]
+
+
+class DocumentRegistry:
+    # Which chunks make up each document, recorded as they are written, so a document is deleted
+    # by its chunk IDs rather than found again with a metadata scan of the whole collection.
+    # Chunks are recorded per storage; the collections table maps each collection to the storage serving it.
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.DOCUMENT_REGISTRY_PATH or os.path.join(
+            settings.CHROMA_PERSIST_DIRECTORY, "document_registry.sqlite3"
+        )
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, document_id TEXT NOT NULL, source TEXT, "
+                "chunks INTEGER NOT NULL, tokens INTEGER NOT NULL, bytes INTEGER NOT NULL, "
+                "created_at TEXT NOT NULL, updated_at TEXT NOT NULL, "
+                "PRIMARY KEY (collection, document_id))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            if "chunking_version" not in columns:
+                conn.execute("ALTER TABLE documents ADD COLUMN chunking_version TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "collection TEXT NOT NULL, chunk_id TEXT NOT NULL, document_id TEXT NOT NULL, "
+                "tokens INTEGER NOT NULL, bytes INTEGER NOT NULL, "
+                "PRIMARY KEY (collection, chunk_id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_by_document ON chunks (collection, document_id)")
+            # building is a storage being filled by a re-index, swapped in for storage when it completes
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS collections ("
+                "collection TEXT PRIMARY KEY, storage TEXT NOT NULL, embedding_model TEXT NOT NULL, building TEXT)"
+            )
+            conn.commit()
+            self._conn = conn
+            logger.info(f"Opened document registry at {self.path}")
+        return self._conn
+
+    def add(self, collection: str, entries: Iterable[ChunkEntry]):
+        entries = list(entries)
+        if not entries:
+            return
+
+        documents = {document_id: (source, version) for _, document_id, source, _, _, version in entries}
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (collection, chunk_id, document_id, tokens, bytes) VALUES (?, ?, ?, ?, ?)",
+                [(collection, chunk_id, document_id, tokens, size) for chunk_id, document_id, _, tokens, size, _ in entries]
+            )
+            self._refresh(conn, collection, documents)
+            conn.commit()
+
+    def chunk_ids(self, collection: str, document_ids: List[str]) -> Dict[str, List[str]]:
+        # Only registered documents appear in the result
+        found: Dict[str, List[str]] = {}
+        with self._lock:
+            conn = self._connect()
+            unique = list(dict.fromkeys(document_ids))
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT document_id, chunk_id FROM chunks "
+                    f"WHERE collection = ? AND document_id IN ({','.join('?' * len(batch))})",
+                    [collection, *batch]
+                ).fetchall()
+                for document_id, chunk_id in rows:
+                    found.setdefault(document_id, []).append(chunk_id)
+        return found
+
+    def all_chunk_ids(self, collection: str) -> List[str]:
+        with self._lock:
+            rows = self._connect().execute("SELECT chunk_id FROM chunks WHERE collection = ?", (collection,))
+            return [chunk_id for (chunk_id,) in rows]
+
+    def remove_documents(self, collection: str, document_ids: List[str]):
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(document_ids), _SQL_BATCH):
+                batch = document_ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(
+                    f"DELETE FROM chunks WHERE collection = ? AND document_id IN ({placeholders})", [collection, *batch]
+                )
+                conn.execute(
+                    f"DELETE FROM documents WHERE collection = ? AND document_id IN ({placeholders})", [collection, *batch]
+                )
+            conn.commit()
+
+    def remove_chunks(self, collection: str, chunk_ids: List[str]):
+        if not chunk_ids:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            affected: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+            for start in range(0, len(chunk_ids), _SQL_BATCH):
+                batch = chunk_ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT DISTINCT document_id FROM chunks WHERE collection = ? AND chunk_id IN ({placeholders})",
+                    [collection, *batch]
+                ).fetchall()
+                affected.update((document_id, (None, None)) for (document_id,) in rows)
+                conn.execute(
+                    f"DELETE FROM chunks WHERE collection = ? AND chunk_id IN ({placeholders})", [collection, *batch]
+                )
+            self._refresh(conn, collection, affected)
+            conn.commit()
+
+    def clear(self, collection: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            conn.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+            conn.commit()
+
+    def documents(self, collection: str, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT document_id, source, chunks, tokens, bytes, chunking_version, created_at, updated_at "
+                "FROM documents WHERE collection = ? ORDER BY created_at, document_id LIMIT ? OFFSET ?",
+                (collection, limit, offset)
+            ).fetchall()
+        return [
+            {
+                "document_id": document_id,
+                "source": source,
+                "chunks": chunks,
+                "tokens": tokens,
+                "bytes": size,
+                "chunking_version": version,
+                "created_at": created_at,
+                "updated_at": updated_at
+            }
+            for document_id, source, chunks, tokens, size, version, created_at, updated_at in rows
+        ]
+
+    def document_versions(self, collection: str) -> Dict[str, Tuple[Optional[str], str]]:
+        # {document id: (chunking version, updated_at)}; re-indexing compares these between storages
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT document_id, chunking_version, updated_at FROM documents WHERE collection = ?", (collection,)
+            ).fetchall()
+        return {document_id: (version, updated_at) for document_id, version, updated_at in rows}
+
+    def count_stale(self, collection: str, chunking_version: str) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM documents WHERE collection = ? AND chunking_version IS NOT ?",
+                (collection, chunking_version)
+            ).fetchone()[0]
+
+    def registered(self, document_ids: List[str]) -> set:
+        # Documents still stored anywhere, in any collection or storage
+        found = set()
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(document_ids), _SQL_BATCH):
+                batch = document_ids[start:start + _SQL_BATCH]
+                found.update(
+                    document_id for (document_id,) in conn.execute(
+                        f"SELECT DISTINCT document_id FROM documents WHERE document_id IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                )
+        return found
+
+    def storages(self) -> Dict[str, Dict[str, Optional[str]]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT collection, storage, embedding_model, building FROM collections"
+            ).fetchall()
+        return {
+            collection: {"storage": storage, "embedding_model": model, "building": building}
+            for collection, storage, model, building in rows
+        }
+
+    def set_storage(self, collection: str, storage: str, embedding_model: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO collections (collection, storage, embedding_model) VALUES (?, ?, ?) "
+                "ON CONFLICT (collection) DO UPDATE SET storage = excluded.storage, "
+                "embedding_model = excluded.embedding_model, building = NULL",
+                (collection, storage, embedding_model)
+            )
+            conn.commit()
+
+    def set_building(self, collection: str, storage: Optional[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE collections SET building = ? WHERE collection = ?", (storage, collection))
+            conn.commit()
+
+    def remove_storage(self, collection: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM collections WHERE collection = ?", (collection,))
+            conn.commit()
+
+    def count(self, collection: str) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connect()
+            documents = conn.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (collection,)).fetchone()[0]
+            chunks, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM chunks WHERE collection = ?", (collection,)
+            ).fetchone()
+        return {"documents": documents, "chunks": chunks, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _refresh(
+        self,
+        conn: sqlite3.Connection,
+        collection: str,
+        documents: Dict[str, Tuple[Optional[str], Optional[str]]]
+    ):
+        # Recomputes the per-document totals; a document left without chunks is removed
+        now = datetime.utcnow().isoformat()
+        for document_id, (source, version) in documents.items():
+            chunks, tokens, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tokens), 0), COALESCE(SUM(bytes), 0) FROM chunks "
+                "WHERE collection = ? AND document_id = ?",
+                (collection, document_id)
+            ).fetchone()
+            if not chunks:
+                conn.execute(
+                    "DELETE FROM documents WHERE collection = ? AND document_id = ?", (collection, document_id)
+                )
+                continue
+            conn.execute(
+                "INSERT INTO documents (collection, document_id, source, chunks, tokens, bytes, chunking_version, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (collection, document_id) DO UPDATE SET "
+                "source = COALESCE(excluded.source, source), chunks = excluded.chunks, tokens = excluded.tokens, "
+                "bytes = excluded.bytes, chunking_version = COALESCE(excluded.chunking_version, chunking_version), "
+                "updated_at = excluded.updated_at",
+                (collection, document_id, source, chunks, tokens, size, version, now, now)
+            )
@@ -0,0 +1,78 @@
+from typing import List, Dict, Iterable, Tuple, Optional
+from array import array
+import os
+import sqlite3
+import threading
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.EMBEDDING_CACHE_PATH or os.path.join(
+            settings.CHROMA_PERSIST_DIRECTORY, "embedding_cache.sqlite3"
+        )
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, chunk_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, chunk_hash))"
+            )
+            conn.commit()
+            self._conn = conn
+            logger.info(f"Opened embedding cache at {self.path}")
+        return self._conn
+
+    def get_many(self, model: str, chunk_hashes: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        if not chunk_hashes:
+            return found
+
+        with self._lock:
+            conn = self._connect()
+            unique = list(dict.fromkeys(chunk_hashes))
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for chunk_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[chunk_hash] = vector.tolist()
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        rows = [(model, chunk_hash, array("f", vector).tobytes()) for chunk_hash, vector in items]
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, chunk_hash, vector) VALUES (?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,325 @@
+from typing import List, Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import random
+import threading
+import time
+import logging
+from langchain_core.embeddings import Embeddings
+from app.config import settings
+from app.core.rag.tokens import count_tokens
+from app.core.rag.metrics import EMBEDDING_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingEngine(Embeddings):
+    # Drop-in Embeddings wrapper: token-budgeted batches, bounded concurrency, adaptive rate-limit backoff
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: Optional[str] = None,
+        max_batch_tokens: int = settings.EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_size: int = settings.EMBEDDING_BATCH_MAX_SIZE,
+        concurrency: int = settings.EMBEDDING_CONCURRENCY,
+        max_retries: int = settings.EMBEDDING_MAX_RETRIES,
+        backoff_base: float = settings.EMBEDDING_BACKOFF_BASE_SECONDS,
+        backoff_max: float = settings.EMBEDDING_BACKOFF_MAX_SECONDS
+    ):
+        self.embeddings = embeddings
+        self.model = model or settings.OPENAI_EMBEDDING_MODEL
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = AdaptiveLimiter(concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "texts": 0,
+            "tokens": 0,
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0
+        }
+        self._active_calls = 0
+        self._busy_since = 0.0
+        self._busy_seconds = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        self._enter()
+        try:
+            vectors: List[Optional[List[float]]] = [None] * len(texts)
+            batches = self.make_batches(texts)
+
+            def run(item: tuple) -> List[List[float]]:
+                batch, tokens = item
+                return self._embed_batch([texts[i] for i in batch], tokens)
+
+            # Sync callers such as a re-index step fan out like async ones; the limiter caps both together
+            results = self._get_pool().map(run, batches) if len(batches) > 1 else map(run, batches)
+            for (batch, _), batch_vectors in zip(batches, results):
+                for i, vector in zip(batch, batch_vectors):
+                    vectors[i] = vector
+            return vectors
+        finally:
+            self._exit()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        self._enter()
+        try:
+            vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+            async def run(batch: List[int], tokens: int):
+                batch_vectors = await self._aembed_batch([texts[i] for i in batch], tokens)
+                for i, vector in zip(batch, batch_vectors):
+                    vectors[i] = vector
+
+            # The limiter decides how many of these actually hit the API at once
+            await asyncio.gather(*(run(batch, tokens) for batch, tokens in self.make_batches(texts)))
+            return vectors
+        finally:
+            self._exit()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._with_retries(lambda: self.embeddings.embed_query(text), 1, count_tokens(text, self.model))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._awith_retries(lambda: self.embeddings.aembed_query(text), 1, count_tokens(text, self.model))
+
+    def make_batches(self, texts: List[str]) -> List[tuple]:
+        # Greedy packing in input order; an oversized text still gets a batch of its own
+        batches = []
+        batch: List[int] = []
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text, self.model)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                batches.append((batch, batch_tokens))
+                batch = []
+                batch_tokens = 0
+            batch.append(i)
+            batch_tokens += tokens
+
+        if batch:
+            batches.append((batch, batch_tokens))
+        return batches
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            busy = self._busy_seconds
+            if self._active_calls:
+                busy += time.perf_counter() - self._busy_since
+
+        stats.update({
+            "busy_seconds": round(busy, 3),
+            "embeddings_per_second": round(stats["texts"] / busy, 2) if busy else 0.0,
+            "tokens_per_second": round(stats["tokens"] / busy, 2) if busy else 0.0,
+            "concurrency": self.limiter.limit,
+            "max_concurrency": self.limiter.max_limit,
+            "max_batch_tokens": self.max_batch_tokens,
+            "max_batch_size": self.max_batch_size
+        })
+        return stats
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._stats_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.limiter.max_limit, thread_name_prefix="rag-embed")
+        return self._pool
+
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        return self._with_retries(lambda: self.embeddings.embed_documents(texts), len(texts), tokens)
+
+    async def _aembed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        return await self._awith_retries(lambda: self.embeddings.aembed_documents(texts), len(texts), tokens)
+
+    def _with_retries(self, call, count: int, tokens: int):
+        attempt = 0
+        while True:
+            # Threads share the concurrency cap with coroutines, so sync callers cannot exceed it
+            self.limiter.acquire_blocking()
+            try:
+                time.sleep(self.limiter.cooldown_remaining())
+                result = call()
+                self._record(count, tokens)
+                self.limiter.on_success()
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+            finally:
+                self.limiter.release()
+            time.sleep(delay)
+
+    async def _awith_retries(self, call, count: int, tokens: int):
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                await asyncio.sleep(self.limiter.cooldown_remaining())
+                result = await call()
+                self._record(count, tokens)
+                self.limiter.on_success()
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        rate_limited = _is_rate_limited(error)
+        if not rate_limited and not _is_transient(error):
+            self._count("failures")
+            return None
+        if attempt >= self.max_retries:
+            self._count("failures")
+            logger.error(f"Embedding request failed after {attempt} retries: {error}")
+            return None
+
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * (0.5 + random.random() / 2)
+
+        self._count("retries")
+        if rate_limited:
+            self._count("rate_limited")
+            self.limiter.on_rate_limit(delay)
+            logger.warning(
+                f"Embedding rate limited, retrying in {delay:.2f}s "
+                f"with concurrency {self.limiter.limit}/{self.limiter.max_limit}"
+            )
+        else:
+            logger.warning(f"Embedding request failed ({error}), retrying in {delay:.2f}s")
+        return delay
+
+    def _record(self, count: int, tokens: int):
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["texts"] += count
+            self._stats["tokens"] += tokens
+        EMBEDDING_TOKENS.inc(tokens)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _enter(self):
+        with self._stats_lock:
+            if not self._active_calls:
+                self._busy_since = time.perf_counter()
+            self._active_calls += 1
+
+    def _exit(self):
+        with self._stats_lock:
+            self._active_calls -= 1
+            if not self._active_calls:
+                self._busy_seconds += time.perf_counter() - self._busy_since
+
+
+class AdaptiveLimiter:
+    # Additive increase after a run of successes, multiplicative decrease on rate limits. Coroutines and
+    # threads draw on the same slots, so the async and sync engine paths are capped together.
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.active = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._waiters: List[Callable[[], None]] = []
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.active < self.limit:
+                    self.active += 1
+                    return
+                woken = asyncio.Event()
+                self._waiters.append(functools.partial(_wake, loop, woken))
+            await woken.wait()
+
+    def acquire_blocking(self):
+        with self._available:
+            self._available.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    def release(self):
+        with self._available:
+            self.active -= 1
+            waiters, self._waiters = self._waiters, []
+            self._available.notify_all()
+        for wake in waiters:
+            wake()
+
+    def cooldown_remaining(self) -> float:
+        return max(0.0, self._resume_at - time.monotonic())
+
+    def on_success(self):
+        with self._lock:
+            self._successes += 1
+            if self.limit < self.max_limit and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+
+    def on_rate_limit(self, delay: float):
+        # Every in-flight batch waits out the same window instead of hammering the API
+        with self._lock:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+
+def _wake(loop: asyncio.AbstractEventLoop, woken: asyncio.Event):
+    try:
+        loop.call_soon_threadsafe(woken.set)
+    except RuntimeError:
+        # The waiter's loop has closed; nothing is waiting on it any more
+        pass
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _is_transient(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500 or status == 408
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError") or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,151 @@
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+import asyncio
+import functools
+import multiprocessing
+import threading
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class ExecutionPool:
+    def __init__(self, name: str, max_workers: int, factory: Callable[[int], Executor]):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._factory(self.max_workers)
+                    logger.info(f"Started {self.name} pool with {self.max_workers} workers")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._get_executor(), call)
+            with self._lock:
+                self._completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "completed": self._completed,
+                "failed": self._failed,
+                "started": self._executor is not None
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+            logger.info(f"Shut down {self.name} pool")
+
+
+class RAGExecutor:
+    def __init__(self):
+        self.io_pool = ExecutionPool(
+            "io",
+            settings.IO_POOL_SIZE,
+            lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-io")
+        )
+        # Spawned workers avoid forking a process that already runs Chroma and HTTP client threads
+        self.cpu_pool = ExecutionPool(
+            "cpu",
+            settings.CPU_POOL_SIZE,
+            lambda workers: ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        )
+
+    async def run_io(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.io_pool.run(fn, *args, **kwargs)
+
+    async def run_cpu(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.cpu_pool.run(fn, *args, **kwargs)
+
+    async def iterate_io(
+        self,
+        make_iterator: Callable[..., Iterator[Any]],
+        *args,
+        maxsize: int = 2,
+        **kwargs
+    ) -> AsyncIterator[Any]:
+        # Drives a blocking iterator on the I/O pool; the bounded queue lets it run ahead by at most maxsize items
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        stop = threading.Event()
+        
+        def put(item: Any, error: Optional[BaseException] = None):
+            asyncio.run_coroutine_threadsafe(queue.put((item, error)), loop).result()
+        
+        def produce():
+            try:
+                for item in make_iterator(*args, **kwargs):
+                    if stop.is_set():
+                        return
+                    put(item)
+            except BaseException as e:
+                if not stop.is_set():
+                    put(_END, e)
+                return
+            if not stop.is_set():
+                put(_END)
+        
+        producer = asyncio.ensure_future(self.run_io(produce))
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    break
+                yield item
+        finally:
+            stop.set()
+            # Unblock a producer waiting on a full queue so its worker thread is released
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "io": self.io_pool.get_stats(),
+            "cpu": self.cpu_pool.get_stats()
+        }
+
+    def shutdown(self, wait: bool = True):
+        self.io_pool.shutdown(wait=wait)
+        self.cpu_pool.shutdown(wait=wait)
+
+
+executor = RAGExecutor()
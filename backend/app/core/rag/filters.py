@@ -0,0 +1,25 @@
+from typing import List, Dict, Any, Optional
+
+
+def build_where(
+    document_ids: Optional[List[str]] = None,
+    sources: Optional[List[str]] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    # Chroma metadata filter; a chunk matches a page range when any of its pages fall inside it
+    clauses = []
+    if document_ids:
+        clauses.append({"document_id": {"$in": list(document_ids)}})
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    if page_from is not None:
+        clauses.append({"page_end": {"$gte": page_from}})
+    if page_to is not None:
+        clauses.append({"page_start": {"$lte": page_to}})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
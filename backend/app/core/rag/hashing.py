@@ -0,0 +1,13 @@
+from typing import Union
+import hashlib
+
+
+def content_hash(content: Union[str, bytes]) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def chunk_id(document_id: str, chunk_hash: str) -> str:
+    # Scoped to the document so identical boilerplate in two papers stays two vectors
+    return content_hash(f"{document_id}:{chunk_hash}")
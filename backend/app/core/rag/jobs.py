@@ -0,0 +1,505 @@
+from typing import List, Dict, Any, Optional, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+import logging
+from app.config import settings
+from app.core.rag.executor import executor
+from app.core.rag.batch_ingest import list_batch_sources
+from app.core.rag.vector_store import recording_writes
+from app.core.rag.hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_JOB_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+JSON_COLUMNS = ("metadata", "progress", "result")
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+class JobStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.INGEST_JOB_DB_PATH or os.path.join(
+            settings.CHROMA_PERSIST_DIRECTORY, "ingest_jobs.sqlite3"
+        )
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "file_name TEXT NOT NULL, document_id TEXT, payload_path TEXT, "
+                "metadata TEXT, progress TEXT, result TEXT, error TEXT, "
+                "created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            # Job stores created before collections existed lack the column
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "collection_id" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN collection_id TEXT")
+            conn.commit()
+            self._conn = conn
+            logger.info(f"Opened ingestion job store at {self.path}")
+        return self._conn
+
+    def insert(self, job: Dict[str, Any]):
+        row = _encode(job)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                list(row.values())
+            )
+            conn.commit()
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        row = _encode(fields)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in row)} WHERE job_id = ?",
+                [*row.values(), job_id]
+            )
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _decode(row) if row else None
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs"
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [_decode(row) for row in rows]
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT * FROM jobs WHERE status IN ({', '.join('?' * len(ACTIVE_JOB_STATES))}) "
+                "ORDER BY created_at",
+                ACTIVE_JOB_STATES
+            ).fetchall()
+        return [_decode(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class IngestionJobManager:
+    def __init__(
+        self,
+        service,
+        workers: int = settings.INGEST_JOB_WORKERS,
+        max_queued: int = settings.INGEST_JOB_QUEUE_SIZE,
+        store: Optional[JobStore] = None,
+        payload_dir: Optional[str] = None
+    ):
+        self.service = service
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.store = store or JobStore()
+        self.payload_dir = payload_dir or os.path.join(
+            os.path.dirname(os.path.abspath(self.store.path)), "ingest_jobs"
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self._workers:
+            return
+
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        for job_id in await executor.run_io(self._recover):
+            self._queue.put_nowait(job_id)
+
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"ingest-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} ingestion workers ({self._queue.qsize()} jobs resumed)")
+
+    async def stop(self):
+        # Interrupted jobs go back to the queue and are picked up again on the next start
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self.store.close()
+
+    async def submit_pdf(
+        self,
+        path: str,
+        file_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        # The path is a staging file, which becomes the job's payload without being copied
+        self._check_capacity()
+        job = self._new_job("pdf", file_name, document_id, metadata, collection_id)
+        job["payload_path"] = path
+        return await self._enqueue(job)
+
+    async def submit_text(
+        self,
+        text: str,
+        source: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        self._check_capacity()
+        job = self._new_job("text", source, content_hash(text), metadata, collection_id)
+        await executor.run_io(self._write_payload_bytes, job["payload_path"], text.encode("utf-8"))
+        return await self._enqueue(job)
+
+    async def new_staging_file(self) -> str:
+        # Single uploads are written straight to a job payload file as they stream in
+        self._check_capacity()
+        await executor.run_io(os.makedirs, self.payload_dir, exist_ok=True)
+        return os.path.join(self.payload_dir, f"{uuid.uuid4().hex}.upload.pdf")
+
+    async def new_staging_directory(self) -> str:
+        # Multi-file uploads are written straight into a job payload directory as they stream in
+        self._check_capacity()
+        path = os.path.join(self.payload_dir, f"{uuid.uuid4().hex}.upload")
+        await executor.run_io(os.makedirs, path)
+        return path
+
+    async def discard_staging(self, path: str):
+        await executor.run_io(self._remove_payload, path)
+
+    async def submit_batch(
+        self,
+        path: str,
+        file_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        # The path is a staging directory, or a server-side directory or ZIP archive that is left in place
+        self._check_capacity()
+        sources = await executor.run_io(list_batch_sources, path)
+        job = self._new_job("batch", file_name, None, metadata, collection_id)
+        job["payload_path"] = path
+        job["progress"]["files_total"] = len(sources)
+        return await self._enqueue(job)
+
+    async def submit_reindex(self, collection_id: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        # Runs on the ingestion workers so it is queued, tracked and cancelled like any other job
+        self._check_capacity()
+        job = self._new_job(
+            "reindex", collection_id or settings.CHROMA_COLLECTION_NAME, None, {"force": force}, collection_id
+        )
+        job["payload_path"] = None
+        return await self._enqueue(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await executor.run_io(self.store.get, job_id)
+
+    async def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await executor.run_io(self.store.list, limit, status)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.wait({task})
+        else:
+            job = await self.get(job_id)
+            if job is not None and job["status"] == JOB_QUEUED:
+                # The worker skips it when it comes off the queue
+                await self._finish(job, JOB_CANCELLED, error="Cancelled before processing started")
+
+        return await self.get(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queued": self.max_queued,
+            "jobs": self.store.count_by_status()
+        }
+
+    def _check_capacity(self):
+        if self._queue is None:
+            raise RuntimeError("Ingestion job workers are not running")
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFullError(f"Ingestion queue is full ({self.max_queued} jobs waiting)")
+
+    def _new_job(
+        self,
+        kind: str,
+        file_name: str,
+        document_id: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        collection_id: Optional[str]
+    ) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": JOB_QUEUED,
+            "file_name": file_name,
+            "document_id": document_id,
+            "collection_id": collection_id,
+            "payload_path": os.path.join(self.payload_dir, f"{job_id}.{kind}"),
+            "metadata": metadata,
+            "progress": _empty_progress(),
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+
+    async def _enqueue(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            await executor.run_io(self.store.insert, job)
+        except Exception:
+            await executor.run_io(self._remove_payload, job["payload_path"])
+            raise
+
+        self._queue.put_nowait(job["job_id"])
+        logger.info(f"Queued ingestion job {job['job_id']} for {job['file_name']}")
+        return job
+
+    def _write_payload_bytes(self, path: str, data: bytes):
+        os.makedirs(self.payload_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _recover(self) -> List[str]:
+        resumed = []
+        for job in self.store.list_active():
+            if job["kind"] == "reindex" or (job["payload_path"] and os.path.exists(job["payload_path"])):
+                # Chunk IDs are content-addressed, so re-running skips whatever was stored before the restart.
+                # A re-index has no payload and starts over; its unfinished storage was dropped at startup.
+                self.store.update(job["job_id"], status=JOB_QUEUED, progress=_empty_progress())
+                resumed.append(job["job_id"])
+            else:
+                self.store.update(
+                    job["job_id"],
+                    status=JOB_FAILED,
+                    error="Interrupted by a restart and the uploaded payload is no longer available"
+                )
+                logger.warning(f"Marked interrupted ingestion job {job['job_id']} as failed")
+        return resumed
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.get(job_id)
+                if job is None or job["status"] != JOB_QUEUED:
+                    continue
+
+                task = asyncio.create_task(self._execute(job))
+                self._running[job_id] = task
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    # A cancelled job only stops its own task; the worker moves on unless we are shutting down
+                    if self._stopping:
+                        raise
+                finally:
+                    self._running.pop(job_id, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker failed on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        progress = _empty_progress()
+
+        async def report(totals: Dict[str, Any]):
+            progress.update(
+                pages_parsed=totals["pages_parsed"],
+                chunks_embedded=totals["cache_hits"] + totals["cache_misses"],
+                chunks_stored=totals["added"],
+                duplicate_chunks=totals["duplicates"]
+            )
+            for key in ("files_total", "files_done", "files_failed"):
+                if key in totals:
+                    progress[key] = totals[key]
+            await executor.run_io(self.store.update, job_id, progress=progress)
+
+        with recording_writes() as written:
+            try:
+                await executor.run_io(self.store.update, job_id, status=JOB_RUNNING, progress=progress)
+                logger.info(f"Started ingestion job {job_id} for {job['file_name']}")
+
+                if job["kind"] == "pdf":
+                    with _map_file(job["payload_path"]) as buffer:
+                        progress["total_pages"] = await executor.run_io(
+                            self.service.document_processor.count_pdf_pages, buffer
+                        )
+                        result = await self.service.aprocess_pdf_file(
+                            file_content=buffer,
+                            file_name=job["file_name"],
+                            metadata=job["metadata"],
+                            document_id=job["document_id"],
+                            progress=report,
+                            collection_id=job["collection_id"]
+                        )
+                elif job["kind"] == "reindex":
+                    result = await self.service.areindex(
+                        collection_id=job["collection_id"],
+                        force=bool((job["metadata"] or {}).get("force")),
+                        progress=report
+                    )
+                elif job["kind"] == "batch":
+                    result = await self.service.aprocess_pdf_batch(
+                        path=job["payload_path"],
+                        metadata=job["metadata"],
+                        progress=report,
+                        collection_id=job["collection_id"]
+                    )
+                else:
+                    text = await executor.run_io(_read_text, job["payload_path"])
+                    result = await self.service.aprocess_text(
+                        text=text,
+                        source=job["file_name"],
+                        metadata=job["metadata"],
+                        progress=report,
+                        collection_id=job["collection_id"]
+                    )
+
+                await self._finish(job, JOB_COMPLETED, result=result, progress=progress)
+                logger.info(f"Completed ingestion job {job_id}: {result['chunks_created']} chunks stored")
+
+            except asyncio.CancelledError:
+                if self._stopping:
+                    await asyncio.shield(
+                        executor.run_io(self.store.update, job_id, status=JOB_QUEUED, progress=_empty_progress())
+                    )
+                    raise
+
+                # Only chunks written by this job are removed; chunks shared with earlier uploads stay
+                if written:
+                    await executor.run_io(
+                        self.service.vector_store_manager.delete_chunks, written, job["collection_id"]
+                    )
+                progress["chunks_stored"] = 0
+                await self._finish(job, JOB_CANCELLED, error="Cancelled", progress=progress)
+                logger.info(f"Cancelled ingestion job {job_id}, removed {len(written)} partial chunks")
+                raise
+
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} failed: {e}")
+                await self._finish(job, JOB_FAILED, error=str(e), progress=progress)
+
+    async def _finish(self, job: Dict[str, Any], status: str, **fields):
+        await executor.run_io(self.store.update, job["job_id"], status=status, **fields)
+        await executor.run_io(self._remove_payload, job["payload_path"])
+
+    def _remove_payload(self, path: Optional[str]):
+        # Server-side batch paths are outside the payload directory and belong to whoever put them there
+        if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.payload_dir):
+            return
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            _remove_file(path)
+
+
+def _empty_progress() -> Dict[str, Any]:
+    return {
+        "pages_parsed": 0,
+        "total_pages": None,
+        "chunks_embedded": 0,
+        "chunks_stored": 0,
+        "duplicate_chunks": 0
+    }
+
+
+def _encode(fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        column: json.dumps(value) if column in JSON_COLUMNS and value is not None else value
+        for column, value in fields.items()
+    }
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    for column in JSON_COLUMNS:
+        if job.get(column) is not None:
+            job[column] = json.loads(job[column])
+    return job
+
+
+@contextmanager
+def _map_file(path: str) -> Iterator[memoryview]:
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            try:
+                view.release()
+                mapped.close()
+            except BufferError:
+                logger.debug("Job payload still referenced, leaving it to the garbage collector")
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _remove_file(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,214 @@
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Set, Callable
+from collections import Counter
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his
+how i if in into is it its itself just me more most my no nor not of off on once only or other our out over own
+same she should so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    # BM25 over chunk text, kept in memory and mirrored to SQLite so it survives restarts
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = settings.BM25_K1,
+        b: float = settings.BM25_B
+    ):
+        self.path = path or settings.LEXICAL_INDEX_PATH or os.path.join(
+            settings.CHROMA_PERSIST_DIRECTORY, "lexical_index.sqlite3"
+        )
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id TEXT PRIMARY KEY, length INTEGER NOT NULL, terms TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def load(self):
+        with self._lock:
+            if self.loaded:
+                return
+            rows = self._connect().execute("SELECT id, length, terms FROM chunks")
+            for chunk_id, length, terms in rows:
+                self._add_to_memory(chunk_id, length, json.loads(terms))
+            self.loaded = True
+            logger.info(f"Loaded lexical index with {len(self._lengths)} chunks from {self.path}")
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        rows = []
+        for chunk_id, text in zip(ids, texts):
+            tokens = tokenize(text)
+            rows.append((chunk_id, len(tokens), dict(Counter(tokens))))
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, length, terms) VALUES (?, ?, ?)",
+                [(chunk_id, length, json.dumps(terms)) for chunk_id, length, terms in rows]
+            )
+            conn.commit()
+            # Until the first load, SQLite is the only copy and load() picks these rows up
+            if self.loaded:
+                for chunk_id, length, terms in rows:
+                    self._remove_from_memory(chunk_id)
+                    self._add_to_memory(chunk_id, length, terms)
+
+    def remove(self, ids: Iterable[str]):
+        ids = list(ids)
+        if not ids:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            conn.commit()
+            if self.loaded:
+                for chunk_id in ids:
+                    self._remove_from_memory(chunk_id)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM chunks")
+            conn.commit()
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._lengths.clear()
+            self._total_length = 0
+
+    def ids(self) -> Set[str]:
+        with self._lock:
+            self.load()
+            return set(self._lengths)
+
+    def count(self) -> int:
+        with self._lock:
+            if self.loaded:
+                return len(self._lengths)
+            return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed: Optional[Callable[[List[str]], Set[str]]] = None
+    ) -> List[Tuple[str, float]]:
+        # allowed() narrows a window of candidate ids to those passing a metadata filter
+        scores = self._scores(query)
+        if allowed is None:
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        window = max(4 * k, 100)
+        results = []
+        for start in range(0, len(ranked), window):
+            candidates = ranked[start:start + window]
+            passing = allowed([chunk_id for chunk_id, _ in candidates])
+            results.extend(item for item in candidates if item[0] in passing)
+            if len(results) >= k:
+                break
+        return results[:k]
+
+    def _scores(self, query: str) -> Dict[str, float]:
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+
+        with self._lock:
+            self.load()
+            total = len(self._lengths)
+            if not terms or not total:
+                return scores
+
+            average_length = self._total_length / total
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "chunks": self.count(),
+                "terms": len(self._postings) if self.loaded else None,
+                "path": self.path
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _add_to_memory(self, chunk_id: str, length: int, terms: Dict[str, int]):
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+        self._doc_terms[chunk_id] = tuple(terms)
+        self._lengths[chunk_id] = length
+        self._total_length += length
+
+    def _remove_from_memory(self, chunk_id: str):
+        terms = self._doc_terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = settings.HYBRID_RRF_K) -> List[Tuple[str, float]]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
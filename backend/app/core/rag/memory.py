@@ -0,0 +1,130 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict, deque
+import threading
+import time
+import logging
+from app.config import settings
+from app.core.rag.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class SessionMemory:
+    def __init__(self, max_turns: int):
+        self.turns: deque = deque(maxlen=max_turns)
+        self.total_tokens = 0
+        self.last_access = time.monotonic()
+
+    def append(self, question: str, answer: str, tokens: int):
+        if len(self.turns) == self.turns.maxlen:
+            self.total_tokens -= self.turns[0][2]
+
+        self.turns.append((question, answer, tokens))
+        self.total_tokens += tokens
+
+
+class SessionMemoryStore:
+    def __init__(
+        self,
+        max_sessions: int = settings.MEMORY_MAX_SESSIONS,
+        ttl_seconds: int = settings.MEMORY_SESSION_TTL_SECONDS,
+        max_turns: int = settings.MEMORY_MAX_TURNS,
+        history_token_budget: int = settings.MEMORY_HISTORY_TOKEN_BUDGET
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.history_token_budget = history_token_budget
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def append(self, session_id: str, question: str, answer: str):
+        tokens = count_tokens(question) + count_tokens(answer)
+
+        with self._lock:
+            memory = self._touch(session_id, create=True)
+            memory.append(question, answer, tokens)
+            self._evict()
+
+    def get_window(self, session_id: str, token_budget: Optional[int] = None) -> List[Tuple[str, str]]:
+        budget = self.history_token_budget if token_budget is None else token_budget
+
+        with self._lock:
+            memory = self._touch(session_id)
+            if memory is None:
+                return []
+
+            window = []
+            used = 0
+            for question, answer, tokens in reversed(memory.turns):
+                if used + tokens > budget:
+                    break
+                window.append((question, answer))
+                used += tokens
+
+        window.reverse()
+        return window
+
+    def get_history(self, session_id: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            memory = self._touch(session_id)
+            if memory is None:
+                return []
+            return [(question, answer) for question, answer, _ in memory.turns]
+
+    def clear(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear_all(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict()
+            return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict()
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "stored_turns": sum(len(m.turns) for m in self._sessions.values()),
+                "stored_tokens": sum(m.total_tokens for m in self._sessions.values()),
+                "max_turns_per_session": self.max_turns,
+                "history_token_budget": self.history_token_budget,
+                "evictions": self._evictions
+            }
+
+    def _touch(self, session_id: str, create: bool = False) -> Optional[SessionMemory]:
+        memory = self._sessions.get(session_id)
+        if memory is not None and self._expired(memory):
+            del self._sessions[session_id]
+            self._evictions += 1
+            memory = None
+
+        if memory is None:
+            if not create:
+                return None
+            memory = SessionMemory(self.max_turns)
+            self._sessions[session_id] = memory
+
+        memory.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return memory
+
+    def _expired(self, memory: SessionMemory) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - memory.last_access > self.ttl_seconds
+
+    def _evict(self):
+        # Least recently used sessions sit at the front, so expired ones are found first
+        while self._sessions:
+            session_id, memory = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and not self._expired(memory):
+                break
+            del self._sessions[session_id]
+            self._evictions += 1
+            logger.info(f"Evicted conversation memory for session {session_id}")
@@ -0,0 +1,93 @@
+from typing import Dict, Iterator, Tuple
+from contextlib import contextmanager
+import time
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+
+# A registry of our own, so /metrics shows only these series and re-imports never clash
+REGISTRY = CollectorRegistry()
+
+# Sub-millisecond lookups up to minute-long generations
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each query and ingestion stage",
+    ["stage"],
+    buckets=_BUCKETS,
+    registry=REGISTRY
+)
+QUERIES = Counter("rag_queries", "Questions answered", ["chain", "cached"], registry=REGISTRY)
+LLM_TOKENS = Counter("rag_llm_tokens", "LLM tokens sent and generated (tiktoken estimate)", ["direction"], registry=REGISTRY)
+EMBEDDING_TOKENS = Counter("rag_embedding_tokens", "Tokens sent to the embedding model", registry=REGISTRY)
+DOCUMENTS_INGESTED = Counter("rag_documents_ingested", "Documents ingested", ["file_type"], registry=REGISTRY)
+CHUNKS_INGESTED = Counter("rag_chunks_ingested", "Chunks seen by ingestion", ["outcome"], registry=REGISTRY)
+PAGES_PARSED = Counter("rag_pages_parsed", "PDF pages extracted", registry=REGISTRY)
+CHUNKS_DELETED = Counter("rag_chunks_deleted", "Chunks removed by document deletes", registry=REGISTRY)
+BYTES_RECLAIMED = Counter("rag_compaction_reclaimed_bytes", "Disk space returned by compaction", registry=REGISTRY)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def observe_timings(timings: Dict[str, float], prefix: str = "query_"):
+    # Stage timings as reported in responses ({"retrieval_ms": 12.3, ...})
+    for name, value in timings.items():
+        if name.endswith("_ms"):
+            STAGE_SECONDS.labels(prefix + name[:-3]).observe(value / 1000)
+
+
+def record_llm_tokens(prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.labels("prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels("completion").inc(completion_tokens)
+
+
+class ServiceCollector:
+    # Gauges are read from the service when scraped rather than kept up to date on every change
+    def __init__(self, service):
+        self.service = service
+
+    def collect(self):
+        sessions = GaugeMetricFamily("rag_active_sessions", "Conversation sessions held in memory")
+        sessions.add_metric([], len(self.service.rag_chain.memory))
+        yield sessions
+
+        in_flight = GaugeMetricFamily("rag_pool_in_flight", "Calls running or waiting on an execution pool", labels=["pool"])
+        queue_depth = GaugeMetricFamily("rag_pool_queue_depth", "Calls waiting for a free pool worker", labels=["pool"])
+        for pool, stats in self.service.executor.get_stats().items():
+            in_flight.add_metric([pool], stats["in_flight"])
+            queue_depth.add_metric([pool], stats["queue_depth"])
+        yield in_flight
+        yield queue_depth
+
+        job_stats = self.service.jobs.get_stats()
+        job_queue = GaugeMetricFamily("rag_ingest_queue_depth", "Ingestion jobs waiting for a worker")
+        job_queue.add_metric([], job_stats["queued"])
+        yield job_queue
+        jobs_running = GaugeMetricFamily("rag_ingest_jobs_running", "Ingestion jobs being processed")
+        jobs_running.add_metric([], job_stats["running"])
+        yield jobs_running
+
+        chunks = GaugeMetricFamily("rag_vector_store_chunks", "Chunks in each collection", labels=["collection"])
+        for collection, count in self.service.vector_store_manager.chunk_counts().items():
+            chunks.add_metric([collection], count)
+        yield chunks
+
+        collection_stats = self.service.vector_store_manager.get_collection_stats()
+        open_collections = GaugeMetricFamily("rag_open_collections", "Collection handles held open")
+        open_collections.add_metric([], collection_stats["open"])
+        yield open_collections
+
+
+def register_service(service):
+    REGISTRY.register(ServiceCollector(service))
+
+
+def render() -> Tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,163 @@
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import zlib
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (kind, source, metadata, content): content is the extracted pages of a PDF, or the text of a text document
+CachedDocument = Tuple[str, str, Optional[Dict[str, Any]], Any]
+
+
+class PageTextCache:
+    # Extracted text per document, so a change to the chunking settings re-chunks from here instead of
+    # from the original upload, which is not kept. Content is compressed JSON, about a third of the text.
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.PAGE_TEXT_CACHE_PATH or os.path.join(
+            settings.CHROMA_PERSIST_DIRECTORY, "page_text_cache.sqlite3"
+        )
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Written by ingestion worker processes as well as the server
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # A PDF's pages are rows of their own, written as extraction streams through them; its
+            # documents row is written last, so a part-written document is never read back
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "document_id TEXT PRIMARY KEY, kind TEXT NOT NULL, source TEXT NOT NULL, "
+                "metadata TEXT, content BLOB, created_at TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "document_id TEXT NOT NULL, page INTEGER NOT NULL, blocks BLOB NOT NULL, "
+                "PRIMARY KEY (document_id, page))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def put(self, document_id: str, kind: str, source: str, metadata: Optional[Dict[str, Any]], content: Any):
+        blob = zlib.compress(json.dumps(content).encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM pages WHERE document_id = ?", (document_id,))
+            self._put_document(conn, document_id, kind, source, metadata, blob)
+            conn.commit()
+
+    def start_pages(self, document_id: str) -> str:
+        # Pages are written under a key of their own until finish_pages, so an earlier copy of the document
+        # stays readable meanwhile and two ingests of the same file never mix their pages
+        return f"{document_id}.{uuid.uuid4().hex[:12]}"
+
+    def put_pages(self, key: str, pages: List[Tuple[int, Any]]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (document_id, page, blocks) VALUES (?, ?, ?)",
+                [
+                    (key, page_number, zlib.compress(json.dumps(blocks).encode("utf-8")))
+                    for page_number, blocks in pages
+                ]
+            )
+            conn.commit()
+
+    def finish_pages(self, key: str, document_id: str, kind: str, source: str, metadata: Optional[Dict[str, Any]]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM pages WHERE document_id = ?", (document_id,))
+            conn.execute("UPDATE pages SET document_id = ? WHERE document_id = ?", (document_id, key))
+            self._put_document(conn, document_id, kind, source, metadata, None)
+            conn.commit()
+
+    def discard_pages(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM pages WHERE document_id = ?", (key,))
+            conn.commit()
+
+    def _put_document(
+        self,
+        conn: sqlite3.Connection,
+        document_id: str,
+        kind: str,
+        source: str,
+        metadata: Optional[Dict[str, Any]],
+        blob: Optional[bytes]
+    ):
+        conn.execute(
+            "INSERT OR REPLACE INTO documents (document_id, kind, source, metadata, content, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (document_id, kind, source, json.dumps(metadata) if metadata else None, blob, datetime.utcnow().isoformat())
+        )
+
+    def get(self, document_id: str) -> Optional[CachedDocument]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT kind, source, metadata, content FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            kind, source, metadata, blob = row
+            if blob is None:
+                content = [
+                    (page_number, json.loads(zlib.decompress(blocks)))
+                    for page_number, blocks in conn.execute(
+                        "SELECT page, blocks FROM pages WHERE document_id = ? ORDER BY page", (document_id,)
+                    )
+                ]
+            else:
+                content = json.loads(zlib.decompress(blob))
+        return kind, source, json.loads(metadata) if metadata else None, content
+
+    def contains(self, document_ids: List[str]) -> set:
+        found = set()
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(document_ids), 500):
+                batch = document_ids[start:start + 500]
+                found.update(
+                    document_id for (document_id,) in conn.execute(
+                        f"SELECT document_id FROM documents WHERE document_id IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                )
+        return found
+
+    def remove(self, document_ids: List[str]):
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(document_ids), 500):
+                batch = document_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(f"DELETE FROM documents WHERE document_id IN ({placeholders})", batch)
+                conn.execute(f"DELETE FROM pages WHERE document_id IN ({placeholders})", batch)
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            documents, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM documents"
+            ).fetchone()
+            pages, page_size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(blocks)), 0) FROM pages"
+            ).fetchone()
+        return {"documents": documents, "pages": pages, "bytes": size + page_size, "path": self.path}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
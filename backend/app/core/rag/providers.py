@@ -0,0 +1,52 @@
+from typing import Optional
+from langchain_core.embeddings import Embeddings, DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel, FakeListChatModel
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from app.config import settings
+
+FAKE_LLM_RESPONSE = "This is a stub answer generated without calling a language model."
+FAKE_EMBEDDING_PREFIX = "fake-"
+
+
+def embedding_model_name() -> str:
+    # Identifies the vectors an index holds; fake embeddings are named by their size
+    if settings.EMBEDDING_PROVIDER == "fake":
+        return f"{FAKE_EMBEDDING_PREFIX}{settings.FAKE_EMBEDDING_DIMENSIONS}"
+    if settings.EMBEDDING_PROVIDER != "openai":
+        raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+    return settings.OPENAI_EMBEDDING_MODEL
+
+
+def create_embeddings(model: Optional[str] = None) -> Embeddings:
+    # Another model than the configured one serves collections that have not been re-indexed yet
+    model = model or embedding_model_name()
+    # "fake" gives deterministic vectors with no network access, for benchmarks and offline runs
+    if model.startswith(FAKE_EMBEDDING_PREFIX):
+        return DeterministicFakeEmbedding(size=int(model[len(FAKE_EMBEDDING_PREFIX):]))
+
+    # Retries and batching are owned by the EmbeddingEngine, so the client sends exactly one request per batch
+    return OpenAIEmbeddings(
+        model=model,
+        openai_api_key=settings.OPENAI_API_KEY,
+        openai_api_base=settings.OPENAI_EMBEDDING_BASE_URL,
+        chunk_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_retries=0
+    )
+
+
+def create_chat_model(
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None
+) -> BaseChatModel:
+    if settings.LLM_PROVIDER == "fake":
+        return FakeListChatModel(responses=[FAKE_LLM_RESPONSE])
+    if settings.LLM_PROVIDER != "openai":
+        raise ValueError(f"Unknown LLM provider: {settings.LLM_PROVIDER}")
+
+    return ChatOpenAI(
+        model=model or settings.OPENAI_MODEL,
+        temperature=settings.TEMPERATURE if temperature is None else temperature,
+        openai_api_key=settings.OPENAI_API_KEY,
+        max_tokens=max_tokens
+    )
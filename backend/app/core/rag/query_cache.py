@@ -0,0 +1,118 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import logging
+from array import array
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Dict/key bookkeeping per entry on top of the vector and text themselves
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_bytes: int = settings.QUERY_EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], array]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get((model, text))
+            if vector is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end((model, text))
+            self._stats["hits"] += 1
+            return vector.tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        # float32 storage halves the footprint of Python floats; precision is well within embedding noise
+        vector = array("f", embedding)
+        size = _entry_size(text, vector)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop((model, text), None)
+            if previous is not None:
+                self._bytes -= _entry_size(text, previous)
+            self._entries[(model, text)] = vector
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                (_, old_text), old_vector = self._entries.popitem(last=False)
+                self._bytes -= _entry_size(old_text, old_vector)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class SearchResultMemo:
+    def __init__(self, max_entries: int = settings.QUERY_RESULT_MEMO_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[Tuple[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(
+        embedding: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        corpus_version: int,
+        collection: str = ""
+    ) -> str:
+        digest = hashlib.sha1(array("f", embedding).tobytes())
+        digest.update(json.dumps([k, filter, corpus_version, collection], sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Tuple[str, float]]]:
+        with self._lock:
+            hits = self._entries.get(key)
+            if hits is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return list(hits)
+
+    def put(self, key: str, hits: List[Tuple[str, float]]):
+        with self._lock:
+            self._entries[key] = list(hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"entries": len(self._entries), "max_entries": self.max_entries})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _entry_size(text: str, vector: array) -> int:
+    return len(text.encode("utf-8")) + len(vector) * vector.itemsize + ENTRY_OVERHEAD_BYTES
@@ -1,38 +1,67 @@
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+from typing import List, Dict, Any, Optional, AsyncIterator
+import asyncio
+import re
+import time
 from langchain.prompts import PromptTemplate
-from langchain.schema import Document, BaseMessage
+from langchain.schema import Document
+from langchain_core.output_parsers import StrOutputParser
 from app.config import settings
 from app.core.rag.vector_store import VectorStoreManager
+from app.core.rag.providers import create_chat_model
+from app.core.rag.memory import SessionMemoryStore
+from app.core.rag.reranker import ContextSelector, create_reranker
+from app.core.rag.lexical_index import reciprocal_rank_fusion
+from app.core.rag.executor import executor
+from app.core.rag.context_packer import context_budget
+from app.core.rag.tokens import count_tokens
+from app.core.rag.metrics import record_llm_tokens
 import logging
 
 logger = logging.getLogger(__name__)
 
+CONDENSE_TEMPLATE = """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
+
+Chat History:
+{chat_history}
+Follow Up Input: {question}
+Standalone question:"""
+
+# Words that usually point back into the conversation; "that" and "there" are too often used otherwise
+_FOLLOW_UP_WORDS = frozenset("""
+it its it's itself they them their theirs this these those he him his she her hers former latter above
+previous earlier aforementioned same such one ones
+""".split())
+_FOLLOW_UP_OPENERS = ("and ", "but ", "also ", "so ", "then ", "what about", "how about", "what else", "why not")
+_WORD = re.compile(r"[a-z']+")
+
+
+def is_follow_up(question: str) -> bool:
+    # Cheap check for questions that cannot be searched without the conversation; false positives only
+    # cost a condensation call, so it errs on that side
+    text = question.lower().strip()
+    words = _WORD.findall(text)
+    if len(words) <= 3 or text.startswith(_FOLLOW_UP_OPENERS):
+        return True
+    return any(word in _FOLLOW_UP_WORDS for word in words)
+
 
 class RAGChain:
-    def __init__(self, vector_store_manager: VectorStoreManager):
+    def __init__(self, vector_store_manager: VectorStoreManager, context_selector: Optional[ContextSelector] = None):
         self.vector_store_manager = vector_store_manager
+        self.context_selector = context_selector or ContextSelector(create_reranker())
         self.llm = self._initialize_llm()
-        self.memory = self._initialize_memory()
-        self.chain = None
+        self.condense_llm = self._initialize_condense_llm()
+        self.memory = SessionMemoryStore()
         self._setup_chain()
     
     def _initialize_llm(self):
-        return ChatOpenAI(
-            model=settings.OPENAI_MODEL,
-            temperature=settings.TEMPERATURE,
-            openai_api_key=settings.OPENAI_API_KEY,
-            max_tokens=settings.MAX_CONTEXT_LENGTH
-        )
+        return create_chat_model(max_tokens=settings.ANSWER_MAX_TOKENS)
     
-    def _initialize_memory(self):
-        return ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer"
-        )
+    def _initialize_condense_llm(self):
+        # Rewriting a follow-up is a short, mechanical task, so it can go to a smaller and faster model
+        if not settings.CONDENSE_MODEL:
+            return self.llm
+        return create_chat_model(max_tokens=settings.CONDENSE_MAX_TOKENS, model=settings.CONDENSE_MODEL, temperature=0)
     
     def _setup_chain(self):
         system_template = """You are an expert research assistant specializing in analyzing academic papers and research documents. 
@@ -48,87 +77,431 @@ class RAGChain:
         
         Provide a detailed, well-structured answer based on the research papers provided. Include relevant citations and page references when available."""
         
-        qa_prompt = PromptTemplate(
+        self.qa_prompt = PromptTemplate(
             template=system_template,
             input_variables=["context", "chat_history", "question"]
         )
+        self.condense_prompt = PromptTemplate.from_template(CONDENSE_TEMPLATE)
         
-        retriever = self.vector_store_manager.get_retriever()
-        
-        self.chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=retriever,
-            memory=self.memory,
-            combine_docs_chain_kwargs={"prompt": qa_prompt},
-            return_source_documents=True,
-            verbose=True
-        )
+        self.answer_chain = self.qa_prompt | self.llm | StrOutputParser()
+        self.condense_chain = self.condense_prompt | self.condense_llm | StrOutputParser()
     
-    def query(self, question: str, chat_history: Optional[List[tuple]] = None) -> Dict[str, Any]:
+    def query(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         try:
-            if chat_history:
-                for human, ai in chat_history:
-                    self.memory.chat_memory.add_user_message(human)
-                    self.memory.chat_memory.add_ai_message(ai)
-            
-            response = self.chain({"question": question})
-            
-            sources = []
-            for doc in response.get("source_documents", []):
-                sources.append({
-                    "content": doc.page_content[:200] + "...",
-                    "metadata": doc.metadata,
-                    "source": doc.metadata.get("source", "Unknown"),
-                    "chunk_index": doc.metadata.get("chunk_index", 0)
-                })
-            
-            return {
-                "answer": response["answer"],
-                "sources": sources,
-                "question": question
-            }
+            timings = {}
+            started = time.perf_counter()
+            chat_history_str = self._history_string(session_id)
+            
+            relevant_docs = self.vector_store_manager.retrieve_with_score(
+                question,
+                k=self.context_selector.candidate_count(k),
+                filter=filter,
+                collection_id=collection_id
+            )
+            search_question = question
+            if self._should_condense(question, chat_history_str):
+                stage_start = time.perf_counter()
+                condense_inputs = {"question": question, "chat_history": chat_history_str}
+                search_question = self.condense_chain.invoke(condense_inputs)
+                timings["condense_ms"] = _elapsed_ms(stage_start)
+                self._record_usage(self.condense_prompt, condense_inputs, search_question)
+                relevant_docs = self._fuse(
+                    self.vector_store_manager.retrieve_with_score(
+                        search_question,
+                        k=self.context_selector.candidate_count(k),
+                        filter=filter,
+                        collection_id=collection_id
+                    ),
+                    relevant_docs,
+                    k
+                )
+            timings["retrieval_ms"] = round(_elapsed_ms(started) - timings.get("condense_ms", 0), 2)
+            
+            stage_start = time.perf_counter()
+            selected, context = self.context_selector.select(
+                search_question,
+                *_unzip(relevant_docs),
+                k=k,
+                token_budget=self._context_budget(search_question, chat_history_str)
+            )
+            timings["rerank_ms"] = _elapsed_ms(stage_start)
+            
+            stage_start = time.perf_counter()
+            answer_inputs = self._answer_inputs(selected, chat_history_str, search_question)
+            answer = self.answer_chain.invoke(answer_inputs)
+            timings["generation_ms"] = _elapsed_ms(stage_start)
+            self._record_usage(self.qa_prompt, answer_inputs, answer)
+            
+            self._remember(session_id, question, answer)
+            timings["total_ms"] = _elapsed_ms(started)
+            return self._format_response(question, answer, selected, context, timings)
             
         except Exception as e:
             logger.error(f"Failed to process query: {e}")
             raise
     
-    def clear_memory(self):
-        self.memory.clear()
-        logger.info("Cleared conversation memory")
+    async def aquery(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            timings = {}
+            started = time.perf_counter()
+            chat_history_str = self._history_string(session_id)
+            search_question, selected, context = await self._aprepare(
+                question, chat_history_str, k, filter, collection_id, timings
+            )
+            
+            stage_start = time.perf_counter()
+            answer_inputs = self._answer_inputs(selected, chat_history_str, search_question)
+            answer = await self.answer_chain.ainvoke(answer_inputs)
+            timings["generation_ms"] = _elapsed_ms(stage_start)
+            self._record_usage(self.qa_prompt, answer_inputs, answer)
+            
+            self._remember(session_id, question, answer)
+            timings["total_ms"] = _elapsed_ms(started)
+            return self._format_response(question, answer, selected, context, timings)
+            
+        except Exception as e:
+            logger.error(f"Failed to process query: {e}")
+            raise
     
-    def get_conversation_history(self) -> List[Dict[str, str]]:
-        messages = self.memory.chat_memory.messages
-        history = []
+    async def astream(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Same stages as aquery, but yields sources and tokens as they become available
+        timings = {}
+        started = time.perf_counter()
+        chat_history_str = self._history_string(session_id)
+        search_question, selected, context = await self._aprepare(
+            question, chat_history_str, k, filter, collection_id, timings
+        )
+        yield {"type": "sources", "sources": self._format_sources(selected)}
         
-        for i in range(0, len(messages), 2):
-            if i + 1 < len(messages):
-                history.append({
-                    "human": messages[i].content,
-                    "ai": messages[i + 1].content
-                })
+        stage_start = time.perf_counter()
+        answer_parts = []
+        answer_inputs = self._answer_inputs(selected, chat_history_str, search_question)
+        async for chunk in self.answer_chain.astream(answer_inputs):
+            if not chunk:
+                continue
+            if not answer_parts:
+                timings["first_token_ms"] = _elapsed_ms(started)
+            answer_parts.append(chunk)
+            yield {"type": "token", "content": chunk}
+        timings["generation_ms"] = _elapsed_ms(stage_start)
+        
+        answer = "".join(answer_parts)
+        self._record_usage(self.qa_prompt, answer_inputs, answer)
+        self._remember(session_id, question, answer)
+        timings["total_ms"] = _elapsed_ms(started)
+        yield {"type": "done", "question": question, "answer": answer, "context": context, "timings": timings}
+    
+    async def _aprepare(
+        self,
+        question: str,
+        chat_history_str: str,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        collection_id: Optional[str],
+        timings: Dict[str, float]
+    ) -> tuple[str, List[tuple[Document, float]], Dict[str, Any]]:
+        started = time.perf_counter()
+        candidates = self.context_selector.candidate_count(k)
+        # The raw question is searched while a follow-up is being condensed, so condensing adds no retrieval
+        # wait of its own and chunks matching the literal wording are not lost in the rewrite
+        raw_search = asyncio.ensure_future(
+            self.vector_store_manager.aretrieve_with_score(
+                question,
+                k=candidates,
+                filter=filter,
+                collection_id=collection_id
+            )
+        )
+        try:
+            search_question = question
+            if self._should_condense(question, chat_history_str):
+                stage_start = time.perf_counter()
+                condense_inputs = {"question": question, "chat_history": chat_history_str}
+                search_question = await self.condense_chain.ainvoke(condense_inputs)
+                timings["condense_ms"] = _elapsed_ms(stage_start)
+                self._record_usage(self.condense_prompt, condense_inputs, search_question)
+                condensed = await self.vector_store_manager.aretrieve_with_score(
+                    search_question,
+                    k=candidates,
+                    filter=filter,
+                    collection_id=collection_id
+                )
+                relevant_docs = self._fuse(condensed, await raw_search, k)
+            else:
+                relevant_docs = await raw_search
+        finally:
+            raw_search.cancel()
+        timings["retrieval_ms"] = round(_elapsed_ms(started) - timings.get("condense_ms", 0), 2)
         
-        return history
+        stage_start = time.perf_counter()
+        selected, context = await executor.run_io(
+            self.context_selector.select,
+            search_question,
+            *_unzip(relevant_docs),
+            k=k,
+            token_budget=self._context_budget(search_question, chat_history_str)
+        )
+        timings["rerank_ms"] = _elapsed_ms(stage_start)
+        return search_question, selected, context
+    
+    def _should_condense(self, question: str, chat_history_str: str) -> bool:
+        if not chat_history_str or settings.CONDENSE_MODE == "never":
+            return False
+        return settings.CONDENSE_MODE == "always" or is_follow_up(question)
+    
+    def _fuse(
+        self,
+        condensed: List[tuple[Document, float]],
+        raw: List[tuple[Document, float]],
+        k: int
+    ) -> List[tuple[Document, float]]:
+        documents = {doc.id: doc for doc, _ in raw + condensed}
+        fused = reciprocal_rank_fusion([[doc.id for doc, _ in condensed], [doc.id for doc, _ in raw]])
+        return [(documents[doc_id], score) for doc_id, score in fused[:self.context_selector.candidate_count(k)]]
+    
+    def _answer_inputs(
+        self,
+        selected: List[tuple[Document, float]],
+        chat_history_str: str,
+        question: str
+    ) -> Dict[str, str]:
+        return {
+            "context": "\n\n".join(doc.page_content for doc, _ in selected),
+            "chat_history": chat_history_str,
+            "question": question
+        }
+    
+    def _record_usage(self, prompt: PromptTemplate, inputs: Dict[str, str], output: str):
+        record_llm_tokens(count_tokens(prompt.format(**inputs)), count_tokens(output))
+    
+    def _context_budget(self, question: str, chat_history_str: str) -> int:
+        # History is already held to MEMORY_HISTORY_TOKEN_BUDGET; chunks get what the window has left
+        prompt = self.qa_prompt.format(context="", chat_history=chat_history_str, question=question)
+        return context_budget(count_tokens(prompt))
+    
+    def _history_string(self, session_id: Optional[str]) -> str:
+        return "".join(
+            f"\nHuman: {question}\nAssistant: {answer}"
+            for question, answer in self._get_history(session_id)
+        )
+    
+    def _get_history(self, session_id: Optional[str]) -> List[tuple]:
+        return self.memory.get_window(session_id) if session_id else []
+    
+    def _remember(self, session_id: Optional[str], question: str, answer: str):
+        if session_id:
+            self.memory.append(session_id, question, answer)
+    
+    def _format_response(
+        self,
+        question: str,
+        answer: str,
+        selected: List[tuple[Document, float]],
+        context: Dict[str, Any],
+        timings: Dict[str, float]
+    ) -> Dict[str, Any]:
+        logger.info(f"Answered question in {timings['total_ms']} ms ({timings})")
+        return {
+            "answer": answer,
+            "sources": self._format_sources(selected),
+            "question": question,
+            "context": context,
+            "timings": timings
+        }
+    
+    def _format_sources(self, selected: List[tuple[Document, float]]) -> List[Dict[str, Any]]:
+        sources = []
+        for doc, score in selected:
+            sources.append({
+                "content": doc.page_content[:200] + "...",
+                "metadata": doc.metadata,
+                "source": doc.metadata.get("source", "Unknown"),
+                "chunk_index": doc.metadata.get("chunk_index", 0),
+                "page_start": doc.metadata.get("page_start"),
+                "page_end": doc.metadata.get("page_end"),
+                "section": doc.metadata.get("section"),
+                "relevance_score": float(score)
+            })
+        return sources
+    
+    def clear_memory(self, session_id: Optional[str] = None):
+        if session_id:
+            self.memory.clear(session_id)
+            logger.info(f"Cleared conversation memory for session {session_id}")
+        else:
+            self.memory.clear_all()
+            logger.info("Cleared conversation memory")
+    
+    def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
+        return [
+            {"question": question, "answer": answer}
+            for question, answer in self.memory.get_history(session_id)
+        ]
 
 
 class SimpleRAGChain:
-    def __init__(self, vector_store_manager: VectorStoreManager):
+    def __init__(self, vector_store_manager: VectorStoreManager, context_selector: Optional[ContextSelector] = None):
         self.vector_store_manager = vector_store_manager
-        self.llm = ChatOpenAI(
-            model=settings.OPENAI_MODEL,
-            temperature=settings.TEMPERATURE,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.context_selector = context_selector or ContextSelector(create_reranker())
+        self.llm = create_chat_model(max_tokens=settings.ANSWER_MAX_TOKENS)
     
-    def query(self, question: str, k: int = settings.TOP_K_RESULTS) -> Dict[str, Any]:
+    def query(
+        self,
+        question: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         try:
-            relevant_docs = self.vector_store_manager.similarity_search_with_score(
+            timings = {}
+            started = time.perf_counter()
+            relevant_docs = self.vector_store_manager.retrieve_with_score(
                 query=question,
-                k=k
+                k=self.context_selector.candidate_count(k),
+                filter=filter,
+                collection_id=collection_id
+            )
+            timings["retrieval_ms"] = _elapsed_ms(started)
+            
+            stage_start = time.perf_counter()
+            selected, context = self.context_selector.select(
+                question,
+                *_unzip(relevant_docs),
+                k=k,
+                token_budget=self._context_budget(question)
             )
+            timings["rerank_ms"] = _elapsed_ms(stage_start)
+            
+            stage_start = time.perf_counter()
+            prompt = self._build_prompt(question, selected)
+            response = self.llm.invoke(prompt)
+            timings["generation_ms"] = _elapsed_ms(stage_start)
+            record_llm_tokens(count_tokens(prompt), count_tokens(response.content))
+            
+            timings["total_ms"] = _elapsed_ms(started)
+            return self._format_response(question, response.content, selected, context, timings)
+            
+        except Exception as e:
+            logger.error(f"Failed to process simple query: {e}")
+            raise
+    
+    async def aquery(
+        self,
+        question: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            timings = {}
+            started = time.perf_counter()
+            selected, context = await self._aselect_context(question, k, filter, collection_id, timings)
             
-            context = "\n\n".join([doc.page_content for doc, _ in relevant_docs])
+            stage_start = time.perf_counter()
+            prompt = self._build_prompt(question, selected)
+            response = await self.llm.ainvoke(prompt)
+            timings["generation_ms"] = _elapsed_ms(stage_start)
+            record_llm_tokens(count_tokens(prompt), count_tokens(response.content))
             
-            prompt = f"""You are an expert research assistant. Based on the following context from research papers, 
+            timings["total_ms"] = _elapsed_ms(started)
+            return self._format_response(question, response.content, selected, context, timings)
+            
+        except Exception as e:
+            logger.error(f"Failed to process simple query: {e}")
+            raise
+    
+    async def astream(
+        self,
+        question: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        timings = {}
+        started = time.perf_counter()
+        
+        selected, context = await self._aselect_context(question, k, filter, collection_id, timings)
+        yield {"type": "sources", "sources": self._format_sources(selected)}
+        
+        stage_start = time.perf_counter()
+        answer_parts = []
+        prompt = self._build_prompt(question, selected)
+        async for chunk in self.llm.astream(prompt):
+            if not chunk.content:
+                continue
+            if not answer_parts:
+                timings["first_token_ms"] = _elapsed_ms(started)
+            answer_parts.append(chunk.content)
+            yield {"type": "token", "content": chunk.content}
+        timings["generation_ms"] = _elapsed_ms(stage_start)
+        
+        answer = "".join(answer_parts)
+        record_llm_tokens(count_tokens(prompt), count_tokens(answer))
+        timings["total_ms"] = _elapsed_ms(started)
+        yield {
+            "type": "done",
+            "question": question,
+            "answer": answer,
+            "context": context,
+            "timings": timings
+        }
+    
+    async def _aselect_context(
+        self,
+        question: str,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        collection_id: Optional[str],
+        timings: Dict[str, float]
+    ) -> tuple[List[tuple[Document, float]], Dict[str, Any]]:
+        stage_start = time.perf_counter()
+        relevant_docs = await self.vector_store_manager.aretrieve_with_score(
+            query=question,
+            k=self.context_selector.candidate_count(k),
+            filter=filter,
+            collection_id=collection_id
+        )
+        timings["retrieval_ms"] = _elapsed_ms(stage_start)
+        
+        stage_start = time.perf_counter()
+        selected, context = await executor.run_io(
+            self.context_selector.select,
+            question,
+            *_unzip(relevant_docs),
+            k=k,
+            token_budget=self._context_budget(question)
+        )
+        timings["rerank_ms"] = _elapsed_ms(stage_start)
+        return selected, context
+    
+    def _context_budget(self, question: str) -> int:
+        return context_budget(count_tokens(self._build_prompt(question, [])))
+    
+    def _build_prompt(self, question: str, relevant_docs: List[tuple]) -> str:
+        context = "\n\n".join([doc.page_content for doc, _ in relevant_docs])
+        
+        return f"""You are an expert research assistant. Based on the following context from research papers, 
             provide a comprehensive answer to the question. Include citations when referencing specific information.
             
             Context:
@@ -137,24 +510,41 @@ class SimpleRAGChain:
             Question: {question}
             
             Answer:"""
-            
-            response = self.llm.predict(prompt)
-            
-            sources = []
-            for doc, score in relevant_docs:
-                sources.append({
-                    "content": doc.page_content[:200] + "...",
-                    "metadata": doc.metadata,
-                    "source": doc.metadata.get("source", "Unknown"),
-                    "relevance_score": float(score)
-                })
-            
-            return {
-                "answer": response,
-                "sources": sources,
-                "question": question
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to process simple query: {e}")
-            raise
\ No newline at end of file
+    
+    def _format_response(
+        self,
+        question: str,
+        answer: str,
+        relevant_docs: List[tuple],
+        context: Dict[str, Any],
+        timings: Dict[str, float]
+    ) -> Dict[str, Any]:
+        return {
+            "answer": answer,
+            "sources": self._format_sources(relevant_docs),
+            "question": question,
+            "context": context,
+            "timings": timings
+        }
+    
+    def _format_sources(self, relevant_docs: List[tuple]) -> List[Dict[str, Any]]:
+        sources = []
+        for doc, score in relevant_docs:
+            sources.append({
+                "content": doc.page_content[:200] + "...",
+                "metadata": doc.metadata,
+                "source": doc.metadata.get("source", "Unknown"),
+                "page_start": doc.metadata.get("page_start"),
+                "page_end": doc.metadata.get("page_end"),
+                "section": doc.metadata.get("section"),
+                "relevance_score": float(score)
+            })
+        return sources
+
+
+def _unzip(relevant_docs: List[tuple]) -> tuple[List[Document], List[float]]:
+    return [doc for doc, _ in relevant_docs], [score for _, score in relevant_docs]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
\ No newline at end of file
@@ -1,10 +1,19 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Union, Callable, Awaitable
+from contextlib import aclosing
+import json
 import logging
-import os
-import tempfile
+import time
 from app.core.rag.vector_store import VectorStoreManager
-from app.core.rag.document_processor import DocumentProcessor
+from app.core.rag.document_processor import DocumentProcessor, process_text_content
+from app.core.rag.executor import executor
+from app.core.rag.jobs import IngestionJobManager
+from app.core.rag.batch_ingest import BatchIngestor
+from app.core.rag.reindex import Reindexer
+from app.core.rag.answer_cache import AnswerCache
+from app.core.rag.hashing import content_hash
 from app.core.rag.rag_chain import RAGChain, SimpleRAGChain
+from app.core.rag.reranker import ContextSelector, create_reranker
+from app.core.rag import metrics
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -24,60 +33,229 @@ class RAGService:
             return
         
         self.vector_store_manager = VectorStoreManager()
-        self.document_processor = DocumentProcessor()
-        self.rag_chain = RAGChain(self.vector_store_manager)
-        self.simple_chain = SimpleRAGChain(self.vector_store_manager)
-        self.conversation_history = {}
+        self.document_processor = DocumentProcessor(self.vector_store_manager.page_cache)
+        # One selector for both chains, so a reranker model is loaded once
+        self.context_selector = ContextSelector(create_reranker())
+        self.rag_chain = RAGChain(self.vector_store_manager, self.context_selector)
+        self.simple_chain = SimpleRAGChain(self.vector_store_manager, self.context_selector)
+        self.executor = executor
+        self.jobs = IngestionJobManager(self)
+        self.batch_ingestor = BatchIngestor(self)
+        self.reindexer = Reindexer(self)
+        self.answer_cache = AnswerCache() if settings.ANSWER_CACHE_ENABLED else None
+        metrics.register_service(self)
         self._initialized = True
         logger.info("RAG Service initialized")
     
-    def process_pdf_file(self, file_content: bytes, file_name: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def process_pdf_file(
+        self,
+        file_content: Union[bytes, memoryview],
+        file_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(file_content)
-                tmp_file_path = tmp_file.name
+            started = time.perf_counter()
+            document_id = document_id or content_hash(file_content)
+            totals = self._new_index_totals()
             
-            documents = self.document_processor.process_pdf(
-                file_path=tmp_file_path,
-                file_name=file_name,
-                metadata=metadata
-            )
+            for batch in self.document_processor.iter_pdf_documents(
+                _as_buffer(file_content),
+                file_name,
+                metadata=metadata,
+                document_id=document_id
+            ):
+                self._accumulate(totals, self.vector_store_manager.index_documents(batch, collection_id=collection_id), batch)
+                if progress:
+                    progress(totals)
             
-            document_ids = self.vector_store_manager.add_documents(documents)
+            return self._ingest_result(f"Successfully processed {file_name}", document_id, totals, "pdf", started)
             
-            os.unlink(tmp_file_path)
+        except Exception as e:
+            logger.error(f"Failed to process PDF file: {e}")
+            raise
+    
+    async def aprocess_pdf_file(
+        self,
+        file_content: Union[bytes, memoryview],
+        file_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            started = time.perf_counter()
+            document_id = document_id or content_hash(file_content)
+            totals = self._new_index_totals()
             
-            return {
-                "success": True,
-                "message": f"Successfully processed {file_name}",
-                "document_id": documents[0].metadata.get("document_id"),
-                "chunks_created": len(documents),
-                "document_ids": document_ids
-            }
+            # Pages are parsed on the I/O pool while earlier batches are being embedded and stored
+            batches = self.executor.iterate_io(
+                self.document_processor.iter_pdf_documents,
+                _as_buffer(file_content),
+                file_name,
+                metadata=metadata,
+                document_id=document_id,
+                maxsize=settings.INGEST_PREFETCH_BATCHES
+            )
+            async with aclosing(batches):
+                async for batch in batches:
+                    self._accumulate(totals, await self.vector_store_manager.aindex_documents(batch, collection_id=collection_id), batch)
+                    if "first_batch_ms" not in totals:
+                        totals["first_batch_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                    if progress:
+                        await progress(totals)
+            
+            logger.info(
+                f"Indexed {file_name} in {round((time.perf_counter() - started) * 1000, 2)} ms "
+                f"(first batch after {totals.get('first_batch_ms')} ms)"
+            )
+            return self._ingest_result(f"Successfully processed {file_name}", document_id, totals, "pdf", started)
             
         except Exception as e:
             logger.error(f"Failed to process PDF file: {e}")
-            if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
             raise
     
-    def process_text(self, text: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def aprocess_pdf_batch(
+        self,
+        path: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            return await self.batch_ingestor.ingest(path, metadata=metadata, progress=progress, collection_id=collection_id)
+        except Exception as e:
+            logger.error(f"Failed to process PDF batch: {e}")
+            raise
+    
+    async def areindex(
+        self,
+        collection_id: Optional[str] = None,
+        force: bool = False,
+        progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         try:
+            result = await self.reindexer.reindex(collection_id, force=force, progress=progress)
+            if result["swapped"]:
+                self._invalidate_answers(_collection_name(collection_id))
+            return result
+        except Exception as e:
+            logger.error(f"Failed to re-index collection: {e}")
+            raise
+    
+    def _new_index_totals(self) -> Dict[str, Any]:
+        return {
+            "ids": [],
+            "added_ids": [],
+            "added": 0,
+            "duplicates": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "pages_parsed": 0
+        }
+    
+    def _accumulate(self, totals: Dict[str, Any], index_result: Dict[str, Any], batch: Optional[list] = None):
+        totals["ids"].extend(index_result["ids"])
+        totals["added_ids"].extend(index_result["added_ids"])
+        for key in ("added", "duplicates", "cache_hits", "cache_misses"):
+            totals[key] += index_result[key]
+        if batch:
+            totals["pages_parsed"] = max(totals["pages_parsed"], batch[-1].metadata.get("page_end", 0))
+    
+    def _ingest_result(
+        self,
+        message: str,
+        document_id: str,
+        index_result: Dict[str, Any],
+        file_type: str,
+        started: float
+    ) -> Dict[str, Any]:
+        metrics.STAGE_SECONDS.labels("ingest_document").observe(time.perf_counter() - started)
+        metrics.DOCUMENTS_INGESTED.labels(file_type).inc()
+        metrics.CHUNKS_INGESTED.labels("added").inc(index_result["added"])
+        metrics.CHUNKS_INGESTED.labels("duplicate").inc(index_result["duplicates"])
+        return {
+            "success": True,
+            "message": message,
+            "document_id": document_id,
+            "chunks_created": index_result["added"],
+            "document_ids": index_result["ids"],
+            "duplicate_chunks": index_result["duplicates"],
+            "cache_hits": index_result["cache_hits"],
+            "cache_misses": index_result["cache_misses"]
+        }
+    
+    def process_text(
+        self,
+        text: str,
+        source: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            started = time.perf_counter()
             documents = self.document_processor.process_text(
                 text=text,
                 source=source,
                 metadata=metadata
             )
+            if not documents:
+                raise ValueError("No text content")
             
-            document_ids = self.vector_store_manager.add_documents(documents)
+            index_result = self._new_index_totals()
+            self._accumulate(index_result, self.vector_store_manager.index_documents(documents, collection_id=collection_id))
+            if progress:
+                progress(index_result)
             
-            return {
-                "success": True,
-                "message": f"Successfully processed text from {source}",
-                "document_id": documents[0].metadata.get("document_id"),
-                "chunks_created": len(documents),
-                "document_ids": document_ids
-            }
+            return self._ingest_result(
+                f"Successfully processed text from {source}",
+                documents[0].metadata.get("document_id"),
+                index_result,
+                "text",
+                started
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to process text: {e}")
+            raise
+    
+    async def aprocess_text(
+        self,
+        text: str,
+        source: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            started = time.perf_counter()
+            # Chunking runs in a worker process, whose metrics are not exported, so it is timed here
+            with metrics.timed("split_chunks"):
+                documents = await self.executor.run_cpu(
+                    process_text_content,
+                    text=text,
+                    source=source,
+                    metadata=metadata
+                )
+            if not documents:
+                raise ValueError("No text content")
+            
+            index_result = self._new_index_totals()
+            self._accumulate(index_result, await self.vector_store_manager.aindex_documents(documents, collection_id=collection_id))
+            if progress:
+                await progress(index_result)
+            
+            return self._ingest_result(
+                f"Successfully processed text from {source}",
+                documents[0].metadata.get("document_id"),
+                index_result,
+                "text",
+                started
+            )
             
         except Exception as e:
             logger.error(f"Failed to process text: {e}")
@@ -87,21 +265,25 @@ class RAGService:
         self,
         question: str,
         session_id: Optional[str] = None,
-        use_conversation: bool = True
+        use_conversation: bool = True,
+        k: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
     ) -> Dict[str, Any]:
         try:
+            k = k or settings.TOP_K_RESULTS
             if use_conversation and session_id:
-                if session_id not in self.conversation_history:
-                    self.conversation_history[session_id] = []
-                
-                chat_history = self.conversation_history[session_id]
-                response = self.rag_chain.query(question, chat_history)
-                
-                self.conversation_history[session_id].append(
-                    (question, response["answer"])
+                response = self.rag_chain.query(
+                    question,
+                    session_id=session_id,
+                    k=k,
+                    filter=filter,
+                    collection_id=collection_id
                 )
+                _record_query("conversation", response)
             else:
-                response = self.simple_chain.query(question)
+                response = self._cached_query(question, k, filter, collection_id)
+                _record_query("simple", response)
             
             return response
             
@@ -109,74 +291,337 @@ class RAGService:
             logger.error(f"Failed to query documents: {e}")
             raise
     
-    def search_similar_documents(self, query: str, k: int = settings.TOP_K_RESULTS) -> List[Dict[str, Any]]:
+    async def aquery_documents(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        use_conversation: bool = True,
+        k: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         try:
-            results = self.vector_store_manager.similarity_search_with_score(query, k)
+            k = k or settings.TOP_K_RESULTS
+            if use_conversation and session_id:
+                response = await self.rag_chain.aquery(
+                    question,
+                    session_id=session_id,
+                    k=k,
+                    filter=filter,
+                    collection_id=collection_id
+                )
+                _record_query("conversation", response)
+            else:
+                response = await self._acached_query(question, k, filter, collection_id)
+                _record_query("simple", response)
             
-            formatted_results = []
-            for doc, score in results:
-                formatted_results.append({
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": float(score)
-                })
+            return response
             
-            return formatted_results
+        except Exception as e:
+            logger.error(f"Failed to query documents: {e}")
+            raise
+    
+    async def astream_query(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        use_conversation: bool = True,
+        k: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            k = k or settings.TOP_K_RESULTS
+            chain = "conversation" if use_conversation and session_id else "simple"
+            if chain == "conversation":
+                frames = self.rag_chain.astream(
+                    question,
+                    session_id=session_id,
+                    k=k,
+                    filter=filter,
+                    collection_id=collection_id
+                )
+            else:
+                frames = self._acached_stream(question, k, filter, collection_id)
+            
+            async with aclosing(frames):
+                async for frame in frames:
+                    if frame["type"] == "done":
+                        _record_query(chain, frame)
+                    yield frame
+                    
+        except Exception as e:
+            logger.error(f"Failed to stream query: {e}")
+            raise
+    
+    def _cached_query(
+        self,
+        question: str,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        collection_id: Optional[str]
+    ) -> Dict[str, Any]:
+        if self.answer_cache is None:
+            return self.simple_chain.query(question, k=k, filter=filter, collection_id=collection_id)
+        
+        started = time.perf_counter()
+        collection = _collection_name(collection_id)
+        version = self.vector_store_manager.corpus_version(collection)
+        scope = _answer_scope(collection, k, filter)
+        cached, embedding = self.answer_cache.get(question, version, scope), None
+        if cached is None and self.answer_cache.semantic:
+            embedding = self.vector_store_manager.embed_query(question, collection)
+            cached = self.answer_cache.get(question, version, scope, embedding)
+        if cached is not None:
+            return {**cached, "question": question, "cached": True, "timings": {"total_ms": _elapsed_ms(started)}}
+        
+        response = self.simple_chain.query(question, k=k, filter=filter, collection_id=collection_id)
+        self.answer_cache.put(question, version, scope, response, embedding, collection)
+        return response
+    
+    async def _acached_query(
+        self,
+        question: str,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        collection_id: Optional[str]
+    ) -> Dict[str, Any]:
+        if self.answer_cache is None:
+            return await self.simple_chain.aquery(question, k=k, filter=filter, collection_id=collection_id)
+        
+        started = time.perf_counter()
+        collection = _collection_name(collection_id)
+        version = self.vector_store_manager.corpus_version(collection)
+        scope = _answer_scope(collection, k, filter)
+        cached, embedding = await self._alookup_answer(question, version, scope, collection)
+        if cached is not None:
+            return {**cached, "question": question, "cached": True, "timings": {"total_ms": _elapsed_ms(started)}}
+        
+        response = await self.simple_chain.aquery(question, k=k, filter=filter, collection_id=collection_id)
+        self.answer_cache.put(question, version, scope, response, embedding, collection)
+        return response
+    
+    async def _acached_stream(
+        self,
+        question: str,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        collection_id: Optional[str]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if self.answer_cache is None:
+            frames = self.simple_chain.astream(question, k=k, filter=filter, collection_id=collection_id)
+            async with aclosing(frames):
+                async for frame in frames:
+                    yield frame
+            return
+        
+        started = time.perf_counter()
+        collection = _collection_name(collection_id)
+        version = self.vector_store_manager.corpus_version(collection)
+        scope = _answer_scope(collection, k, filter)
+        cached, embedding = await self._alookup_answer(question, version, scope, collection)
+        if cached is not None:
+            # Replayed as one token so clients handle hits and misses the same way
+            yield {"type": "sources", "sources": cached["sources"]}
+            yield {"type": "token", "content": cached["answer"]}
+            yield {
+                "type": "done",
+                "question": question,
+                "answer": cached["answer"],
+                "cached": True,
+                "context": cached.get("context"),
+                "timings": {"total_ms": _elapsed_ms(started)}
+            }
+            return
+        
+        sources = []
+        frames = self.simple_chain.astream(question, k=k, filter=filter, collection_id=collection_id)
+        async with aclosing(frames):
+            async for frame in frames:
+                if frame["type"] == "sources":
+                    sources = frame["sources"]
+                elif frame["type"] == "done":
+                    self.answer_cache.put(
+                        question,
+                        version,
+                        scope,
+                        {"answer": frame["answer"], "sources": sources, "question": question, "context": frame["context"]},
+                        embedding,
+                        collection
+                    )
+                yield frame
+    
+    async def _alookup_answer(self, question: str, version: int, scope: str, collection: str) -> tuple:
+        cached, embedding = self.answer_cache.get(question, version, scope), None
+        if cached is None and self.answer_cache.semantic:
+            embedding = await self.vector_store_manager.aembed_query(question, collection)
+            cached = self.answer_cache.get(question, version, scope, embedding)
+        return cached, embedding
+    
+    def search_similar_documents(
+        self,
+        query: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        try:
+            results = self.vector_store_manager.similarity_search_with_score(query, k, filter, collection_id)
+            return self._format_search_results(results)
+            
+        except Exception as e:
+            logger.error(f"Failed to search documents: {e}")
+            raise
+    
+    async def asearch_similar_documents(
+        self,
+        query: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        try:
+            results = await self.vector_store_manager.asimilarity_search_with_score(query, k, filter, collection_id)
+            return self._format_search_results(results)
             
         except Exception as e:
             logger.error(f"Failed to search documents: {e}")
             raise
     
+    def _format_search_results(self, results: List[tuple]) -> List[Dict[str, Any]]:
+        formatted_results = []
+        for doc, score in results:
+            formatted_results.append({
+                "content": doc.page_content,
+                "metadata": doc.metadata,
+                "similarity_score": float(score)
+            })
+        
+        return formatted_results
+    
     def clear_conversation(self, session_id: str):
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
-            logger.info(f"Cleared conversation for session {session_id}")
+        self.rag_chain.clear_memory(session_id)
     
     def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
-        if session_id not in self.conversation_history:
-            return []
-        
-        return [
-            {"question": q, "answer": a}
-            for q, a in self.conversation_history[session_id]
-        ]
+        return self.rag_chain.get_conversation_history(session_id)
     
-    def delete_document(self, document_id: str):
+    def delete_document(self, document_id: str, collection_id: Optional[str] = None):
         try:
-            self.vector_store_manager.clear_documents(document_id)
+            self.vector_store_manager.clear_documents(document_id, collection_id)
+            self._invalidate_answers(_collection_name(collection_id))
             logger.info(f"Deleted document {document_id}")
             return {"success": True, "message": f"Document {document_id} deleted"}
         except Exception as e:
             logger.error(f"Failed to delete document: {e}")
             raise
     
+    def delete_documents(self, document_ids: List[str], collection_id: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            result = self.vector_store_manager.delete_documents(document_ids, collection_id)
+            if result["deleted_chunks"]:
+                self._invalidate_answers(_collection_name(collection_id))
+            return {"success": True, **result}
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            raise
+    
+    def list_documents(self, collection_id: Optional[str] = None, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        return self.vector_store_manager.list_documents(collection_id, limit, offset)
+    
     def clear_all_documents(self):
         try:
-            self.vector_store_manager.clear_documents()
-            self.conversation_history.clear()
-            logger.info("Cleared all documents and conversations")
+            # Every collection is emptied in place; collections and conversations are kept
+            for collection_id in self.vector_store_manager.list_collections():
+                self.vector_store_manager.clear_documents(collection_id=collection_id)
+            self._invalidate_answers()
+            logger.info("Cleared all documents")
             return {"success": True, "message": "All documents cleared"}
         except Exception as e:
             logger.error(f"Failed to clear all documents: {e}")
             raise
     
+    def compact(self) -> Dict[str, Any]:
+        try:
+            return self.vector_store_manager.compact()
+        except Exception as e:
+            logger.error(f"Failed to compact storage: {e}")
+            raise
+    
+    def list_collections(self) -> List[Dict[str, Any]]:
+        return [{"collection_id": name} for name in self.vector_store_manager.list_collections()]
+    
+    def create_collection(self, collection_id: str) -> Dict[str, Any]:
+        return self.vector_store_manager.create_collection(collection_id)
+    
+    def get_collection_info(self, collection_id: str) -> Dict[str, Any]:
+        return self.vector_store_manager.get_collection_info(collection_id)
+    
+    def delete_collection(self, collection_id: str) -> Dict[str, Any]:
+        try:
+            self.vector_store_manager.delete_collection(collection_id)
+            self._invalidate_answers(collection_id)
+            return {"success": True, "message": f"Collection {collection_id} deleted"}
+        except Exception as e:
+            logger.error(f"Failed to delete collection: {e}")
+            raise
+    
+    def _invalidate_answers(self, collection: Optional[str] = None):
+        # Version bumps already retire a changed collection's answers; this frees them right away
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(collection)
+    
     def get_stats(self) -> Dict[str, Any]:
         try:
-            collection = self.vector_store_manager.vector_store._collection
-            count = collection.count()
+            count = self.vector_store_manager.count()
             
             return {
                 "total_chunks": count,
-                "active_sessions": len(self.conversation_history),
+                "active_sessions": len(self.rag_chain.memory),
                 "vector_store_status": "connected",
-                "embedding_model": settings.OPENAI_EMBEDDING_MODEL,
-                "llm_model": settings.OPENAI_MODEL
+                "vector_backend": self.vector_store_manager.get_backend_stats(),
+                "collections": self.vector_store_manager.get_collection_stats(),
+                "embedding_model": self.vector_store_manager.embedding_model,
+                "llm_model": settings.OPENAI_MODEL,
+                "execution_pools": self.executor.get_stats(),
+                "memory": self.rag_chain.memory.get_stats(),
+                "embeddings": self.vector_store_manager.embeddings.get_stats(),
+                "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None,
+                "query_cache": self.vector_store_manager.get_query_cache_stats(),
+                "lexical_index": self.vector_store_manager.get_lexical_index_stats(),
+                "context_selection": self.context_selector.get_stats(),
+                "ingestion_jobs": self.jobs.get_stats(),
+                "compaction": self.vector_store_manager.compactor.get_stats()
             }
         except Exception as e:
             logger.error(f"Failed to get stats: {e}")
             return {
                 "total_chunks": 0,
-                "active_sessions": len(self.conversation_history),
+                "active_sessions": len(self.rag_chain.memory),
                 "vector_store_status": "error",
+                "execution_pools": self.executor.get_stats(),
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+
+
+def _record_query(chain: str, response: Dict[str, Any]):
+    cached = bool(response.get("cached"))
+    metrics.QUERIES.labels(chain, str(cached).lower()).inc()
+    # A cache hit only times the lookup, which would skew the pipeline stage histograms
+    if not cached and response.get("timings"):
+        metrics.observe_timings(response["timings"])
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _collection_name(collection_id: Optional[str]) -> str:
+    return collection_id or settings.CHROMA_COLLECTION_NAME
+
+
+def _answer_scope(collection: str, k: int, filter: Optional[Dict[str, Any]]) -> str:
+    return json.dumps([collection, k, filter], sort_keys=True, default=str)
+
+
+def _as_buffer(file_content: Union[bytes, memoryview]) -> memoryview:
+    return file_content if isinstance(file_content, memoryview) else memoryview(file_content)
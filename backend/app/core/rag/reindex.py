@@ -0,0 +1,110 @@
+from typing import Dict, Any, Optional, Callable, Awaitable
+import asyncio
+import time
+import logging
+from app.core.rag.executor import executor
+from app.core.rag import metrics
+
+logger = logging.getLogger(__name__)
+
+# Documents rebuilt per step; each step is one embedding pass and one progress report
+REINDEX_STEP_DOCUMENTS = 32
+
+_REBUILD_COUNTS = {
+    "rechunked": "documents_rechunked",
+    "copied": "documents_copied",
+    "reembedded": "documents_reembedded",
+    "without_page_text": "documents_without_page_text",
+    "removed": "documents_removed",
+    "chunks_created": "chunks_created",
+    "chunks_copied": "chunks_copied"
+}
+
+
+class Reindexer:
+    # Builds a collection again in a new storage with the current chunking and embedding settings while the
+    # old storage keeps serving queries and writes, then catches up with those writes and swaps the new one in
+    def __init__(self, service):
+        self.service = service
+
+    async def reindex(
+        self,
+        collection_id: Optional[str] = None,
+        force: bool = False,
+        progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        manager = self.service.vector_store_manager
+        started = time.perf_counter()
+        totals = self.service._new_index_totals()
+        totals.update(files_total=0, files_done=0, files_failed=0, **{key: 0 for key in _REBUILD_COUNTS.values()})
+
+        with manager._use(collection_id) as live:
+            stale = await executor.run_io(manager.count_stale_documents, live)
+            if not stale and not force:
+                return _result(live.name, live.storage, live.embedding_model, manager, totals, started, False)
+
+            shadow = await executor.run_io(manager.open_reindex_storage, live)
+            rebuilt: Dict[str, str] = {}
+            try:
+                # Each step also picks up documents written or deleted since the previous one
+                while True:
+                    step = await executor.run_io(
+                        manager.sync_reindex_storage, live, shadow, rebuilt, force, REINDEX_STEP_DOCUMENTS
+                    )
+                    _accumulate(totals, step, len(rebuilt))
+                    if progress:
+                        await progress(totals)
+                    if not step["pending"]:
+                        break
+
+                step = await executor.run_io(manager.swap_reindex_storage, live, shadow, rebuilt, force)
+                _accumulate(totals, step, len(rebuilt))
+            except (Exception, asyncio.CancelledError):
+                # Queries never saw the new storage, so it is simply dropped
+                await asyncio.shield(executor.run_io(manager.discard_reindex_storage, shadow))
+                raise
+
+        metrics.STAGE_SECONDS.labels("reindex").observe(time.perf_counter() - started)
+        result = _result(live.name, shadow.storage, shadow.embedding_model, manager, totals, started, True)
+        logger.info(
+            f"Re-indexed collection {live.name} in {result['seconds']} s: {result['documents_rechunked']} documents "
+            f"re-chunked, {result['documents_copied']} copied, {result['documents_reembedded']} re-embedded, "
+            f"{result['documents_without_page_text']} without cached page text"
+        )
+        return result
+
+
+def _accumulate(totals: Dict[str, Any], step: Dict[str, Any], rebuilt: int):
+    for key, total_key in _REBUILD_COUNTS.items():
+        totals[total_key] += step[key]
+    totals["cache_hits"] += step["cache_hits"]
+    totals["cache_misses"] += step["cache_misses"]
+    totals["added"] = totals["chunks_created"] + totals["chunks_copied"]
+    totals["files_done"] = rebuilt
+    totals["files_total"] = rebuilt + step["pending"]
+
+
+def _result(
+    collection_id: str,
+    storage: str,
+    embedding_model: str,
+    manager,
+    totals: Dict[str, Any],
+    started: float,
+    swapped: bool
+) -> Dict[str, Any]:
+    seconds = time.perf_counter() - started
+    return {
+        "success": True,
+        "message": f"Re-indexed {totals['files_done']} documents" if swapped else "Collection is already up to date",
+        "collection_id": collection_id,
+        "storage": storage,
+        "embedding_model": embedding_model,
+        "chunking_version": manager.chunking_version,
+        "swapped": swapped,
+        "documents": totals["files_done"],
+        **{key: totals[key] for key in _REBUILD_COUNTS.values()},
+        "cache_hits": totals["cache_hits"],
+        "cache_misses": totals["cache_misses"],
+        "seconds": round(seconds, 3)
+    }
@@ -0,0 +1,180 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter
+import math
+import threading
+import logging
+from langchain.schema import Document
+from app.config import settings
+from app.core.rag.lexical_index import tokenize, reciprocal_rank_fusion
+from app.core.rag.context_packer import ContextPacker, chunk_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    name = "none"
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        raise NotImplementedError
+
+
+class LexicalReranker(Reranker):
+    # Query term coverage, weighted by how rare each term is among the candidates. It is fused with the
+    # retrieval order, so a semantically close chunk that lacks the exact words is demoted, not dropped.
+    name = "lexical"
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        terms = set(tokenize(query))
+        if not terms or not docs:
+            return [0.0] * len(docs)
+
+        doc_terms = [set(tokenize(doc.page_content)) & terms for doc in docs]
+        frequency = Counter(term for matched in doc_terms for term in matched)
+        weights = {term: math.log(1 + len(docs) / (1 + frequency[term])) for term in terms}
+        total = sum(weights.values())
+        coverage = [sum(weights[term] for term in matched) / total for matched in doc_terms]
+
+        retrieval_order = [str(i) for i in range(len(docs))]
+        coverage_order = [str(i) for i in sorted(range(len(docs)), key=lambda i: -coverage[i])]
+        fused = dict(reciprocal_rank_fusion([retrieval_order, coverage_order]))
+        return [fused[str(i)] for i in range(len(docs))]
+
+
+class CrossEncoderReranker(Reranker):
+    # A small CPU cross-encoder that reads the question and chunk together; optional dependency
+    name = "cross-encoder"
+
+    def __init__(self, model_name: Optional[str] = None):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("RERANKER=cross-encoder requires the sentence-transformers package") from e
+
+        self.model_name = model_name or settings.RERANKER_MODEL
+        self.model = CrossEncoder(self.model_name, device="cpu")
+        logger.info(f"Loaded cross-encoder reranker {self.model_name}")
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        if not docs:
+            return []
+        scores = self.model.predict([(query, doc.page_content) for doc in docs], show_progress_bar=False)
+        return [float(score) for score in scores]
+
+
+RERANKERS = {
+    LexicalReranker.name: LexicalReranker,
+    CrossEncoderReranker.name: CrossEncoderReranker
+}
+
+
+def create_reranker(name: Optional[str] = None) -> Optional[Reranker]:
+    name = name or settings.RERANKER
+    if name == "none":
+        return None
+    if name not in RERANKERS:
+        raise ValueError(f"Unknown RERANKER {name!r}, expected one of {sorted(RERANKERS) + ['none']}")
+    return RERANKERS[name]()
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = tokenize(text)
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return set(zip(*(words[i:] for i in range(size))))
+
+
+def containment(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+class ContextSelector:
+    # Retrieve many, send few: rerank a wide candidate set, drop near-duplicates (re-uploads repeat
+    # whole chunks), then pack the best chunks into the prompt token budget
+    def __init__(
+        self,
+        reranker: Optional[Reranker] = None,
+        candidates: int = settings.RERANK_CANDIDATES,
+        token_budget: int = settings.CONTEXT_TOKEN_BUDGET,
+        dedupe_threshold: float = settings.RERANK_DEDUPE_THRESHOLD,
+        packer: Optional[ContextPacker] = None
+    ):
+        self.reranker = reranker
+        self.candidates = candidates
+        self.token_budget = token_budget
+        self.dedupe_threshold = dedupe_threshold
+        self.packer = packer or ContextPacker()
+        self._totals = {
+            "queries": 0, "duplicates_removed": 0, "candidate_tokens": 0, "baseline_tokens": 0, "context_tokens": 0
+        }
+        self._lock = threading.Lock()
+
+    def candidate_count(self, k: int) -> int:
+        # Without a reranker, retrieving more than k would only be truncated again
+        return max(k, self.candidates) if self.reranker is not None else k
+
+    def select(
+        self,
+        query: str,
+        docs: List[Document],
+        scores: Optional[List[float]] = None,
+        k: int = settings.TOP_K_RESULTS,
+        token_budget: Optional[int] = None
+    ) -> Tuple[List[Tuple[Document, float]], Dict[str, Any]]:
+        if self.reranker is not None:
+            scores = self.reranker.score(query, docs)
+            order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        else:
+            # Retrieval order is kept as is; its scores may be distances or fusion scores
+            scores = scores if scores is not None else [0.0] * len(docs)
+            order = list(range(len(docs)))
+        token_counts = [chunk_tokens(doc) for doc in docs]
+
+        kept, kept_shingles, duplicates = [], [], 0
+        for i in order:
+            doc_shingles = shingles(docs[i].page_content)
+            if any(containment(doc_shingles, other) >= self.dedupe_threshold for other in kept_shingles):
+                duplicates += 1
+                continue
+            kept.append(i)
+            kept_shingles.append(doc_shingles)
+
+        budget = self.token_budget if token_budget is None else min(token_budget, self.token_budget)
+        selected, packing = self.packer.pack([(docs[i], scores[i]) for i in kept], budget, max_chunks=k)
+        context_tokens = packing["context_tokens"]
+
+        candidate_tokens = sum(token_counts)
+        # Savings are against what was sent before selection: the top k chunks in retrieval order
+        baseline_tokens = sum(token_counts[:k])
+        with self._lock:
+            self._totals["queries"] += 1
+            self._totals["duplicates_removed"] += duplicates
+            self._totals["candidate_tokens"] += candidate_tokens
+            self._totals["baseline_tokens"] += baseline_tokens
+            self._totals["context_tokens"] += context_tokens
+
+        return selected, {
+            "reranker": self.reranker.name if self.reranker is not None else "none",
+            "candidates": len(docs),
+            "duplicates_removed": duplicates,
+            "selected": len(selected),
+            "trimmed": packing["trimmed"],
+            "overlaps_removed": packing["overlaps_removed"],
+            "token_budget": budget,
+            "candidate_tokens": candidate_tokens,
+            "baseline_tokens": baseline_tokens,
+            "context_tokens": context_tokens,
+            "tokens_saved": baseline_tokens - context_tokens
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        return {
+            "reranker": self.reranker.name if self.reranker is not None else "none",
+            "candidates": self.candidates,
+            "token_budget": self.token_budget,
+            **totals,
+            "tokens_saved": totals["baseline_tokens"] - totals["context_tokens"]
+        }
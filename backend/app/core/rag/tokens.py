@@ -0,0 +1,34 @@
+from typing import Optional
+from functools import lru_cache
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough ratio for English prose, used when no tiktoken encoding can be loaded
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: Optional[str] = None):
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model or settings.OPENAI_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+
+    encoding = get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+
+    return len(encoding.encode(text, disallowed_special=()))
@@ -1,123 +1,978 @@
-from typing import List, Optional, Dict, Any
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
+from typing import List, Optional, Dict, Any, Tuple, Iterator
 from langchain.schema import Document
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import threading
+import uuid
 import logging
 from app.config import settings
+from app.core.rag.executor import executor
+from app.core.rag.embedding_cache import EmbeddingCache
+from app.core.rag.page_cache import PageTextCache
+from app.core.rag.query_cache import QueryEmbeddingCache, SearchResultMemo
+from app.core.rag.lexical_index import reciprocal_rank_fusion
+from app.core.rag.collection_pool import Collection, CollectionPool, CollectionNotFoundError, CollectionRetiredError
+from app.core.rag.document_registry import DocumentRegistry, ChunkEntry
+from app.core.rag.document_processor import DocumentProcessor, chunking_version
+from app.core.rag.compaction import Compactor
+from app.core.rag.backends import vacuum_sqlite
+from app.core.rag.embedding_engine import EmbeddingEngine
+from app.core.rag.providers import create_embeddings, embedding_model_name
+from app.core.rag.hashing import content_hash, chunk_id
+from app.core.rag import metrics
+from app.core.rag.metrics import timed
 
 logger = logging.getLogger(__name__)
 
+# Chunk IDs added to live collections by async writes made inside recording_writes(), per task
+_written_chunks: ContextVar[Optional[List[str]]] = ContextVar("written_chunks", default=None)
+
+
+@contextmanager
+def recording_writes() -> Iterator[List[str]]:
+    # Lets an ingestion job undo exactly what it stored, including a write that finished after it was cancelled
+    written: List[str] = []
+    token = _written_chunks.set(written)
+    try:
+        yield written
+    finally:
+        _written_chunks.reset(token)
+
 
 class VectorStoreManager:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.OPENAI_EMBEDDING_MODEL,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        # Each collection is queried with the model its vectors came from until a re-index moves it over
+        self.embedding_model = embedding_model_name()
+        self._engines: Dict[str, EmbeddingEngine] = {}
+        self._engines_lock = threading.Lock()
+        self.embeddings = self._engine(self.embedding_model)
+        self.chunking_version = chunking_version()
+        self.embedding_cache = EmbeddingCache() if settings.EMBEDDING_CACHE_ENABLED else None
+        self.page_cache = PageTextCache() if settings.PAGE_TEXT_CACHE_ENABLED else None
+        self.query_embedding_cache = QueryEmbeddingCache() if settings.QUERY_EMBEDDING_CACHE_MAX_MB > 0 else None
+        self.result_memo = SearchResultMemo() if settings.QUERY_RESULT_MEMO_ENABLED else None
+        self.hybrid_search = settings.HYBRID_SEARCH_ENABLED
         self.collection_name = settings.CHROMA_COLLECTION_NAME
         self.persist_directory = settings.CHROMA_PERSIST_DIRECTORY
-        self.vector_store = None
+        self.collections: Optional[CollectionPool] = None
+        self.registry = DocumentRegistry()
+        self.compactor = Compactor(self)
+        self._reindex_lock = threading.Lock()
         self._initialize_store()
     
     def _initialize_store(self):
         try:
-            chroma_settings = ChromaSettings(
-                persist_directory=self.persist_directory,
-                anonymized_telemetry=False
-            )
-            
-            self.vector_store = Chroma(
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory,
-                client_settings=chroma_settings
-            )
-            logger.info(f"Initialized Chroma vector store at {self.persist_directory}")
+            self.collections = CollectionPool(self.registry, self.embedding_model, lexical=self.hybrid_search)
+            self._discard_unfinished_reindexes()
+            with self._use(None, create=True) as collection:
+                logger.info(f"Initialized {collection.backend.name} vector store for collection {self.collection_name}")
+            self._warn_stale_collections()
         except Exception as e:
             logger.error(f"Failed to initialize vector store: {e}")
             raise
     
+    def _engine(self, model: str) -> EmbeddingEngine:
+        with self._engines_lock:
+            engine = self._engines.get(model)
+            if engine is None:
+                engine = self._engines[model] = EmbeddingEngine(create_embeddings(model), model=model)
+            return engine
+    
+    def _discard_unfinished_reindexes(self):
+        # A re-index interrupted by a restart is started again from scratch, so its partial storage goes
+        for name, entry in self.registry.storages().items():
+            if entry["building"]:
+                self.discard_reindex_storage(self.collections.open_storage(name, entry["building"], self.embedding_model))
+                logger.info(f"Discarded unfinished re-index of collection {name}")
+    
+    def _warn_stale_collections(self):
+        for name, entry in self.registry.storages().items():
+            stale = self._count_stale(entry["storage"], entry["embedding_model"])
+            if stale:
+                logger.warning(
+                    f"Collection {name} has {stale} documents indexed with other chunking or embedding settings; "
+                    f"POST /api/v1/rag/reindex to bring them up to date"
+                )
+    
+    def _count_stale(self, storage: str, embedding_model: str) -> int:
+        if embedding_model != self.embedding_model:
+            return self.registry.count(storage)["documents"]
+        return self.registry.count_stale(storage, self.chunking_version)
+    
+    def _use(self, collection_id: Optional[str], create: bool = False):
+        # Every read and write is scoped to one collection; None is the default CHROMA_COLLECTION_NAME
+        return self.collections.use(collection_id or self.collection_name, create=create)
+    
+    def corpus_version(self, collection_id: Optional[str] = None) -> int:
+        # Bumped on every change to a collection's chunks, so caches keyed by it never serve stale results
+        return self.collections.version(collection_id or self.collection_name)
+    
+    def collection_exists(self, collection_id: str) -> bool:
+        return self.collections.exists(collection_id)
+    
+    def list_collections(self) -> List[str]:
+        return self.collections.names()
+    
+    def create_collection(self, collection_id: str) -> Dict[str, Any]:
+        try:
+            with self._use(collection_id, create=True):
+                logger.info(f"Created collection {collection_id}")
+            return self.get_collection_info(collection_id)
+        except Exception as e:
+            logger.error(f"Failed to create collection: {e}")
+            raise
+    
+    def get_collection_info(self, collection_id: Optional[str] = None) -> Dict[str, Any]:
+        name = collection_id or self.collection_name
+        with self._use(name) as collection:
+            return {
+                "collection_id": name,
+                "chunks": collection.backend.count(),
+                "documents": self._registry_counts(collection)["documents"],
+                "version": self.collections.version(name),
+                "vector_backend": collection.backend.get_stats(),
+                "lexical_index": self._lexical_stats(collection),
+                "index": self._index_stats(collection)
+            }
+    
+    def _index_stats(self, collection: Collection) -> Dict[str, Any]:
+        entry = self.registry.storages().get(collection.name) or {}
+        return {
+            "storage": collection.storage,
+            "embedding_model": collection.embedding_model,
+            "current_embedding_model": self.embedding_model,
+            "current_chunking_version": self.chunking_version,
+            "stale_documents": self._count_stale(collection.storage, collection.embedding_model),
+            "reindexing": bool(entry.get("building"))
+        }
+    
+    def count(self, collection_id: Optional[str] = None) -> int:
+        with self._use(collection_id) as collection:
+            return collection.backend.count()
+    
+    def chunk_counts(self) -> Dict[str, int]:
+        # From the registry, so counting every collection does not open each one's index
+        manifest = self.registry.storages()
+        return {
+            name: self.registry.count((manifest.get(name) or {}).get("storage") or name)["chunks"]
+            for name in self.list_collections()
+        }
+    
+    def get_backend_stats(self, collection_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._use(collection_id) as collection:
+            return collection.backend.get_stats()
+    
     def add_documents(
         self,
         documents: List[Document],
         ids: Optional[List[str]] = None,
-        metadata: Optional[List[Dict[str, Any]]] = None
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        collection_id: Optional[str] = None
     ) -> List[str]:
+        return self.index_documents(documents, ids, metadata, collection_id)["ids"]
+    
+    async def aadd_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[str]:
+        return (await self.aindex_documents(documents, ids, metadata, collection_id))["ids"]
+    
+    def index_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            all_ids, documents, ids = self._prepare_documents(documents, ids, metadata)
+            
+            while True:
+                with self._use(collection_id, create=True) as collection:
+                    try:
+                        return self._index_into(collection, all_ids, documents, ids)
+                    except CollectionRetiredError:
+                        logger.info(f"Collection {collection.name} was re-indexed during a write, retrying")
+        except Exception as e:
+            logger.error(f"Failed to add documents: {e}")
+            raise
+    
+    def _index_into(
+        self,
+        collection: Collection,
+        all_ids: List[str],
+        documents: List[Document],
+        ids: List[str]
+    ) -> Dict[str, Any]:
+        existing = self._existing_ids(collection, ids)
+        new_docs = [(doc, doc_id) for doc, doc_id in zip(documents, ids) if doc_id not in existing]
+        
+        texts = [doc.page_content for doc, _ in new_docs]
+        hashes = [content_hash(text) for text in texts]
+        cached = self._cache_get(collection.embedding_model, hashes)
+        misses = self._missing_texts(texts, hashes, cached)
+        
+        if misses:
+            with timed("embed_documents"):
+                fresh = self._engine(collection.embedding_model).embed_documents(list(misses.values()))
+            self._cache_put(collection.embedding_model, misses.keys(), fresh)
+            cached.update(zip(misses.keys(), fresh))
+        
+        with timed("store_write"):
+            return self._write_new(collection, all_ids, new_docs, hashes, cached, len(misses))
+    
+    async def aindex_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        collection_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         try:
-            if metadata:
-                for doc, meta in zip(documents, metadata):
-                    doc.metadata.update(meta)
+            all_ids, documents, ids = self._prepare_documents(documents, ids, metadata)
             
-            ids = self.vector_store.add_documents(documents=documents, ids=ids)
-            logger.info(f"Added {len(documents)} documents to vector store")
-            return ids
+            while True:
+                with self._use(collection_id, create=True) as collection:
+                    try:
+                        return await self._aindex_into(collection, all_ids, documents, ids)
+                    except CollectionRetiredError:
+                        logger.info(f"Collection {collection.name} was re-indexed during a write, retrying")
         except Exception as e:
             logger.error(f"Failed to add documents: {e}")
             raise
     
-    def similarity_search(
+    async def _aindex_into(
+        self,
+        collection: Collection,
+        all_ids: List[str],
+        documents: List[Document],
+        ids: List[str]
+    ) -> Dict[str, Any]:
+        existing = await executor.run_io(self._existing_ids, collection, ids)
+        new_docs = [(doc, doc_id) for doc, doc_id in zip(documents, ids) if doc_id not in existing]
+        
+        texts = [doc.page_content for doc, _ in new_docs]
+        hashes = [content_hash(text) for text in texts]
+        cached = await executor.run_io(self._cache_get, collection.embedding_model, hashes)
+        misses = self._missing_texts(texts, hashes, cached)
+        
+        if misses:
+            with timed("embed_documents"):
+                fresh = await self._engine(collection.embedding_model).aembed_documents(list(misses.values()))
+            await executor.run_io(self._cache_put, collection.embedding_model, misses.keys(), fresh)
+            cached.update(zip(misses.keys(), fresh))
+        
+        with timed("store_write"):
+            # Cancelling this task cannot stop the write on its thread, so it is waited for and recorded either way
+            write = asyncio.ensure_future(
+                executor.run_io(self._write_new, collection, all_ids, new_docs, hashes, cached, len(misses))
+            )
+            try:
+                result = await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await asyncio.wait({write})
+                if not write.cancelled() and write.exception() is None:
+                    _record_written(collection, write.result()["added_ids"])
+                raise
+        _record_written(collection, result["added_ids"])
+        return result
+    
+    def _prepare_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]],
+        metadata: Optional[List[Dict[str, Any]]]
+    ) -> Tuple[List[str], List[Document], List[str]]:
+        if metadata:
+            for doc, meta in zip(documents, metadata):
+                doc.metadata.update(meta)
+        
+        if ids is None:
+            ids = [
+                chunk_id(doc.metadata.get("document_id", ""), doc.metadata.get("chunk_hash") or content_hash(doc.page_content))
+                for doc in documents
+            ]
+        
+        # Chroma rejects duplicate IDs within one upsert
+        unique = {}
+        for doc, doc_id in zip(documents, ids):
+            unique.setdefault(doc_id, doc)
+        
+        return ids, list(unique.values()), list(unique.keys())
+    
+    def _existing_ids(self, collection: Collection, ids: List[str]) -> set:
+        if not ids:
+            return set()
+        return set(collection.backend.get(ids=ids, include_content=False)["ids"])
+    
+    def _cache_get(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        if self.embedding_cache is None:
+            return {}
+        return self.embedding_cache.get_many(model, hashes)
+    
+    def _cache_put(self, model: str, hashes, embeddings: List[List[float]]):
+        if self.embedding_cache is not None:
+            self.embedding_cache.put_many(model, zip(hashes, embeddings))
+    
+    def _missing_texts(self, texts: List[str], hashes: List[str], cached: Dict[str, List[float]]) -> Dict[str, str]:
+        misses = {}
+        for text, chunk_hash in zip(texts, hashes):
+            if chunk_hash not in cached:
+                misses.setdefault(chunk_hash, text)
+        return misses
+    
+    def _write_new(
+        self,
+        collection: Collection,
+        all_ids: List[str],
+        new_docs: List[Tuple[Document, str]],
+        hashes: List[str],
+        embeddings: Dict[str, List[float]],
+        cache_misses: int
+    ) -> Dict[str, Any]:
+        if new_docs:
+            with self._writing(collection):
+                collection.backend.upsert(
+                    ids=[doc_id for _, doc_id in new_docs],
+                    embeddings=[embeddings[chunk_hash] for chunk_hash in hashes],
+                    metadatas=[doc.metadata for doc, _ in new_docs],
+                    documents=[doc.page_content for doc, _ in new_docs]
+                )
+                if collection.lexical_index is not None:
+                    collection.lexical_index.add([doc_id for _, doc_id in new_docs], [doc.page_content for doc, _ in new_docs])
+                self.registry.add(collection.storage, [_registry_entry(doc_id, doc) for doc, doc_id in new_docs])
+                self._bump_corpus_version(collection)
+        
+        cache_hits = len(new_docs) - cache_misses
+        logger.info(
+            f"Added {len(new_docs)} documents to collection {collection.name} "
+            f"({len(all_ids) - len(new_docs)} duplicates, {cache_hits} cached embeddings)"
+        )
+        return {
+            "ids": all_ids,
+            "added_ids": [doc_id for _, doc_id in new_docs],
+            "added": len(new_docs),
+            "duplicates": len(all_ids) - len(new_docs),
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses
+        }
+    
+    @contextmanager
+    def _writing(self, collection: Collection):
+        # Storage still being built by a re-index is written only by that re-index
+        if collection.building:
+            yield
+            return
+        with self.collections.write_lock(collection.name):
+            if collection.retired:
+                raise CollectionRetiredError(collection.name)
+            yield
+    
+    def embed_query(self, query: str, collection_id: Optional[str] = None) -> List[float]:
+        with self._use(collection_id) as collection:
+            return self._embed_query(collection.embedding_model, query)
+    
+    async def aembed_query(self, query: str, collection_id: Optional[str] = None) -> List[float]:
+        with self._use(collection_id) as collection:
+            return await self._aembed_query(collection.embedding_model, query)
+    
+    def _embed_query(self, model: str, query: str) -> List[float]:
+        embedding = self._cached_query_embedding(model, query)
+        if embedding is None:
+            with timed("embed_query"):
+                embedding = self._engine(model).embed_query(query)
+            self._store_query_embedding(model, query, embedding)
+        return embedding
+    
+    async def _aembed_query(self, model: str, query: str) -> List[float]:
+        embedding = self._cached_query_embedding(model, query)
+        if embedding is None:
+            with timed("embed_query"):
+                embedding = await self._engine(model).aembed_query(query)
+            self._store_query_embedding(model, query, embedding)
+        return embedding
+    
+    def retrieve_with_score(
         self,
         query: str,
         k: int = settings.TOP_K_RESULTS,
-        filter: Optional[Dict[str, Any]] = None
-    ) -> List[Document]:
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[tuple[Document, float]]:
+        # Chunks for answering: hybrid BM25 + vector when enabled, otherwise plain similarity search
+        if not self.hybrid_search:
+            return self.similarity_search_with_score(query=query, k=k, filter=filter, collection_id=collection_id)
+        
         try:
-            results = self.vector_store.similarity_search(
-                query=query,
-                k=k,
-                filter=filter
-            )
-            logger.info(f"Found {len(results)} similar documents for query")
+            with self._use(collection_id) as collection:
+                embedding = self._embed_query(collection.embedding_model, query)
+                results = self._hybrid_search(collection, query, embedding, k, filter)
+            logger.info(f"Found {len(results)} documents with hybrid search")
             return results
         except Exception as e:
-            logger.error(f"Failed to search documents: {e}")
+            logger.error(f"Failed to run hybrid search: {e}")
             raise
     
-    def similarity_search_with_score(
+    async def aretrieve_with_score(
         self,
         query: str,
         k: int = settings.TOP_K_RESULTS,
-        filter: Optional[Dict[str, Any]] = None
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
     ) -> List[tuple[Document, float]]:
+        if not self.hybrid_search:
+            return await self.asimilarity_search_with_score(query=query, k=k, filter=filter, collection_id=collection_id)
+        
         try:
-            results = self.vector_store.similarity_search_with_score(
-                query=query,
-                k=k,
-                filter=filter
+            # The query is embedded and searched with one handle, so a re-index swap cannot come in between
+            with self._use(collection_id) as collection:
+                embedding = await self._aembed_query(collection.embedding_model, query)
+                results = await executor.run_io(self._hybrid_search, collection, query, embedding, k, filter)
+            logger.info(f"Found {len(results)} documents with hybrid search")
+            return results
+        except Exception as e:
+            logger.error(f"Failed to run hybrid search: {e}")
+            raise
+    
+    def _hybrid_search(
+        self,
+        collection: Collection,
+        query: str,
+        embedding: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]]
+    ) -> List[tuple[Document, float]]:
+        candidates = max(k, settings.HYBRID_CANDIDATES)
+        vector_hits = self._search_by_vector(collection, embedding, candidates, filter)
+        
+        self._load_lexical_index(collection)
+        with timed("lexical_search"):
+            lexical_hits = collection.lexical_index.search(
+                query,
+                candidates,
+                allowed=(lambda ids: self._ids_matching(collection, ids, filter)) if filter else None
             )
+        
+        fused = reciprocal_rank_fusion([
+            [doc.id for doc, _ in vector_hits],
+            [doc_id for doc_id, _ in lexical_hits]
+        ])[:k]
+        
+        documents = {doc.id: doc for doc, _ in vector_hits}
+        missing = [doc_id for doc_id, _ in fused if doc_id not in documents]
+        if missing:
+            documents.update(self._get_documents(collection, missing))
+        return [(documents[doc_id], score) for doc_id, score in fused if doc_id in documents]
+    
+    def load_lexical_index(self, collection_id: Optional[str] = None):
+        with self._use(collection_id) as collection:
+            self._load_lexical_index(collection)
+    
+    def _load_lexical_index(self, collection: Collection):
+        if collection.lexical_index is None or collection.lexical_ready:
+            return
+        
+        with collection.lexical_lock:
+            if collection.lexical_ready:
+                return
+            collection.lexical_index.load()
+            if collection.lexical_index.count() != collection.backend.count():
+                self._sync_lexical_index(collection)
+            collection.lexical_ready = True
+    
+    def warm_lexical_index(self):
+        # Loads the default collection's index in the background so startup is not blocked; the first hybrid
+        # query waits if it is still loading. Other collections load on their first query.
+        if self.hybrid_search:
+            threading.Thread(target=self._warm_lexical_index, name="lexical-index-loader", daemon=True).start()
+    
+    def _warm_lexical_index(self):
+        try:
+            self.load_lexical_index()
+        except Exception as e:
+            logger.error(f"Failed to load lexical index: {e}")
+    
+    def _sync_lexical_index(self, collection: Collection):
+        # Brings the index in line with Chroma, e.g. for collections built before hybrid search existed
+        stored = set(collection.backend.get(include_content=False)["ids"])
+        indexed = collection.lexical_index.ids()
+        
+        collection.lexical_index.remove(indexed - stored)
+        missing = list(stored - indexed)
+        for start in range(0, len(missing), 500):
+            batch = collection.backend.get(ids=missing[start:start + 500])
+            collection.lexical_index.add(batch["ids"], batch["documents"])
+        logger.info(
+            f"Synced lexical index with collection {collection.name} "
+            f"({len(missing)} chunks added, {len(indexed - stored)} removed)"
+        )
+    
+    def _ids_matching(self, collection: Collection, ids: List[str], filter: Dict[str, Any]) -> set:
+        return set(collection.backend.get(ids=ids, where=filter, include_content=False)["ids"])
+    
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[tuple[Document, float]]:
+        try:
+            with self._use(collection_id) as collection:
+                results = self._search_by_vector(collection, self._embed_query(collection.embedding_model, query), k, filter)
             logger.info(f"Found {len(results)} similar documents with scores")
             return results
         except Exception as e:
             logger.error(f"Failed to search documents with score: {e}")
             raise
     
-    def delete_collection(self):
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[tuple[Document, float]]:
+        try:
+            with self._use(collection_id) as collection:
+                embedding = await self._aembed_query(collection.embedding_model, query)
+                results = await executor.run_io(self._search_by_vector, collection, embedding, k, filter)
+            logger.info(f"Found {len(results)} similar documents with scores")
+            return results
+        except Exception as e:
+            logger.error(f"Failed to search documents with score: {e}")
+            raise
+    
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[tuple[Document, float]]:
+        # Scores are Chroma distances (lower is closer), as returned by similarity_search_with_score
+        with self._use(collection_id) as collection:
+            return self._search_by_vector(collection, embedding, k, filter)
+    
+    def _search_by_vector(
+        self,
+        collection: Collection,
+        embedding: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]]
+    ) -> List[tuple[Document, float]]:
+        key = None
+        if self.result_memo is not None:
+            version = self.collections.version(collection.name)
+            key = self.result_memo.make_key(embedding, k, filter, version, collection.name)
+            hits = self.result_memo.get(key)
+            if hits is not None:
+                results = self._documents_for_hits(collection, hits)
+                if results is not None:
+                    return results
+        
+        with timed("vector_search"):
+            hits = collection.backend.query(embedding, k, filter)
+        results = [
+            (Document(id=doc_id, page_content=text, metadata=metadata), distance)
+            for doc_id, text, metadata, distance in hits
+        ]
+        
+        if key is not None:
+            self.result_memo.put(key, [(doc.id, distance) for doc, distance in results])
+        return results
+    
+    async def asimilarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = settings.TOP_K_RESULTS,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_id: Optional[str] = None
+    ) -> List[tuple[Document, float]]:
+        return await executor.run_io(self.similarity_search_by_vector_with_score, embedding, k, filter, collection_id)
+    
+    def _documents_for_hits(
+        self,
+        collection: Collection,
+        hits: List[Tuple[str, float]]
+    ) -> Optional[List[tuple[Document, float]]]:
+        if not hits:
+            return []
+        
+        by_id = self._get_documents(collection, [doc_id for doc_id, _ in hits])
+        if len(by_id) != len(hits):
+            return None
+        return [(by_id[doc_id], distance) for doc_id, distance in hits]
+    
+    def _get_documents(self, collection: Collection, ids: List[str]) -> Dict[str, Document]:
+        stored = collection.backend.get(ids=ids)
+        return {
+            doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        }
+    
+    def _cached_query_embedding(self, model: str, query: str) -> Optional[List[float]]:
+        if self.query_embedding_cache is None:
+            return None
+        return self.query_embedding_cache.get(model, query)
+    
+    def _store_query_embedding(self, model: str, query: str, embedding: List[float]):
+        if self.query_embedding_cache is not None:
+            self.query_embedding_cache.put(model, query, embedding)
+    
+    def get_query_cache_stats(self) -> Dict[str, Any]:
+        return {
+            "query_embeddings": self.query_embedding_cache.get_stats() if self.query_embedding_cache else None,
+            "result_memo": self.result_memo.get_stats() if self.result_memo else None
+        }
+    
+    def get_lexical_index_stats(self, collection_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._use(collection_id) as collection:
+            return self._lexical_stats(collection)
+    
+    def _lexical_stats(self, collection: Collection) -> Optional[Dict[str, Any]]:
+        if collection.lexical_index is None:
+            return None
+        return {**collection.lexical_index.get_stats(), "ready": collection.lexical_ready}
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        return self.collections.get_stats()
+    
+    def delete_collection(self, collection_id: Optional[str] = None):
         try:
-            if self.vector_store:
-                self.vector_store.delete_collection()
-                logger.info("Deleted vector store collection")
+            name = collection_id or self.collection_name
+            storage = self.collections.drop(name)
+            document_ids = list(self.registry.document_versions(storage))
+            self.registry.clear(storage)
+            self._forget_page_text(document_ids)
+            logger.info(f"Deleted vector store collection {name}")
         except Exception as e:
             logger.error(f"Failed to delete collection: {e}")
             raise
     
-    def clear_documents(self, document_id: Optional[str] = None):
+    def list_documents(self, collection_id: Optional[str] = None, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        with self._use(collection_id) as collection:
+            counts = self._registry_counts(collection)
+            documents = self.registry.documents(collection.storage, limit, offset)
+            model_changed = collection.embedding_model != self.embedding_model
+            for document in documents:
+                document["embedding_model"] = collection.embedding_model
+                document["stale"] = model_changed or document["chunking_version"] != self.chunking_version
+            return {
+                "collection_id": collection.name,
+                "total": counts["documents"],
+                "documents": documents
+            }
+    
+    def delete_documents(self, document_ids: List[str], collection_id: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            document_ids = list(dict.fromkeys(document_ids))
+            chunk_ids, ids = self._retrying(collection_id, self._delete_documents, document_ids)
+            self._forget_page_text(list(chunk_ids))
+            return {
+                "deleted_documents": [document_id for document_id in document_ids if document_id in chunk_ids],
+                "missing": [document_id for document_id in document_ids if document_id not in chunk_ids],
+                "deleted_chunks": len(ids)
+            }
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            raise
+    
+    def _delete_documents(self, collection: Collection, document_ids: List[str]) -> Tuple[Dict[str, List[str]], List[str]]:
+        with self._writing(collection):
+            self._load_registry(collection)
+            chunk_ids = self.registry.chunk_ids(collection.storage, document_ids)
+            ids = [doc_id for chunks in chunk_ids.values() for doc_id in chunks]
+            self._delete_ids(collection, ids)
+            self.registry.remove_documents(collection.storage, list(chunk_ids))
+        logger.info(f"Deleted {len(chunk_ids)} documents ({len(ids)} chunks) from collection {collection.name}")
+        return chunk_ids, ids
+    
+    def clear_documents(self, document_id: Optional[str] = None, collection_id: Optional[str] = None):
         try:
             if document_id:
-                collection = self.vector_store._collection
-                collection.delete(where={"document_id": document_id})
-                logger.info(f"Deleted documents with document_id: {document_id}")
-            else:
-                self.delete_collection()
-                self._initialize_store()
-                logger.info("Cleared all documents from vector store")
+                self.delete_documents([document_id], collection_id)
+                return
+            
+            # Deleted by ID in batches rather than dropping and recreating the collection under live queries
+            self._forget_page_text(self._retrying(collection_id, self._clear_documents))
         except Exception as e:
             logger.error(f"Failed to clear documents: {e}")
             raise
     
-    def get_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None):
-        if not search_kwargs:
-            search_kwargs = {"k": settings.TOP_K_RESULTS}
+    def _clear_documents(self, collection: Collection) -> List[str]:
+        with self._writing(collection):
+            document_ids = list(self.registry.document_versions(collection.storage))
+            self._delete_ids(collection, collection.backend.get(include_content=False)["ids"])
+            self.registry.clear(collection.storage)
+        logger.info(f"Cleared all documents from collection {collection.name}")
+        return document_ids
+    
+    def delete_chunks(self, ids: List[str], collection_id: Optional[str] = None):
+        try:
+            if ids:
+                self._retrying(collection_id, self._delete_chunks, ids)
+        except Exception as e:
+            logger.error(f"Failed to delete chunks: {e}")
+            raise
+    
+    def _delete_chunks(self, collection: Collection, ids: List[str]):
+        with self._writing(collection):
+            self._delete_ids(collection, ids)
+            self.registry.remove_chunks(collection.storage, ids)
+        logger.info(f"Deleted {len(ids)} chunks from collection {collection.name}")
+    
+    def _retrying(self, collection_id: Optional[str], write, *args):
+        # A write that finds its handle swapped out by a re-index is redone against the storage that replaced it
+        while True:
+            with self._use(collection_id) as collection:
+                try:
+                    return write(collection, *args)
+                except CollectionRetiredError:
+                    logger.info(f"Collection {collection.name} was re-indexed during a write, retrying")
+    
+    def _delete_ids(self, collection: Collection, ids: List[str]):
+        # Each batch takes the backend's locks briefly, so queries run between batches of a large delete
+        batch_size = max(1, settings.DELETE_BATCH_SIZE)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            collection.backend.delete(batch)
+            if collection.lexical_index is not None:
+                collection.lexical_index.remove(batch)
+            self._bump_corpus_version(collection)
+            metrics.CHUNKS_DELETED.inc(len(batch))
+        self.compactor.note_deleted(collection.name, len(ids))
+    
+    def _forget_page_text(self, document_ids: List[str]):
+        # Page text is shared by every collection holding the document and goes with the last of them
+        if self.page_cache is None or not document_ids:
+            return
+        registered = self.registry.registered(document_ids)
+        self.page_cache.remove([document_id for document_id in document_ids if document_id not in registered])
+    
+    def _registry_counts(self, collection: Collection) -> Dict[str, int]:
+        self._load_registry(collection)
+        return self.registry.count(collection.storage)
+    
+    def _load_registry(self, collection: Collection):
+        if collection.registry_ready:
+            return
+        
+        with collection.registry_lock:
+            if collection.registry_ready:
+                return
+            if self.registry.count(collection.storage)["chunks"] != collection.backend.count():
+                self._sync_registry(collection)
+            collection.registry_ready = True
+    
+    def _sync_registry(self, collection: Collection):
+        # One metadata scan for collections written before the registry existed; later deletes use the registry
+        stored = set(collection.backend.get(include_content=False)["ids"])
+        registered = set(self.registry.all_chunk_ids(collection.storage))
+        
+        self.registry.remove_chunks(collection.storage, list(registered - stored))
+        missing = list(stored - registered)
+        for start in range(0, len(missing), 500):
+            batch = collection.backend.get(ids=missing[start:start + 500])
+            self.registry.add(collection.storage, [
+                _registry_entry(doc_id, Document(page_content=text, metadata=metadata))
+                for doc_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"])
+            ])
+        logger.info(
+            f"Synced document registry with collection {collection.name} "
+            f"({len(missing)} chunks added, {len(registered - stored)} removed)"
+        )
+    
+    def count_stale_documents(self, collection: Collection) -> int:
+        self._load_registry(collection)
+        return self._count_stale(collection.storage, collection.embedding_model)
+    
+    def open_reindex_storage(self, collection: Collection) -> Collection:
+        # The new storage is filled alongside the live one, which keeps serving until swap_reindex_storage
+        with self._reindex_lock:
+            entry = self.registry.storages().get(collection.name)
+            if entry is None:
+                raise CollectionNotFoundError(collection.name)
+            if entry["building"]:
+                raise ValueError(f"Collection {collection.name} is already being re-indexed")
+            storage = f"{collection.name[:46]}-r{uuid.uuid4().hex[:12]}"
+            self.registry.set_building(collection.name, storage)
+        logger.info(f"Re-indexing collection {collection.name} from {collection.storage} into {storage}")
+        return self.collections.open_storage(collection.name, storage, self.embedding_model)
+    
+    def discard_reindex_storage(self, shadow: Collection):
+        shadow.drop()
+        self.registry.clear(shadow.storage)
+        with self._reindex_lock:
+            entry = self.registry.storages().get(shadow.name)
+            if entry is not None and entry["building"] == shadow.storage:
+                self.registry.set_building(shadow.name, None)
+    
+    def sync_reindex_storage(
+        self,
+        live: Collection,
+        shadow: Collection,
+        rebuilt: Dict[str, str],
+        force: bool = False,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        # rebuilt maps each document in the new storage to the updated_at it had in the live one when it was
+        # rebuilt. Documents written or deleted since are rebuilt or removed, at most limit of them per call.
+        current = self.registry.document_versions(live.storage)
+        removed = [document_id for document_id in rebuilt if document_id not in current]
+        changed = [document_id for document_id, (_, updated_at) in current.items() if rebuilt.get(document_id) != updated_at]
+        batch = changed if limit is None else changed[:limit]
         
-        return self.vector_store.as_retriever(search_kwargs=search_kwargs)
\ No newline at end of file
+        outdated = removed + [document_id for document_id in batch if document_id in rebuilt]
+        if outdated:
+            chunk_ids = self.registry.chunk_ids(shadow.storage, outdated)
+            self._delete_ids(shadow, [doc_id for chunks in chunk_ids.values() for doc_id in chunks])
+            self.registry.remove_documents(shadow.storage, outdated)
+            for document_id in removed:
+                del rebuilt[document_id]
+            self._forget_page_text(removed)
+        
+        totals = self._rebuild_documents(live, shadow, {document_id: current[document_id][0] for document_id in batch}, force)
+        rebuilt.update((document_id, current[document_id][1]) for document_id in batch)
+        totals["removed"] = len(removed)
+        totals["pending"] = len(changed) - len(batch)
+        return totals
+    
+    def _rebuild_documents(
+        self,
+        live: Collection,
+        shadow: Collection,
+        versions: Dict[str, Optional[str]],
+        force: bool
+    ) -> Dict[str, Any]:
+        # Stale documents are re-chunked from their cached page text; the rest keep their chunks, whose
+        # vectors are copied over, or re-embedded from the stored text when the embedding model changed
+        reembed = live.embedding_model != shadow.embedding_model
+        processor = DocumentProcessor()
+        totals = _new_rebuild_totals()
+        rechunked: List[Document] = []
+        kept: List[str] = []
+        chunk_ids = self.registry.chunk_ids(live.storage, list(versions))
+        
+        for document_id, version in versions.items():
+            cached = None
+            if self.page_cache is not None and (force or reembed or version != self.chunking_version):
+                cached = self.page_cache.get(document_id)
+            if cached is not None:
+                try:
+                    rechunked.extend(processor.process_cached(document_id, cached))
+                    totals["rechunked"] += 1
+                    continue
+                except Exception as e:
+                    logger.error(f"Failed to re-chunk document {document_id}, keeping its chunks: {e}")
+            elif version != self.chunking_version:
+                totals["without_page_text"] += 1
+            kept.extend(chunk_ids.get(document_id, []))
+            totals["reembedded" if reembed else "copied"] += 1
+        
+        # Chunks whose text did not change hit the embedding cache
+        if rechunked:
+            all_ids, documents, ids = self._prepare_documents(rechunked, None, None)
+            _accumulate_rebuild(totals, self._index_into(shadow, all_ids, documents, ids))
+        for start in range(0, len(kept), 500):
+            _accumulate_rebuild(totals, self._copy_chunks(live, shadow, kept[start:start + 500], reembed))
+        return totals
+    
+    def _copy_chunks(self, live: Collection, shadow: Collection, ids: List[str], reembed: bool) -> Dict[str, Any]:
+        stored = live.backend.get(ids=ids)
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(stored["documents"], stored["metadatas"])]
+        if reembed:
+            return self._index_into(shadow, stored["ids"], documents, stored["ids"])
+        
+        vectors = live.backend.get_embeddings(stored["ids"])
+        new_docs = [(doc, doc_id) for doc, doc_id in zip(documents, stored["ids"]) if doc_id in vectors]
+        result = self._write_new(shadow, stored["ids"], new_docs, [doc_id for _, doc_id in new_docs], vectors, 0)
+        return {**result, "copied": result["added"], "added": 0, "cache_hits": 0}
+    
+    def swap_reindex_storage(
+        self,
+        live: Collection,
+        shadow: Collection,
+        rebuilt: Dict[str, str],
+        force: bool = False
+    ) -> Dict[str, Any]:
+        # Loaded up front so the first queries after the swap do not pay for it
+        self._load_lexical_index(shadow)
+        self._load_registry(shadow)
+        
+        # Writes to the collection wait while the last changes are carried over, so none are lost in the swap
+        with self.collections.write_lock(live.name):
+            totals = self.sync_reindex_storage(live, shadow, rebuilt, force)
+            with self._reindex_lock:
+                entry = self.registry.storages().get(live.name)
+                if entry is None or entry["building"] != shadow.storage:
+                    raise CollectionNotFoundError(live.name)
+                self.registry.set_storage(live.name, shadow.storage, shadow.embedding_model)
+            self.collections.swap(live.name, shadow)
+        logger.info(f"Swapped collection {live.name} over to {shadow.storage} ({shadow.embedding_model})")
+        return totals
+    
+    def compact(self, collection_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self.compactor.compact(collection_ids if collection_ids is not None else self.list_collections())
+    
+    def reclaim_space(self, collection_id: str) -> bool:
+        try:
+            with self._use(collection_id) as collection:
+                collection.backend.reclaim_space()
+                if collection.lexical_index is not None:
+                    vacuum_sqlite(collection.lexical_index.path)
+            return True
+        except CollectionNotFoundError:
+            # Dropped since its chunks were deleted; its files are already gone
+            return False
+    
+    def reclaim_registry_space(self):
+        vacuum_sqlite(self.registry.path)
+    
+    def _bump_corpus_version(self, collection: Collection):
+        # Storage being built by a re-index is not served yet; the swap bumps the version once
+        if not collection.building:
+            self.collections.bump_version(collection.name)
+
+
+def _record_written(collection: Collection, ids: List[str]):
+    written = _written_chunks.get()
+    # Storage being built by a re-index is discarded as a whole if it is cancelled
+    if written is not None and not collection.building:
+        written.extend(ids)
+
+
+def _new_rebuild_totals() -> Dict[str, Any]:
+    return {
+        "rechunked": 0,
+        "copied": 0,
+        "reembedded": 0,
+        "without_page_text": 0,
+        "chunks_created": 0,
+        "chunks_copied": 0,
+        "cache_hits": 0,
+        "cache_misses": 0
+    }
+
+
+def _accumulate_rebuild(totals: Dict[str, Any], result: Dict[str, Any]):
+    totals["chunks_created"] += result["added"]
+    totals["chunks_copied"] += result.get("copied", 0)
+    totals["cache_hits"] += result["cache_hits"]
+    totals["cache_misses"] += result["cache_misses"]
+
+
+def _registry_entry(doc_id: str, doc: Document) -> ChunkEntry:
+    tokens = doc.metadata.get("chunk_tokens")
+    return (
+        doc_id,
+        doc.metadata.get("document_id", ""),
+        doc.metadata.get("source"),
+        tokens if isinstance(tokens, int) else 0,
+        len(doc.page_content.encode("utf-8")),
+        doc.metadata.get("chunking_version")
+    )
\ No newline at end of file
@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api.routes import rag_routes, chat
+from app.core.rag import RAGService
+from app.core.rag.executor import executor
+from app.core.rag import metrics
 import logging
 
 logging.basicConfig(
@@ -47,17 +50,30 @@ async def health_check():
     }
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        # Collecting queries Chroma and SQLite, so it stays off the event loop
+        content, content_type = await executor.run_io(metrics.render)
+        return Response(content=content, media_type=content_type)
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
     logger.info(f"OpenAI Model: {settings.OPENAI_MODEL}")
     logger.info(f"Embedding Model: {settings.OPENAI_EMBEDDING_MODEL}")
     logger.info(f"Chroma persist directory: {settings.CHROMA_PERSIST_DIRECTORY}")
+    await RAGService().jobs.start()
+    RAGService().vector_store_manager.warm_lexical_index()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application")
+    await RAGService().jobs.stop()
+    RAGService().vector_store_manager.compactor.close()
+    executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
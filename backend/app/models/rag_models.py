@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, AliasChoices, model_validator
+from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 
 
@@ -9,24 +9,146 @@ class DocumentUploadResponse(BaseModel):
     document_id: str
     chunks_created: int
     document_ids: List[str]
+    duplicate_chunks: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+class BatchFileResult(BaseModel):
+    file_name: str
+    status: Optional[str] = None
+    document_id: Optional[str] = None
+    pages: int = 0
+    chunks_created: int = 0
+    duplicate_chunks: int = 0
+    error: Optional[str] = None
+
+
+class BatchIngestResponse(BaseModel):
+    success: bool
+    message: str
+    files: List[BatchFileResult]
+    files_total: int
+    files_completed: int
+    files_failed: int
+    pages: int
+    chunks_created: int
+    duplicate_chunks: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    write_batches: int = 0
+    seconds: float
+    pages_per_second: float
+    chunks_per_second: float
+
+
+class BatchPathRequest(BaseModel):
+    path: str = Field(..., description="Directory or ZIP archive of PDFs, relative to BATCH_INGEST_ROOT")
+    metadata: Optional[str] = None
+    collection_id: Optional[str] = None
+
+
+class ReindexRequest(BaseModel):
+    collection_id: Optional[str] = None
+    force: bool = Field(False, description="Re-chunk every document, not only those indexed with other settings")
+
+
+class ReindexResponse(BaseModel):
+    success: bool
+    message: str
+    collection_id: str
+    storage: str
+    embedding_model: str
+    chunking_version: str
+    swapped: bool
+    documents: int
+    documents_rechunked: int = 0
+    documents_copied: int = 0
+    documents_reembedded: int = 0
+    documents_without_page_text: int = 0
+    documents_removed: int = 0
+    chunks_created: int = 0
+    chunks_copied: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    seconds: float
+
+
+class JobProgress(BaseModel):
+    pages_parsed: int = 0
+    total_pages: Optional[int] = None
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    duplicate_chunks: int = 0
+    files_total: Optional[int] = None
+    files_done: int = 0
+    files_failed: int = 0
+
+
+class IngestionJob(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    file_name: str
+    document_id: Optional[str]
+    collection_id: Optional[str] = None
+    progress: JobProgress
+    result: Optional[Union[DocumentUploadResponse, BatchIngestResponse, ReindexResponse]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class JobSubmitResponse(BaseModel):
+    success: bool
+    message: str
+    job_id: str
+    status: str
+    document_id: Optional[str]
+    collection_id: Optional[str] = None
+
+
+class RetrievalFilters(BaseModel):
+    document_ids: Optional[List[str]] = Field(None, description="Only search chunks from these documents")
+    sources: Optional[List[str]] = Field(None, description="Only search chunks from these file names")
+    page_from: Optional[int] = Field(None, ge=1, description="First page of the range to search (PDFs only)")
+    page_to: Optional[int] = Field(None, ge=1, description="Last page of the range to search (PDFs only)")
+    
+    @model_validator(mode="after")
+    def check_page_range(self):
+        if self.page_from is not None and self.page_to is not None and self.page_from > self.page_to:
+            raise ValueError("page_from must not be greater than page_to")
+        return self
 
 
 class QueryRequest(BaseModel):
-    question: str = Field(..., description="The question to ask about the documents")
+    question: str = Field(
+        ...,
+        validation_alias=AliasChoices("question", "query"),
+        description="The question to ask about the documents"
+    )
+    collection_id: Optional[str] = Field(None, description="Collection to search (default: CHROMA_COLLECTION_NAME)")
     session_id: Optional[str] = Field(None, description="Session ID for conversation tracking")
     use_conversation: bool = Field(True, description="Whether to use conversation history")
-    k: int = Field(5, description="Number of relevant documents to retrieve")
+    k: Optional[int] = Field(None, ge=1, le=50, description="Number of relevant documents to retrieve (default: TOP_K_RESULTS)")
+    filters: Optional[RetrievalFilters] = Field(None, description="Restrict retrieval to specific documents or pages")
+    include_timings: bool = Field(False, description="Return per-stage latencies (ms) with the answer")
 
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
     question: str
+    cached: bool = False
+    context: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, float]] = None
 
 
 class SearchRequest(BaseModel):
     query: str = Field(..., description="Search query")
-    k: int = Field(5, description="Number of results to return")
+    collection_id: Optional[str] = Field(None, description="Collection to search (default: CHROMA_COLLECTION_NAME)")
+    k: int = Field(5, ge=1, le=100, description="Number of results to return")
+    filters: Optional[RetrievalFilters] = Field(None, description="Restrict the search to specific documents or pages")
 
 
 class SearchResult(BaseModel):
@@ -42,12 +164,69 @@ class ConversationHistory(BaseModel):
 
 class DocumentDeleteRequest(BaseModel):
     document_id: str = Field(..., description="ID of the document to delete")
+    collection_id: Optional[str] = Field(None, description="Collection holding the document (default: CHROMA_COLLECTION_NAME)")
+
+
+class DocumentsDeleteRequest(BaseModel):
+    document_ids: List[str] = Field(..., min_length=1, max_length=1000, description="IDs of the documents to delete")
+    collection_id: Optional[str] = Field(None, description="Collection holding the documents (default: CHROMA_COLLECTION_NAME)")
+
+
+class DocumentsDeleteResponse(BaseModel):
+    success: bool
+    deleted_documents: List[str]
+    missing: List[str]
+    deleted_chunks: int
+
+
+class DocumentSummary(BaseModel):
+    document_id: str
+    source: Optional[str] = None
+    chunks: int
+    tokens: int
+    bytes: int
+    chunking_version: Optional[str] = None
+    embedding_model: Optional[str] = None
+    stale: bool = False
+    created_at: str
+    updated_at: str
+
+
+class DocumentList(BaseModel):
+    collection_id: str
+    total: int
+    documents: List[DocumentSummary]
 
 
 class StatusResponse(BaseModel):
     total_chunks: int
     active_sessions: int
     vector_store_status: str
+    vector_backend: Optional[Dict[str, Any]] = None
+    collections: Optional[Dict[str, Any]] = None
     embedding_model: Optional[str]
     llm_model: Optional[str]
-    error: Optional[str] = None
\ No newline at end of file
+    execution_pools: Optional[Dict[str, Dict[str, Any]]] = None
+    memory: Optional[Dict[str, Any]] = None
+    ingestion_jobs: Optional[Dict[str, Any]] = None
+    embeddings: Optional[Dict[str, Any]] = None
+    answer_cache: Optional[Dict[str, Any]] = None
+    query_cache: Optional[Dict[str, Any]] = None
+    lexical_index: Optional[Dict[str, Any]] = None
+    context_selection: Optional[Dict[str, Any]] = None
+    compaction: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class CollectionCreateRequest(BaseModel):
+    collection_id: str = Field(..., description="Collection name: 3-63 letters, digits, '-' or '_'")
+
+
+class CollectionInfo(BaseModel):
+    collection_id: str
+    chunks: int
+    documents: Optional[int] = None
+    version: int
+    vector_backend: Optional[Dict[str, Any]] = None
+    lexical_index: Optional[Dict[str, Any]] = None
+    index: Optional[Dict[str, Any]] = None
@@ -1,4 +1,5 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any, AsyncIterator
+from contextlib import aclosing
 from datetime import datetime
 from app.models.chat import ChatMessage, ChatResponse, ChatSession, MessageRole
 from app.core.rag import RAGService
@@ -19,13 +20,7 @@ class ChatService:
         context: Optional[List[ChatMessage]] = None
     ) -> ChatResponse:
         
-        if session_id not in self.sessions:
-            self.sessions[session_id] = ChatSession(
-                session_id=session_id,
-                messages=[]
-            )
-        
-        session = self.sessions[session_id]
+        session = self._get_or_create_session(session_id)
         
         user_message = ChatMessage(
             role=MessageRole.USER,
@@ -56,26 +51,78 @@ class ChatService:
             sources=sources
         )
     
+    async def stream_message(
+        self,
+        message: str,
+        session_id: str,
+        context: Optional[List[ChatMessage]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        session = self._get_or_create_session(session_id)
+        session.messages.append(ChatMessage(role=MessageRole.USER, content=message))
+        yield {"type": "session", "session_id": session_id}
+        
+        answer = None
+        streamed_tokens = False
+        try:
+            frames = self.rag_service.astream_query(
+                question=message,
+                session_id=session_id,
+                use_conversation=True
+            )
+            async with aclosing(frames):
+                async for frame in frames:
+                    if frame["type"] == "sources":
+                        frame = {"type": "sources", "sources": self._source_names(frame["sources"])}
+                    elif frame["type"] == "token":
+                        streamed_tokens = True
+                    elif frame["type"] == "done":
+                        answer = frame["answer"]
+                    yield frame
+        except Exception as e:
+            if streamed_tokens:
+                raise
+            logger.warning(f"RAG stream failed: {e}")
+        
+        if not answer:
+            answer = self._fallback_response(message)
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", "question": message, "answer": answer, "timings": {}}
+        
+        session.messages.append(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+        session.updated_at = datetime.now()
+    
+    def _get_or_create_session(self, session_id: str) -> ChatSession:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = ChatSession(
+                session_id=session_id,
+                messages=[]
+            )
+        
+        return self.sessions[session_id]
+    
+    def _source_names(self, sources: List[Dict[str, Any]]) -> List[str]:
+        return [s.get("metadata", {}).get("source", "") for s in sources if s.get("metadata")]
+    
+    def _fallback_response(self, message: str) -> str:
+        return f"I'll help you with your research query: {message}. Please upload documents first to enable RAG-based responses."
+    
     async def _generate_response_with_rag(self, message: str, session_id: str) -> tuple[str, List[str]]:
         """Generate response using RAG service"""
         try:
             # Use the correct method name from RAGService
-            result = self.rag_service.query_documents(
+            result = await self.rag_service.aquery_documents(
                 question=message,
                 session_id=session_id,
                 use_conversation=True
             )
             
             if result and result.get("answer"):
-                sources = []
-                if result.get("sources"):
-                    sources = [s.get("metadata", {}).get("source", "") for s in result["sources"] if s.get("metadata")]
-                return result["answer"], sources
+                return result["answer"], self._source_names(result.get("sources") or [])
         except Exception as e:
             logger.warning(f"RAG query failed: {e}")
         
         # Fallback response
-        return f"I'll help you with your research query: {message}. Please upload documents first to enable RAG-based responses.", []
+        return self._fallback_response(message), []
     
     async def _generate_response(self, message: str, history: List[ChatMessage]) -> str:
         return f"I'll help you with: {message}. Please upload research papers to enable document-based responses."
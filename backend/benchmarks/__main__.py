@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.common import configure_offline_environment, environment_info
+
+SUITES = ("ingestion", "vector_store", "query")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Offline benchmarks with deterministic fake embeddings and a stub LLM"
+    )
+    parser.add_argument("--suite", action="append", choices=SUITES, help="Suite to run (repeatable, default: all)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--workdir", help="Scratch directory for vector stores (default: a temp dir, removed afterwards)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions for ingestion timings (median is reported)")
+    parser.add_argument("--pdf-pages", type=int, default=200, help="Pages in the synthetic ingestion PDF")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="Comma separated vector store sizes in chunks")
+    parser.add_argument(
+        "--backends",
+        default="chroma,numpy",
+        help="Comma separated vector backends to compare on the same corpus, e.g. chroma,numpy,numpy:float16,numpy:int8"
+    )
+    parser.add_argument("--insert-batch", type=int, default=512, help="Chunks per vector store insert")
+    parser.add_argument("--search-queries", type=int, default=200, help="Searches timed per vector store size")
+    parser.add_argument("--requests", type=int, default=500, help="Total /rag/query requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent /rag/query clients")
+    parser.add_argument("--corpus-pages", type=int, default=100, help="Pages indexed before the query benchmark")
+    parser.add_argument("--conversation", action="store_true", help="Query through the conversational chain")
+    parser.add_argument("--embedding-cache", action="store_true", help="Keep the persistent embedding cache enabled")
+    return parser.parse_args(argv)
+
+
+async def run_suites(args: argparse.Namespace, workdir: str) -> dict:
+    # Imported here so the offline environment is in place before Settings is loaded
+    from benchmarks import ingestion, vector_store, query
+
+    results = {}
+    suites = args.suite or SUITES
+
+    if "ingestion" in suites:
+        print(f"Running ingestion benchmark ({args.pdf_pages} pages)...")
+        results["ingestion"] = await ingestion.run(pages=args.pdf_pages, repeat=args.repeat)
+
+    if "vector_store" in suites:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+        print(f"Running vector store benchmark (sizes: {sizes}, backends: {backends})...")
+        results["vector_store"] = await vector_store.run(
+            sizes,
+            workdir,
+            backends=backends,
+            insert_batch=args.insert_batch,
+            queries=args.search_queries
+        )
+
+    if "query" in suites:
+        print(f"Running query benchmark ({args.requests} requests, concurrency {args.concurrency})...")
+        results["query"] = await query.run(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            corpus_pages=args.corpus_pages,
+            use_conversation=args.conversation
+        )
+
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag-benchmark-")
+    configure_offline_environment(workdir, embedding_cache=args.embedding_cache)
+    logging.basicConfig(level=logging.WARNING)
+
+    started_at = datetime.utcnow()
+    try:
+        results = asyncio.run(run_suites(args, workdir))
+    finally:
+        from app.core.rag.executor import executor
+        executor.shutdown(wait=False)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "environment": environment_info(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "workdir")},
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "results",
+        f"{started_at.strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any
+
+import numpy as np
+
+from benchmarks.common import configure_offline_environment, environment_info, percentiles, elapsed_ms
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.ann",
+        description="Recall vs latency of the IVF index, with exact NumPy search as ground truth"
+    )
+    parser.add_argument("--vectors", type=int, default=200000, help="Vectors in the synthetic corpus")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimensions")
+    parser.add_argument("--clusters", type=int, default=2000, help="Gaussian clusters the corpus is drawn from")
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per setting")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (recall@k)")
+    parser.add_argument("--nlist", type=int, default=1024, help="IVF lists")
+    parser.add_argument("--nprobe", default="1,4,8,16,32,64", help="Comma separated nprobe values to sweep")
+    parser.add_argument("--dtype", default="float32", choices=("float32", "float16", "int8"), help="Stored vector type")
+    parser.add_argument("--batch", type=int, default=5000, help="Vectors per insert")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def synthetic_corpus(count: int, dim: int, clusters: int, seed: int = 7) -> np.ndarray:
+    # Clustered, normalised vectors; uniform random data has no structure for an ANN index to exploit
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + 0.8 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load(backend, vectors: np.ndarray, batch: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(vectors), batch):
+        chunk = vectors[start:start + batch]
+        ids = [f"v{i}" for i in range(start, start + len(chunk))]
+        backend.upsert(ids, chunk, [{"row": i} for i in range(start, start + len(chunk))], [""] * len(chunk))
+    return time.perf_counter() - started
+
+
+def timed_search(backend, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = backend.query(query, k)
+        latencies.append(elapsed_ms(started))
+        results.append([doc_id for doc_id, _, _, _ in hits])
+    return latencies, results
+
+
+def recall(truth: List[List[str]], found: List[List[str]]) -> float:
+    hits = sum(len(set(expected) & set(result)) for expected, result in zip(truth, found))
+    return round(hits / sum(len(expected) for expected in truth), 4)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="rag-ann-")
+    configure_offline_environment(workdir)
+
+    from app.core.rag.backends import NumpyBackend, IVFBackend
+
+    try:
+        vectors = synthetic_corpus(args.vectors, args.dim, args.clusters)
+        rng = np.random.default_rng(11)
+        queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+        queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+        print(f"Loading {args.vectors} x {args.dim} vectors...")
+        exact = NumpyBackend("exact", directory=workdir, dtype="float32")
+        load(exact, vectors, args.batch)
+        exact_latencies, truth = timed_search(exact, queries, args.k)
+
+        ivf = IVFBackend("ivf", directory=workdir, dtype=args.dtype, nlist=args.nlist, background=False)
+        ivf.train_min_vectors = len(vectors) + 1
+        insert_seconds = load(ivf, vectors, args.batch)
+        train_started = time.perf_counter()
+        ivf.train_min_vectors = 0
+        ivf.maintain()
+        train_seconds = time.perf_counter() - train_started
+
+        sweep: Dict[str, Any] = {}
+        print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8}")
+        exact_p50 = percentiles(exact_latencies)["p50_ms"]
+        for nprobe in [int(value) for value in args.nprobe.split(",") if value.strip()]:
+            ivf.nprobe = nprobe
+            latencies, found = timed_search(ivf, queries, args.k)
+            latency = percentiles(latencies)
+            sweep[str(nprobe)] = {"recall": recall(truth, found), "latency": latency}
+            print(
+                f"{nprobe:>8} {sweep[str(nprobe)]['recall']:>10.4f} {latency['p50_ms']:>9.3f} "
+                f"{latency['p95_ms']:>9.3f} {exact_p50 / latency['p50_ms']:>7.1f}x"
+            )
+
+        report = {
+            "environment": environment_info(),
+            "parameters": vars(args),
+            "results": {
+                "exact": {"latency": percentiles(exact_latencies)},
+                "ivf": {
+                    "lists": ivf.get_stats()["nlist"],
+                    "insert_seconds": round(insert_seconds, 3),
+                    "train_seconds": round(train_seconds, 3),
+                    "nprobe": sweep
+                }
+            }
+        }
+        print(f"exact search p50 {exact_p50:.3f} ms, IVF training {train_seconds:.1f}s")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {args.output}")
+        exact.close()
+        ivf.close()
+        return 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
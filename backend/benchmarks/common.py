@@ -0,0 +1,111 @@
+from typing import List, Dict, Any, Iterable
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+WORDS = (
+    "transformer attention embedding retrieval corpus gradient model layer token encoder decoder "
+    "dataset benchmark evaluation baseline ablation inference latency throughput parameter training "
+    "loss optimizer convolution recurrent sequence language vision graph neural network semantic "
+    "representation contrastive pretraining finetuning generalization robustness sampling"
+).split()
+
+
+def configure_offline_environment(workdir: str, embedding_cache: bool = False):
+    # Must run before anything under app/ is imported, since Settings is read once at import time
+    if "app.config" in sys.modules:
+        raise RuntimeError("configure_offline_environment() must be called before importing the app")
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+    os.environ["EMBEDDING_PROVIDER"] = "fake"
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = os.path.join(workdir, "chroma")
+    os.environ["EMBEDDING_CACHE_ENABLED"] = str(embedding_cache)
+    os.environ["INGEST_JOB_DB_PATH"] = os.path.join(workdir, "ingest_jobs.sqlite3")
+
+
+def percentiles(samples: Iterable[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+
+    def pick(q: float) -> float:
+        position = (len(values) - 1) * q
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    return {
+        "count": len(values),
+        "min_ms": round(values[0], 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(values[-1], 3),
+        "mean_ms": round(sum(values) / len(values), 3)
+    }
+
+
+def elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def synthetic_pdf(pages: int, seed: int = 13) -> bytes:
+    import fitz
+
+    rng = random.Random(seed)
+    document = fitz.open()
+    try:
+        for page_num in range(pages):
+            page = document.new_page()
+            page.insert_text((72, 72), f"Section {page_num + 1}", fontsize=16)
+            page.insert_textbox(fitz.Rect(72, 96, 540, 770), synthetic_text(rng, 420), fontsize=9)
+        return document.tobytes()
+    finally:
+        document.close()
+
+
+def synthetic_queries(count: int, seed: int = 29) -> List[str]:
+    rng = random.Random(seed)
+    return [f"What does the paper say about {rng.choice(WORDS)} and {rng.choice(WORDS)}?" for _ in range(count)]
+
+
+def environment_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        commit = None
+
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
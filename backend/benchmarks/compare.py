@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+from typing import Dict, Any
+
+# Metrics where a larger number is an improvement; everything else timed is lower-is-better
+HIGHER_IS_BETTER = ("per_second",)
+LOWER_IS_BETTER = ("_ms", "seconds")
+
+
+def flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+def direction(metric: str) -> int:
+    name = metric.rsplit(".", 1)[-1]
+    if any(marker in name for marker in HIGHER_IS_BETTER):
+        return 1
+    if any(name.endswith(marker) for marker in LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    old = flatten(baseline["results"])
+    new = flatten(current["results"])
+    regressions = 0
+
+    print(f"{'metric':<60} {'baseline':>14} {'current':>14} {'change':>9}")
+    for metric in sorted(old.keys() & new.keys()):
+        sign = direction(metric)
+        if not sign or not old[metric]:
+            continue
+
+        change = (new[metric] - old[metric]) / old[metric]
+        regressed = change * sign < -threshold
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{metric:<60} {old[metric]:>14.3f} {new[metric]:>14.3f} {change:>+8.1%}{flag}")
+
+    print(f"\n{regressions} regression(s) beyond {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare",
+        description="Compare two benchmark result files"
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    return compare(baseline, current, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
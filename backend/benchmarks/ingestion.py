@@ -0,0 +1,62 @@
+from typing import Dict, Any
+from datetime import datetime
+import time
+from benchmarks.common import synthetic_pdf, median
+from app.core.rag import RAGService, DocumentProcessor
+
+
+async def run(pages: int = 200, repeat: int = 3) -> Dict[str, Any]:
+    pdf = synthetic_pdf(pages)
+    processor = DocumentProcessor()
+
+    extraction = []
+    extracted = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extracted = list(processor.iter_pdf_pages(pdf))
+        extraction.append(time.perf_counter() - start)
+    characters = sum(len(text) for _, blocks in extracted for text, _ in blocks)
+    headings = sum(is_heading for _, blocks in extracted for _, is_heading in blocks)
+
+    base_metadata = {"source": "benchmark.pdf", "document_id": "benchmark", "processed_at": datetime.utcnow().isoformat()}
+    chunking = []
+    chunks = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = sum(1 for _ in processor._iter_chunks(iter(extracted), base_metadata))
+        chunking.append(time.perf_counter() - start)
+
+    # End to end with fake embeddings: extraction, chunking, hashing, embedding and the Chroma write
+    service = RAGService()
+    pipeline = []
+    for i in range(repeat):
+        service.vector_store_manager.clear_documents()
+        start = time.perf_counter()
+        await service.aprocess_pdf_file(pdf, f"benchmark-{i}.pdf")
+        pipeline.append(time.perf_counter() - start)
+
+    extraction_seconds = median(extraction)
+    chunking_seconds = median(chunking)
+    pipeline_seconds = median(pipeline)
+    return {
+        "pages": pages,
+        "pdf_bytes": len(pdf),
+        "repeat": repeat,
+        "extraction": {
+            "seconds": round(extraction_seconds, 4),
+            "pages_per_second": round(len(extracted) / extraction_seconds, 2),
+            "characters_per_second": round(characters / extraction_seconds, 2),
+            "headings": headings
+        },
+        "chunking": {
+            "chunks": chunks,
+            "seconds": round(chunking_seconds, 4),
+            "chunks_per_second": round(chunks / chunking_seconds, 2),
+            "characters_per_second": round(characters / chunking_seconds, 2)
+        },
+        "pipeline": {
+            "seconds": round(pipeline_seconds, 4),
+            "pages_per_second": round(pages / pipeline_seconds, 2),
+            "chunks_per_second": round(chunks / pipeline_seconds, 2)
+        }
+    }
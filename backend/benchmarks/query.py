@@ -0,0 +1,60 @@
+from typing import Dict, Any
+import asyncio
+import time
+import httpx
+from benchmarks.common import synthetic_pdf, synthetic_queries, percentiles, elapsed_ms
+from app.config import settings
+from app.core.rag import RAGService
+
+
+async def run(
+    requests: int = 500,
+    concurrency: int = 16,
+    corpus_pages: int = 100,
+    use_conversation: bool = False
+) -> Dict[str, Any]:
+    from app.main import app
+
+    service = RAGService()
+    service.vector_store_manager.clear_documents()
+    ingested = await service.aprocess_pdf_file(synthetic_pdf(corpus_pages, seed=7), "query-corpus.pdf")
+
+    questions = synthetic_queries(requests)
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    async def worker(client: httpx.AsyncClient, worker_id: int):
+        nonlocal errors, next_request
+        while next_request < len(questions):
+            question = questions[next_request]
+            next_request += 1
+            payload = {"question": question, "use_conversation": use_conversation}
+            if use_conversation:
+                payload["session_id"] = f"benchmark-{worker_id}"
+
+            start = time.perf_counter()
+            response = await client.post(f"{settings.API_V1_STR}/rag/query", json=payload)
+            latencies.append(elapsed_ms(start))
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        # Warm up connections, thread pools and lazily created clients outside the measured window
+        await client.post(f"{settings.API_V1_STR}/rag/query", json={"question": questions[0], "use_conversation": False})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, i) for i in range(concurrency)))
+        wall_seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "use_conversation": use_conversation,
+        "corpus_chunks": ingested["chunks_created"],
+        "errors": errors,
+        "seconds": round(wall_seconds, 3),
+        "requests_per_second": round(len(latencies) / wall_seconds, 2),
+        "latency": percentiles(latencies)
+    }
@@ -0,0 +1,134 @@
+from typing import List, Dict, Any, Optional, Tuple
+import os
+import random
+import time
+from langchain.schema import Document
+from benchmarks.common import synthetic_text, synthetic_queries, percentiles, elapsed_ms
+from app.config import settings
+from app.core.rag import VectorStoreManager
+from app.core.rag.hashing import content_hash
+
+
+def synthetic_chunks(start: int, count: int, rng: random.Random) -> List[Document]:
+    documents = []
+    for i in range(start, start + count):
+        text = f"[{i}] " + synthetic_text(rng, 150)
+        documents.append(Document(
+            page_content=text,
+            metadata={
+                "source": f"paper-{i // 100}.pdf",
+                "document_id": f"benchmark-{i // 100}",
+                "chunk_index": i % 100,
+                "chunk_hash": content_hash(text)
+            }
+        ))
+    return documents
+
+
+def parse_backend(label: str) -> Tuple[str, Optional[str]]:
+    # "chroma", "numpy" or "numpy:<dtype>"
+    name, _, dtype = label.partition(":")
+    return name, dtype or None
+
+
+async def run_size(
+    size: int,
+    backend: str,
+    workdir: str,
+    insert_batch: int,
+    queries: int,
+    k: int
+) -> Tuple[Dict[str, Any], List[List[str]]]:
+    # Each size and backend gets its own store so results are not skewed by earlier runs
+    name, dtype = parse_backend(backend)
+    settings.VECTOR_BACKEND = name
+    settings.NUMPY_INDEX_DTYPE = dtype or "float32"
+    settings.CHROMA_PERSIST_DIRECTORY = os.path.join(workdir, f"{backend.replace(':', '-')}-{size}")
+    settings.CHROMA_COLLECTION_NAME = f"benchmark_{size}"
+    manager = VectorStoreManager()
+    # Every query is timed against the backend itself, not a memoized result
+    manager.result_memo = None
+    rng = random.Random(size)
+
+    batch_latencies = []
+    started = time.perf_counter()
+    for offset in range(0, size, insert_batch):
+        batch = synthetic_chunks(offset, min(insert_batch, size - offset), rng)
+        batch_start = time.perf_counter()
+        await manager.aindex_documents(batch)
+        batch_latencies.append(elapsed_ms(batch_start))
+    insert_seconds = time.perf_counter() - started
+
+    search_latencies = []
+    search_ids = []
+    for query in synthetic_queries(queries):
+        search_start = time.perf_counter()
+        results = await manager.asimilarity_search_with_score(query, k=k)
+        search_latencies.append(elapsed_ms(search_start))
+        search_ids.append([doc.id for doc, _ in results])
+
+    stats = manager.get_backend_stats()
+    manager.delete_collection()
+
+    return {
+        "chunks": stats["count"],
+        "backend": stats,
+        "insert": {
+            "seconds": round(insert_seconds, 3),
+            "chunks_per_second": round(size / insert_seconds, 2),
+            "batch_size": insert_batch,
+            "batch_latency": percentiles(batch_latencies)
+        },
+        "search": {
+            "k": k,
+            "queries_per_second": round(len(search_latencies) * 1000 / sum(search_latencies), 2),
+            "latency": percentiles(search_latencies)
+        }
+    }, search_ids
+
+
+def overlap(reference: List[List[str]], results: List[List[str]]) -> float:
+    shared = sum(len(set(expected) & set(found)) for expected, found in zip(reference, results))
+    total = sum(len(expected) for expected in reference)
+    return round(shared / total, 4) if total else 0.0
+
+
+async def run(
+    sizes: List[int],
+    workdir: str,
+    backends: Optional[List[str]] = None,
+    insert_batch: int = 512,
+    queries: int = 200,
+    k: int = settings.TOP_K_RESULTS
+) -> Dict[str, Any]:
+    backends = backends or ["chroma"]
+    original = (
+        settings.CHROMA_PERSIST_DIRECTORY,
+        settings.CHROMA_COLLECTION_NAME,
+        settings.VECTOR_BACKEND,
+        settings.NUMPY_INDEX_DTYPE,
+        settings.HYBRID_SEARCH_ENABLED
+    )
+    # Keeps keyword indexing out of the insert timings so only the vector backend is measured
+    settings.HYBRID_SEARCH_ENABLED = False
+    try:
+        results: Dict[str, Any] = {backend: {} for backend in backends}
+        for size in sizes:
+            reference = None
+            for backend in backends:
+                result, search_ids = await run_size(size, backend, workdir, insert_batch, queries, k)
+                # Top-k agreement with the first backend on the same corpus and queries
+                if reference is None:
+                    reference = search_ids
+                else:
+                    result["search"]["overlap_with_" + backends[0].replace(":", "_")] = overlap(reference, search_ids)
+                results[backend][str(size)] = result
+        return results
+    finally:
+        (
+            settings.CHROMA_PERSIST_DIRECTORY,
+            settings.CHROMA_COLLECTION_NAME,
+            settings.VECTOR_BACKEND,
+            settings.NUMPY_INDEX_DTYPE,
+            settings.HYBRID_SEARCH_ENABLED
+        ) = original
@@ -0,0 +1,53 @@
+import os
+import re
+import shutil
+import tempfile
+import pytest
+from benchmarks.common import configure_offline_environment
+
+# Settings are read once at import, so the offline environment is set up before any test imports the app
+WORKDIR = tempfile.mkdtemp(prefix="rag-tests-")
+configure_offline_environment(WORKDIR)
+os.environ["VECTOR_BACKEND"] = "numpy"
+os.environ["FAKE_EMBEDDING_DIMENSIONS"] = "32"
+os.environ["COMPACTION_ENABLED"] = "False"
+
+
+def pytest_unconfigure(config):
+    from app.core.rag.executor import executor
+    executor.shutdown(wait=False)
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def service():
+    from app.api.routes.rag_routes import rag_service
+    return rag_service
+
+
+@pytest.fixture
+def manager(service):
+    return service.vector_store_manager
+
+
+@pytest.fixture
+def collection(manager, request):
+    # One empty collection per test, named after it, since the service and its store are shared by the session
+    module = request.module.__name__.rsplit(".", 1)[-1].removeprefix("test_")
+    test = request.node.name.removeprefix("test_")
+    name = re.sub(r"[^A-Za-z0-9]+", "-", f"{module}-{test}")[:63].strip("-")
+    manager.create_collection(name)
+    yield name
+    manager.delete_collection(name)
+
+
+@pytest.fixture
+async def client(service):
+    import httpx
+    from app.main import app
+    await service.jobs.start()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        await service.jobs.stop()
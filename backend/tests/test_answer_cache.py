@@ -0,0 +1,92 @@
+import random
+from app.core.rag.answer_cache import AnswerCache, normalize_question
+from benchmarks.common import synthetic_text
+
+ANSWER = {"answer": "Self-attention compares every token with every other.", "sources": [], "question": "q"}
+
+
+def index_paper(service, manager, collection: str, seed: int) -> str:
+    documents = service.document_processor.process_text(synthetic_text(random.Random(seed), 800), f"paper-{seed}.txt")
+    manager.index_documents(documents, collection_id=collection)
+    return documents[0].metadata["document_id"]
+
+
+def test_exact_hits_are_keyed_by_normalized_question_version_and_scope():
+    cache = AnswerCache(max_entries=10, ttl_seconds=0, semantic=False)
+    cache.put("What is self-attention?", 3, "papers", ANSWER, collection="papers")
+
+    assert normalize_question("  What  is SELF-attention ?! ") == "what is self-attention"
+    assert cache.get("what is   self-attention", 3, "papers") == ANSWER
+    assert cache.get("What is self-attention?", 4, "papers") is None
+    assert cache.get("What is self-attention?", 3, "notes") is None
+
+    # Hits are copies, so a caller decorating one does not change what the next caller gets
+    cache.get("What is self-attention?", 3, "papers")["answer"] = "changed"
+    assert cache.get("What is self-attention?", 3, "papers") == ANSWER
+    stats = cache.get_stats()
+    assert stats["exact_hits"] == 3
+    assert stats["misses"] == 2
+
+
+def test_semantic_hits_need_the_similarity_threshold():
+    cache = AnswerCache(max_entries=10, ttl_seconds=0, semantic=True, similarity_threshold=0.95)
+    cache.put("What is self-attention?", 1, "papers", ANSWER, embedding=[1.0, 0.0, 0.0])
+
+    assert cache.get("Explain self-attention", 1, "papers", embedding=[0.99, 0.1, 0.0]) == ANSWER
+    assert cache.get("Explain positional encodings", 1, "papers", embedding=[0.6, 0.8, 0.0]) is None
+    assert cache.get("Explain self-attention", 2, "papers", embedding=[0.99, 0.1, 0.0]) is None
+    stats = cache.get_stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_new_corpus_version_retires_only_that_collections_answers():
+    cache = AnswerCache(max_entries=10, ttl_seconds=0, semantic=False)
+    cache.put("first question", 1, "papers", ANSWER, collection="papers")
+    cache.put("second question", 7, "notes", ANSWER, collection="notes")
+    cache.put("third question", 2, "papers", ANSWER, collection="papers")
+
+    assert cache.get_stats()["entries"] == 2
+    assert cache.get("first question", 1, "papers") is None
+    assert cache.get("second question", 7, "notes") == ANSWER
+
+    cache.invalidate("notes")
+    assert cache.get("second question", 7, "notes") is None
+    assert cache.get("third question", 2, "papers") == ANSWER
+    cache.invalidate()
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_indexing_a_document_invalidates_cached_answers(service, manager, collection):
+    index_paper(service, manager, collection, 201)
+    question = "How is the attention cost reduced?"
+
+    first = service.query_documents(question, use_conversation=False, collection_id=collection)
+    assert not first.get("cached")
+    again = service.query_documents(question.lower(), use_conversation=False, collection_id=collection)
+    assert again["cached"]
+    assert again["answer"] == first["answer"]
+    assert again["sources"] == first["sources"]
+    assert again["question"] == question.lower()
+
+    # Another k is another retrieval, so it is answered separately
+    assert not service.query_documents(question, use_conversation=False, k=2, collection_id=collection).get("cached")
+
+    version = manager.corpus_version(collection)
+    index_paper(service, manager, collection, 202)
+    assert manager.corpus_version(collection) > version
+    assert not service.query_documents(question, use_conversation=False, collection_id=collection).get("cached")
+    assert service.query_documents(question, use_conversation=False, collection_id=collection)["cached"]
+
+
+async def test_deleting_a_document_invalidates_cached_answers(service, manager, collection):
+    papers = [index_paper(service, manager, collection, seed) for seed in (211, 212)]
+    question = "Which models use sparse attention?"
+
+    assert not (await service.aquery_documents(question, use_conversation=False, collection_id=collection)).get("cached")
+    assert (await service.aquery_documents(question, use_conversation=False, collection_id=collection))["cached"]
+
+    service.delete_document(papers[0], collection_id=collection)
+    response = await service.aquery_documents(question, use_conversation=False, collection_id=collection)
+    assert not response.get("cached")
+    assert {source["metadata"]["document_id"] for source in response["sources"]} == {papers[1]}
@@ -0,0 +1,113 @@
+import random
+from langchain.schema import Document
+from app.config import settings
+from app.core.rag.context_packer import ContextPacker, context_budget, overlap_length, trim_to_sentence
+from app.core.rag.tokens import count_tokens
+from benchmarks.common import synthetic_text
+
+SENTENCES = [
+    "Self-attention relates every token to every other token in the sequence.",
+    "Its cost therefore grows with the square of the sequence length.",
+    "Sparse patterns keep only a few of those pairs and scale linearly.",
+    "Positional encodings tell the model where each token sits."
+]
+
+
+def chunk(text: str, document_id: str = "paper", chunk_index: int = 0) -> Document:
+    return Document(page_content=text, metadata={"document_id": document_id, "chunk_index": chunk_index})
+
+
+def texts(packed) -> list:
+    return [doc.page_content for doc, _ in packed]
+
+
+def test_trim_to_sentence_keeps_the_longest_complete_prefix():
+    text = " ".join(SENTENCES)
+    two = " ".join(SENTENCES[:2])
+
+    assert trim_to_sentence(text, count_tokens(two)) == two
+    assert trim_to_sentence(text, count_tokens(two) + 3) == two
+    assert trim_to_sentence(text, count_tokens(text)) == text
+    assert trim_to_sentence(text, count_tokens(SENTENCES[0]) - 1) == ""
+    # Closing quotes and brackets stay with the sentence they end
+    assert trim_to_sentence('He said "stop." Then it went on and on', 100) == 'He said "stop."'
+    assert trim_to_sentence("no sentence end here", 100) == ""
+
+
+def test_context_budget_is_what_the_window_leaves_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONTEXT_LENGTH", 4000)
+    monkeypatch.setattr(settings, "ANSWER_MAX_TOKENS", 1000)
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 2500)
+
+    assert context_budget(100) == 2500
+    assert context_budget(1000) == 2000
+    assert context_budget(3500) == 0
+
+
+def test_history_takes_its_share_of_the_context_budget(service, monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", settings.MAX_CONTEXT_LENGTH)
+    chain = service.rag_chain
+    question = "How does the cost of attention grow?"
+    history = "\nHuman: What is attention?\nAssistant: " + " ".join(SENTENCES * 20)
+
+    without_history = chain._context_budget(question, "")
+    with_history = chain._context_budget(question, history)
+    assert without_history - with_history == count_tokens(
+        chain.qa_prompt.format(context="", chat_history=history, question=question)
+    ) - count_tokens(chain.qa_prompt.format(context="", chat_history="", question=question))
+    assert without_history + settings.ANSWER_MAX_TOKENS < settings.MAX_CONTEXT_LENGTH
+
+
+def test_overlap_length_finds_the_shared_boundary_text():
+    first = " ".join(SENTENCES[:3])
+    second = " ".join(SENTENCES[2:])
+    assert overlap_length(first, second) == len(SENTENCES[2])
+    assert overlap_length(first, SENTENCES[3]) == 0
+    assert overlap_length(first, "") == 0
+
+
+def test_text_shared_by_neighbouring_chunks_is_sent_once():
+    first = chunk(" ".join(SENTENCES[:3]), chunk_index=4)
+    second = chunk(" ".join(SENTENCES[2:]), chunk_index=5)
+    other = chunk(" ".join(SENTENCES[2:]), document_id="copy", chunk_index=5)
+
+    packed, info = ContextPacker().pack([(second, 0.9), (first, 0.8), (other, 0.7)], budget=1000)
+    assert texts(packed) == [second.page_content, " ".join(SENTENCES[:2]), other.page_content]
+    assert [score for _, score in packed] == [0.9, 0.8, 0.7]
+    assert info["overlaps_removed"] == 1
+    assert info["trimmed"] == 0
+    assert info["context_tokens"] == sum(count_tokens(text) for text in texts(packed))
+
+
+def test_the_chunk_overflowing_the_budget_is_trimmed_to_a_sentence():
+    first = chunk(SENTENCES[3], document_id="a")
+    second = chunk(" ".join(SENTENCES[:3]), document_id="b")
+    budget = count_tokens(SENTENCES[3]) + count_tokens(" ".join(SENTENCES[:2])) + 1
+
+    packed, info = ContextPacker(min_trimmed_tokens=4).pack([(first, 1.0), (second, 0.5)], budget=budget)
+    assert texts(packed) == [SENTENCES[3], " ".join(SENTENCES[:2])]
+    assert info["trimmed"] == 1
+    assert info["context_tokens"] <= budget
+    # The stored chunk is left as it was
+    assert second.page_content == " ".join(SENTENCES[:3])
+
+    # A fragment shorter than min_trimmed_tokens is left out
+    packed, info = ContextPacker(min_trimmed_tokens=1000).pack([(first, 1.0), (second, 0.5)], budget=budget)
+    assert texts(packed) == [SENTENCES[3]]
+    assert info["trimmed"] == 0
+
+
+def test_packing_stops_at_max_chunks():
+    ranked = [(chunk(sentence, document_id=str(i)), 1.0) for i, sentence in enumerate(SENTENCES)]
+    packed, _ = ContextPacker().pack(ranked, budget=1000, max_chunks=2)
+    assert texts(packed) == SENTENCES[:2]
+
+
+def test_chunks_are_sized_and_counted_in_tokens(service):
+    documents = service.document_processor.process_text(synthetic_text(random.Random(501), 3000), "paper.txt")
+    assert len(documents) > 1
+    for doc in documents:
+        assert doc.metadata["chunk_tokens"] == count_tokens(doc.page_content)
+        # The splitter adds up the tokens of the pieces it merges, which can be a few short of the whole
+        assert doc.metadata["chunk_tokens"] <= settings.CHUNK_SIZE * 1.05
+    assert all(doc.metadata["chunk_tokens"] > settings.CHUNK_SIZE // 2 for doc in documents[:-1])
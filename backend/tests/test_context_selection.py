@@ -0,0 +1,89 @@
+from langchain.schema import Document
+from app.core.rag.reranker import ContextSelector, LexicalReranker, Reranker, containment, shingles
+
+
+class FixedReranker(Reranker):
+    name = "fixed"
+
+    def __init__(self, scores):
+        self.scores = scores
+
+    def score(self, query, docs):
+        return self.scores[:len(docs)]
+
+
+def chunk(text: str, tokens: int) -> Document:
+    return Document(page_content=text, metadata={"chunk_tokens": tokens})
+
+
+# In retrieval order; the third repeats the first, as a re-uploaded copy would
+CANDIDATES = [
+    chunk("Transformers replace recurrence with self-attention over the whole sequence.", 300),
+    chunk("The weather in the valley was mild for most of the spring season.", 200),
+    chunk("Transformers replace recurrence with self-attention over the whole sequence!", 250),
+    chunk("Self-attention cost grows with the square of the sequence length.", 120),
+    chunk("Positional encodings give the model a sense of token order.", 80)
+]
+
+
+def texts(selected):
+    return [doc.page_content for doc, _ in selected]
+
+
+def test_reranked_selection_saves_tokens_against_the_retrieved_top_k():
+    selector = ContextSelector(FixedReranker([0.9, 0.1, 0.8, 0.7, 0.6]), candidates=5, token_budget=2000)
+    selected, context = selector.select("how does self-attention work", CANDIDATES, k=3)
+
+    assert texts(selected) == [CANDIDATES[i].page_content for i in (0, 3, 4)]
+    assert [score for _, score in selected] == [0.9, 0.7, 0.6]
+    assert context["duplicates_removed"] == 1
+    assert context["candidate_tokens"] == 950
+    # Without selection the prompt carried the first k retrieved chunks: 300 + 200 + 250 tokens
+    assert context["baseline_tokens"] == 750
+    assert context["context_tokens"] == 500
+    assert context["tokens_saved"] == 250
+
+    selector.select("how does self-attention work", CANDIDATES, k=3)
+    stats = selector.get_stats()
+    assert stats["queries"] == 2
+    assert stats["baseline_tokens"] == 1500
+    assert stats["tokens_saved"] == 500
+
+
+def test_selection_without_reranker_keeps_retrieval_order():
+    selector = ContextSelector(None, candidates=20, token_budget=2000)
+    assert selector.candidate_count(4) == 4
+
+    selected, context = selector.select("attention", CANDIDATES[:4], scores=[0.4, 0.3, 0.2, 0.1], k=2)
+    assert texts(selected) == [CANDIDATES[0].page_content, CANDIDATES[1].page_content]
+    assert context["tokens_saved"] == 0
+
+
+def test_token_budget_limits_the_selected_chunks():
+    selector = ContextSelector(FixedReranker([0.9, 0.1, 0.8, 0.7, 0.6]), candidates=5, token_budget=450)
+    selected, context = selector.select("attention", CANDIDATES, k=5)
+
+    # 300 + 120 fits; the next chunk is too long to trim into the 30 tokens left
+    assert texts(selected) == [CANDIDATES[0].page_content, CANDIDATES[3].page_content]
+    assert context["context_tokens"] == 420
+    assert context["tokens_saved"] == 950 - 420
+
+
+def test_near_duplicates_are_detected_by_shingle_containment():
+    first, copy, other = (shingles(CANDIDATES[i].page_content) for i in (0, 2, 3))
+    assert containment(first, copy) >= 0.8
+    assert containment(first, other) < 0.8
+    assert containment(set(), first) == 0.0
+
+
+def test_lexical_reranker_promotes_chunks_covering_the_query():
+    docs = [
+        chunk("Gardening tips for the spring.", 10),
+        chunk("A history of the printing press.", 10),
+        chunk("Sparse attention lowers the quadratic cost of transformers.", 10)
+    ]
+    scores = LexicalReranker().score("sparse attention transformers", docs)
+
+    # Fused with the retrieval order, so the matching chunk moves up one place rather than to the top
+    assert scores[0] > scores[2] > scores[1]
+    assert LexicalReranker().score("", docs) == [0.0, 0.0, 0.0]
@@ -0,0 +1,127 @@
+import random
+import threading
+import pytest
+from app.config import settings
+from app.core.rag.compaction import Compactor
+from app.core.rag.document_registry import DocumentRegistry
+from benchmarks.common import synthetic_text
+
+
+def index_papers(service, manager, collection: str, count: int) -> list:
+    document_ids = []
+    for i in range(count):
+        documents = service.document_processor.process_text(synthetic_text(random.Random(i), 6000), f"paper-{i}.txt")
+        manager.index_documents(documents, collection_id=collection)
+        document_ids.append(documents[0].metadata["document_id"])
+    return document_ids
+
+
+def test_registry_removes_more_chunks_than_one_sql_batch(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    entries = [(f"chunk-{i}", f"doc-{i % 3}", f"doc-{i % 3}.txt", 10, 100, "v1") for i in range(1200)]
+    registry.add("papers", entries)
+    assert registry.count("papers") == {"documents": 3, "chunks": 1200, "bytes": 120000}
+
+    # doc-0 loses every chunk and is dropped; the others keep what was not removed
+    removed = [chunk_id for chunk_id, document_id, *_ in entries if document_id == "doc-0" or chunk_id.endswith("1")]
+    registry.remove_chunks("papers", removed)
+    remaining = 1200 - len(removed)
+    assert registry.count("papers")["chunks"] == remaining
+    assert set(registry.chunk_ids("papers", ["doc-0", "doc-1", "doc-2"])) == {"doc-1", "doc-2"}
+    assert {entry["document_id"]: entry["chunks"] for entry in registry.documents("papers")} == {
+        document_id: len(chunks) for document_id, chunks in registry.chunk_ids("papers", ["doc-1", "doc-2"]).items()
+    }
+
+    registry.remove_documents("papers", ["doc-1", "doc-2"])
+    assert registry.count("papers") == {"documents": 0, "chunks": 0, "bytes": 0}
+    registry.close()
+
+
+def test_large_delete_runs_in_batches(service, manager, collection, monkeypatch):
+    document_ids = index_papers(service, manager, collection, 9)
+    stored = manager.count(collection)
+    assert stored > settings.DELETE_BATCH_SIZE
+
+    with manager._use(collection) as handle:
+        backend = handle.backend
+    batches = []
+    delete = backend.delete
+    monkeypatch.setattr(backend, "delete", lambda ids: (batches.append(len(ids)), delete(ids))[1])
+    version = manager.corpus_version(collection)
+
+    result = manager.delete_documents(document_ids[:8] + ["missing"], collection_id=collection)
+    assert result["missing"] == ["missing"]
+    assert sorted(result["deleted_documents"]) == sorted(document_ids[:8])
+    assert result["deleted_chunks"] == sum(batches)
+    assert len(batches) > 1
+    assert max(batches) <= settings.DELETE_BATCH_SIZE
+    assert manager.corpus_version(collection) == version + len(batches)
+
+    assert manager.count(collection) == stored - result["deleted_chunks"]
+    assert manager.chunk_counts()[collection] == manager.count(collection)
+    assert manager.compactor.get_stats()["pending_deleted_chunks"] >= result["deleted_chunks"]
+    results = manager.retrieve_with_score(synthetic_text(random.Random(0), 30), k=5, collection_id=collection)
+    assert {doc.metadata["document_id"] for doc, _ in results} == {document_ids[8]}
+
+
+def test_compactor_waits_for_enough_deleted_chunks(manager):
+    compactor = Compactor(manager, enabled=True, min_deleted=100, delay=60)
+    compactor.note_deleted("papers", 60)
+    assert compactor.get_stats()["pending_deleted_chunks"] == 60
+    assert not compactor.get_stats()["scheduled"]
+
+    compactor.note_deleted("papers", 0)
+    assert not compactor.get_stats()["scheduled"]
+    compactor.note_deleted("notes", 40)
+    assert compactor.get_stats()["scheduled"]
+    compactor.close()
+    assert not compactor.get_stats()["scheduled"]
+
+
+def test_disabled_compactor_only_counts_deletes(manager):
+    compactor = Compactor(manager, enabled=False, min_deleted=1, delay=0)
+    compactor.note_deleted("papers", 500)
+    stats = compactor.get_stats()
+    assert stats["pending_deleted_chunks"] == 500
+    assert not stats["scheduled"]
+
+
+def test_scheduled_compaction_reclaims_deleted_collections(service, manager, collection, monkeypatch):
+    document_ids = index_papers(service, manager, collection, 3)
+    compactor = Compactor(manager, enabled=True, min_deleted=10, delay=0.05)
+    monkeypatch.setattr(manager, "compactor", compactor)
+    reclaimed = []
+    reclaim_space = manager.reclaim_space
+    monkeypatch.setattr(manager, "reclaim_space", lambda name: (reclaimed.append(name), reclaim_space(name))[1])
+    finished = threading.Event()
+    run = compactor.compact
+    monkeypatch.setattr(compactor, "compact", lambda *args: (run(*args), finished.set())[0])
+
+    deleted = manager.delete_documents(document_ids[:2], collection_id=collection)["deleted_chunks"]
+    assert finished.wait(10)
+
+    stats = compactor.get_stats()
+    assert reclaimed == [collection]
+    assert stats["runs"] == 1
+    assert stats["pending_deleted_chunks"] == 0
+    assert not stats["scheduled"]
+    assert stats["last_error"] is None
+    assert stats["last_run_at"] is not None
+    assert manager.count(collection) == manager.chunk_counts()[collection]
+    assert deleted > 0
+
+
+def test_failed_compaction_keeps_deletes_pending(manager, monkeypatch):
+    compactor = Compactor(manager, enabled=False)
+    compactor.note_deleted("papers", 25)
+
+    def fail(name):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manager, "reclaim_space", fail)
+    with pytest.raises(OSError):
+        compactor.compact()
+    stats = compactor.get_stats()
+    assert stats["pending_deleted_chunks"] == 25
+    assert stats["last_error"] == "disk full"
+    assert stats["runs"] == 0
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from langchain_core.embeddings import Embeddings
+from app.core.rag.embedding_engine import AdaptiveLimiter, EmbeddingEngine
+from app.core.rag.tokens import count_tokens
+
+
+class APIError(Exception):
+    # Shaped like the OpenAI client's errors: a status code and the HTTP response with its headers
+    def __init__(self, status_code: int, retry_after: float = None):
+        super().__init__(f"HTTP {status_code}")
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class StubEmbeddings(Embeddings):
+    # Fails the first `failures` requests with `error`, and records batch sizes and peak concurrency
+    def __init__(self, failures: int = 0, error: Exception = None, delay: float = 0.0):
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _start(self, texts):
+        with self._lock:
+            self.batches.append(len(texts))
+            if self.failures:
+                self.failures -= 1
+                raise self.error
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _finish(self, texts):
+        with self._lock:
+            self.active -= 1
+        return [vector(text) for text in texts]
+
+    def embed_documents(self, texts):
+        self._start(texts)
+        time.sleep(self.delay)
+        return self._finish(texts)
+
+    async def aembed_documents(self, texts):
+        self._start(texts)
+        await asyncio.sleep(self.delay)
+        return self._finish(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+def vector(text: str) -> list:
+    return [float(len(text)), float(sum(map(ord, text)) % 997)]
+
+
+def engine_for(stub: StubEmbeddings, **options) -> EmbeddingEngine:
+    options = {"concurrency": 4, "max_retries": 3, "backoff_base": 0.001, "backoff_max": 0.01, **options}
+    return EmbeddingEngine(stub, model="text-embedding-3-small", **options)
+
+
+TEXTS = [f"chunk {i} " + "word " * (5 + i % 7) for i in range(24)]
+
+
+def test_batches_respect_the_token_budget_and_size_limit():
+    engine = engine_for(StubEmbeddings(), max_batch_tokens=40, max_batch_size=3)
+    oversized = "token " * 100
+    texts = TEXTS[:10] + [oversized] + TEXTS[10:14]
+    batches = engine.make_batches(texts)
+
+    assert [i for batch, _ in batches for i in batch] == list(range(len(texts)))
+    for batch, tokens in batches:
+        assert tokens == sum(count_tokens(texts[i], engine.model) for i in batch)
+        assert len(batch) <= 3
+        assert tokens <= 40 or len(batch) == 1
+    assert ([10], count_tokens(oversized, engine.model)) in batches
+
+
+def test_limiter_halves_on_rate_limit_and_recovers_additively():
+    limiter = AdaptiveLimiter(8)
+    limiter.on_rate_limit(0.0)
+    assert limiter.limit == 4
+    limiter.on_rate_limit(0.0)
+    limiter.on_rate_limit(0.0)
+    limiter.on_rate_limit(0.0)
+    assert limiter.limit == 1
+
+    # One step up per `limit` successes in a row
+    successes = 0
+    while limiter.limit < 8:
+        limiter.on_success()
+        successes += 1
+    assert successes == sum(range(1, 8))
+    limiter.on_success()
+    assert limiter.limit == 8
+
+    limiter.on_rate_limit(0.2)
+    assert 0.1 < limiter.cooldown_remaining() <= 0.2
+
+
+async def test_rate_limited_batches_wait_out_retry_after():
+    stub = StubEmbeddings(failures=2, error=APIError(429, retry_after=0.1))
+    engine = engine_for(stub, max_batch_size=4)
+
+    started = time.perf_counter()
+    vectors = await engine.aembed_documents(TEXTS)
+    assert time.perf_counter() - started >= 0.1
+
+    assert vectors == [vector(text) for text in TEXTS]
+    stats = engine.get_stats()
+    assert stats["rate_limited"] == 2
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+    assert stats["requests"] == len(engine.make_batches(TEXTS))
+    assert stats["texts"] == len(TEXTS)
+
+
+async def test_async_batches_stay_within_the_concurrency_limit():
+    stub = StubEmbeddings(delay=0.02)
+    engine = engine_for(stub, concurrency=3, max_batch_size=2)
+
+    assert await engine.aembed_documents(TEXTS) == [vector(text) for text in TEXTS]
+    assert len(stub.batches) == 12
+    assert 1 < stub.peak <= 3
+    assert engine.limiter.active == 0
+
+
+def test_sync_callers_share_the_concurrency_cap():
+    stub = StubEmbeddings(delay=0.02)
+    engine = engine_for(stub, concurrency=2)
+
+    threads = [threading.Thread(target=engine.embed_query, args=(text,)) for text in TEXTS[:8]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.peak <= 2
+    assert engine.limiter.active == 0
+
+
+def test_sync_batches_fan_out_within_the_concurrency_limit():
+    stub = StubEmbeddings(delay=0.02)
+    engine = engine_for(stub, concurrency=3, max_batch_size=2)
+
+    assert engine.embed_documents(TEXTS) == [vector(text) for text in TEXTS]
+    assert len(stub.batches) == 12
+    assert 1 < stub.peak <= 3
+    assert engine.limiter.active == 0
+
+
+def test_sync_requests_retry_after_a_rate_limit():
+    stub = StubEmbeddings(failures=1, error=APIError(429, retry_after=0.05))
+    engine = engine_for(stub)
+
+    started = time.perf_counter()
+    assert engine.embed_documents(TEXTS) == [vector(text) for text in TEXTS]
+    assert time.perf_counter() - started >= 0.05
+    assert stub.batches == [len(TEXTS), len(TEXTS)]
+    assert engine.get_stats()["rate_limited"] == 1
+    assert engine.limiter.limit == 2
+
+
+async def test_client_errors_are_not_retried():
+    stub = StubEmbeddings(failures=1, error=APIError(400))
+    engine = engine_for(stub)
+
+    with pytest.raises(APIError):
+        await engine.aembed_query("question")
+    assert stub.batches == [1]
+    assert engine.get_stats()["failures"] == 1
+    assert engine.get_stats()["retries"] == 0
+
+
+def test_transient_errors_give_up_after_max_retries():
+    stub = StubEmbeddings(failures=10, error=APIError(503))
+    engine = engine_for(stub, max_retries=2)
+
+    with pytest.raises(APIError):
+        engine.embed_query("question")
+    assert len(stub.batches) == 3
+    stats = engine.get_stats()
+    assert stats["retries"] == 2
+    assert stats["failures"] == 1
+    assert stats["rate_limited"] == 0
+    assert engine.limiter.limit == 4
@@ -0,0 +1,78 @@
+import random
+import pytest
+from app.core.rag.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from benchmarks.common import synthetic_text
+
+
+def test_rrf_sums_reciprocal_ranks_across_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+
+    assert [chunk_id for chunk_id, _ in fused] == ["a", "c", "b", "d"]
+    scores = dict(fused)
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert scores["d"] == pytest.approx(1 / 63)
+
+
+def test_rrf_of_a_single_ranking_keeps_its_order():
+    assert [chunk_id for chunk_id, _ in reciprocal_rank_fusion([["x", "y", "z"]])] == ["x", "y", "z"]
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+def test_bm25_index_ranks_rare_terms_and_survives_reload(tmp_path):
+    path = str(tmp_path / "lexical.sqlite3")
+    index = LexicalIndex(path)
+    index.load()
+    index.add(
+        ["common-1", "common-2", "rare"],
+        ["the transformer model", "a transformer encoder", "the quasarflux transformer"]
+    )
+
+    results = index.search("quasarflux transformer", 3)
+    assert results[0][0] == "rare"
+    assert {chunk_id for chunk_id, _ in results} == {"common-1", "common-2", "rare"}
+
+    index.remove(["rare"])
+    assert index.search("quasarflux", 3) == []
+    index.close()
+
+    reloaded = LexicalIndex(path)
+    assert reloaded.ids() == {"common-1", "common-2"}
+    assert [chunk_id for chunk_id, _ in reloaded.search("encoder", 3)] == ["common-2"]
+    reloaded.close()
+
+
+def test_bm25_search_applies_the_allowed_filter(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    ids = [f"chunk-{i}" for i in range(300)]
+    index.add(ids, ["retrieval " * (1 + i % 7) for i in range(300)])
+
+    allowed = {"chunk-3", "chunk-250"}
+    results = index.search("retrieval", 5, allowed=lambda window: allowed & set(window))
+    assert {chunk_id for chunk_id, _ in results} == allowed
+    index.close()
+
+
+def test_hybrid_retrieval_fuses_keyword_and_vector_hits(service, manager, collection):
+    rng = random.Random(7)
+    for i in range(12):
+        text = synthetic_text(rng, 200)
+        if i == 5:
+            text += " The quasarflux estimator is introduced here."
+        documents = service.document_processor.process_text(text, f"paper-{i}.txt")
+        manager.index_documents(documents, collection_id=collection)
+
+    results = manager.retrieve_with_score("quasarflux estimator", k=4, collection_id=collection)
+    assert len(results) == 4
+    # The only keyword hit ranks first in the BM25 list, so fusion puts it level with the best vector hit
+    assert any("quasarflux" in doc.page_content for doc, _ in results[:2])
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] <= 2 / 61
+
+    filtered = manager.retrieve_with_score(
+        "quasarflux estimator", k=4, filter={"source": {"$in": ["paper-1.txt"]}}, collection_id=collection
+    )
+    assert filtered
+    assert {doc.metadata["source"] for doc, _ in filtered} == {"paper-1.txt"}
@@ -0,0 +1,141 @@
+import threading
+import numpy as np
+import pytest
+from app.config import settings
+from app.core.rag.backends import IVFBackend
+
+DIM = 32
+CLUSTERS = 16
+
+
+def clustered(count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(0).normal(size=(CLUSTERS, DIM)).astype(np.float32)
+    points = centers[rng.integers(0, CLUSTERS, count)] + rng.normal(scale=0.15, size=(count, DIM))
+    return points.astype(np.float32)
+
+
+def upsert(index: IVFBackend, ids, vectors: np.ndarray):
+    index.upsert(list(ids), vectors.tolist(), [{"n": i} for i in range(len(ids))], [f"text {i}" for i in ids])
+
+
+def exact_top_k(stored: dict, query: np.ndarray, k: int) -> list:
+    ids = list(stored)
+    vectors = np.stack([stored[chunk_id] for chunk_id in ids])
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [ids[i] for i in np.argsort(distances)[:k]]
+
+
+def recall(index: IVFBackend, stored: dict, queries: np.ndarray, k: int = 10) -> float:
+    found = 0
+    for query in queries:
+        hits = {hit[0] for hit in index.query(query.tolist(), k)}
+        found += len(hits & set(exact_top_k(stored, query, k)))
+    return found / (k * len(queries))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "IVF_TRAIN_MIN_VECTORS", 500)
+    # Compaction is left to the tests, so tombstones can be observed before it
+    monkeypatch.setattr(settings, "IVF_COMPACTION_TOMBSTONE_RATIO", 10.0)
+    index = IVFBackend("ivf-test", directory=str(tmp_path), nlist=CLUSTERS, nprobe=4, background=False)
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def stored(index):
+    vectors = clustered(2000, seed=1)
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+    upsert(index, ids, vectors)
+    return dict(zip(ids, vectors))
+
+
+def test_trains_once_enough_vectors_are_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "IVF_TRAIN_MIN_VECTORS", 500)
+    index = IVFBackend("ivf-small", directory=str(tmp_path), nlist=CLUSTERS, nprobe=4, background=False)
+    upsert(index, [f"a-{i}" for i in range(400)], clustered(400, seed=2))
+    assert not index.get_stats()["trained"]
+
+    upsert(index, [f"b-{i}" for i in range(200)], clustered(200, seed=3))
+    stats = index.get_stats()
+    assert stats["trained"]
+    assert stats["trained_count"] == 600
+    index.close()
+
+
+def test_recall_against_exact_search(index, stored):
+    assert index.get_stats()["nlist"] == CLUSTERS
+    queries = clustered(50, seed=4)
+    assert recall(index, stored, queries) >= 0.9
+
+    # Distances are the exact squared L2 distances of the returned rows
+    query = queries[0]
+    for chunk_id, _, _, distance in index.query(query.tolist(), 5):
+        assert distance == pytest.approx(float(((stored[chunk_id] - query) ** 2).sum()), rel=1e-3, abs=1e-3)
+
+
+def test_deleted_rows_are_tombstoned_then_compacted(index, stored):
+    deleted = [chunk_id for i, chunk_id in enumerate(stored) if i % 3 == 0]
+    index.delete(deleted)
+    for chunk_id in deleted:
+        del stored[chunk_id]
+    assert index.count() == len(stored)
+    assert index.get_stats()["tombstones"] == len(deleted)
+
+    queries = clustered(50, seed=5)
+    before = [[hit[0] for hit in index.query(query.tolist(), 10)] for query in queries]
+    assert not set(deleted) & {chunk_id for hits in before for chunk_id in hits}
+    assert recall(index, stored, queries) >= 0.9
+
+    index.compact()
+    assert index.get_stats()["tombstones"] == 0
+    assert [[hit[0] for hit in index.query(query.tolist(), 10)] for query in queries] == before
+
+    # Compacted rows are free again, so refilling them does not grow the files
+    capacity = index.get_stats()["capacity"]
+    refill = clustered(len(deleted), seed=6)
+    upsert(index, [f"refill-{i}" for i in range(len(refill))], refill)
+    assert index.get_stats()["capacity"] == capacity
+    stored.update(zip([f"refill-{i}" for i in range(len(refill))], refill))
+    assert recall(index, stored, queries) >= 0.9
+
+
+def test_updated_vector_moves_to_its_new_bucket(index, stored):
+    chunk_id = next(iter(stored))
+    moved = -stored[chunk_id]
+    upsert(index, [chunk_id], moved[None, :])
+
+    assert index.query(moved.tolist(), 1)[0][0] == chunk_id
+    assert chunk_id not in {hit[0] for hit in index.query((-moved).tolist(), 10)}
+    assert index.get_stats()["tombstones"] == 1
+
+
+def test_writes_racing_a_retrain_stay_searchable(index, stored):
+    extra = clustered(600, seed=7)
+    ids = [f"racing-{i}" for i in range(len(extra))]
+    training = threading.Thread(target=index.train)
+    training.start()
+    for start in range(0, len(extra), 50):
+        upsert(index, ids[start:start + 50], extra[start:start + 50])
+    training.join()
+
+    for chunk_id, vector in zip(ids, extra):
+        hit = index.query(vector.tolist(), 1)[0]
+        assert hit[0] == chunk_id
+        assert hit[3] == pytest.approx(0.0, abs=1e-4)
+
+
+def test_trained_index_is_reopened_from_disk(tmp_path, index, stored):
+    queries = clustered(20, seed=8)
+    before = [[hit[0] for hit in index.query(query.tolist(), 10)] for query in queries]
+    index.close()
+
+    reopened = IVFBackend("ivf-test", directory=str(tmp_path), nlist=CLUSTERS, nprobe=4, background=False)
+    try:
+        assert reopened.get_stats()["trained"]
+        assert reopened.count() == len(stored)
+        assert [[hit[0] for hit in reopened.query(query.tolist(), 10)] for query in queries] == before
+    finally:
+        reopened.close()
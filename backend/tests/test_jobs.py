@@ -0,0 +1,154 @@
+import asyncio
+import os
+import random
+import threading
+import pytest
+from app.core.rag.jobs import IngestionJobManager, JobStore, JOB_QUEUED, JOB_RUNNING
+from benchmarks.common import synthetic_text
+
+
+class BlockingService:
+    # Stands in for RAGService on the workers: a text job stores its chunks for real, then waits to be released
+    def __init__(self, service):
+        self.service = service
+        self.vector_store_manager = service.vector_store_manager
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def aprocess_text(self, text, source, metadata=None, progress=None, collection_id=None):
+        documents = self.service.document_processor.process_text(text, source, metadata)
+        totals = self.service._new_index_totals()
+        self.service._accumulate(
+            totals, await self.vector_store_manager.aindex_documents(documents, collection_id=collection_id)
+        )
+        await progress(totals)
+        self.started.set()
+        await self.release.wait()
+        return {"chunks_created": totals["added"]}
+
+
+def new_jobs(stand_in, tmp_path) -> IngestionJobManager:
+    return IngestionJobManager(
+        stand_in,
+        workers=1,
+        store=JobStore(str(tmp_path / "jobs.sqlite3")),
+        payload_dir=str(tmp_path / "payloads")
+    )
+
+
+def paper(seed: int) -> str:
+    return synthetic_text(random.Random(seed), 600)
+
+
+async def wait_until_done(jobs: IngestionJobManager, job_id: str) -> dict:
+    for _ in range(500):
+        job = await jobs.get(job_id)
+        if job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+async def test_cancelling_a_running_job_removes_the_chunks_it_stored(service, manager, collection, tmp_path):
+    stand_in = BlockingService(service)
+    jobs = new_jobs(stand_in, tmp_path)
+    await jobs.start()
+    try:
+        job = await jobs.submit_text(paper(1), "running.txt", collection_id=collection)
+        await asyncio.wait_for(stand_in.started.wait(), 10)
+        assert manager.count(collection) > 0
+
+        job = await jobs.cancel(job["job_id"])
+        assert job["status"] == "cancelled"
+        assert job["progress"]["chunks_stored"] == 0
+        assert manager.count(collection) == 0
+        assert not os.path.exists(job["payload_path"])
+    finally:
+        await jobs.stop()
+
+
+async def test_cancelling_during_the_store_write_removes_what_it_wrote(service, manager, collection, tmp_path, monkeypatch):
+    # The write runs on an I/O thread that cancellation cannot stop, so it lands after the job was cancelled
+    writing, proceed = threading.Event(), threading.Event()
+    write_new = manager._write_new
+
+    def blocked_write(*args):
+        writing.set()
+        proceed.wait(10)
+        return write_new(*args)
+
+    monkeypatch.setattr(manager, "_write_new", blocked_write)
+    jobs = new_jobs(service, tmp_path)
+    await jobs.start()
+    try:
+        job = await jobs.submit_text(paper(6), "writing.txt", collection_id=collection)
+        while not writing.is_set():
+            await asyncio.sleep(0.01)
+
+        cancelling = asyncio.create_task(jobs.cancel(job["job_id"]))
+        await asyncio.sleep(0.05)
+        assert not cancelling.done()
+        proceed.set()
+        job = await cancelling
+
+        assert job["status"] == "cancelled"
+        assert manager.count(collection) == 0
+        assert manager.chunk_counts()[collection] == 0
+    finally:
+        proceed.set()
+        await jobs.stop()
+
+
+async def test_cancelled_queued_job_is_skipped_by_the_worker(service, manager, collection, tmp_path):
+    stand_in = BlockingService(service)
+    jobs = new_jobs(stand_in, tmp_path)
+    await jobs.start()
+    try:
+        running = await jobs.submit_text(paper(2), "running.txt", collection_id=collection)
+        await asyncio.wait_for(stand_in.started.wait(), 10)
+        stored = manager.count(collection)
+        queued = await jobs.submit_text(paper(3), "queued.txt", collection_id=collection)
+
+        cancelled = await jobs.cancel(queued["job_id"])
+        assert cancelled["status"] == "cancelled"
+        assert cancelled["error"] == "Cancelled before processing started"
+
+        stand_in.release.set()
+        assert (await wait_until_done(jobs, running["job_id"]))["status"] == "completed"
+        await jobs._queue.join()
+        assert (await jobs.get(queued["job_id"]))["status"] == "cancelled"
+        assert manager.count(collection) == stored
+    finally:
+        await jobs.stop()
+
+
+async def test_restart_resumes_interrupted_jobs_and_fails_those_without_payload(service, collection, tmp_path):
+    stand_in = BlockingService(service)
+    jobs = new_jobs(stand_in, tmp_path)
+    await jobs.start()
+    running = await jobs.submit_text(paper(4), "running.txt", collection_id=collection)
+    await asyncio.wait_for(stand_in.started.wait(), 10)
+    lost = await jobs.submit_text(paper(5), "lost.txt", collection_id=collection)
+    await jobs.stop()
+
+    # Interrupted by the shutdown, so queued again with its payload kept
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    assert store.get(running["job_id"])["status"] == JOB_QUEUED
+    assert os.path.exists(running["payload_path"])
+    store.close()
+    os.remove(lost["payload_path"])
+
+    stand_in = BlockingService(service)
+    stand_in.release.set()
+    jobs = new_jobs(stand_in, tmp_path)
+    await jobs.start()
+    try:
+        resumed = await wait_until_done(jobs, running["job_id"])
+        assert resumed["status"] == "completed"
+        assert not os.path.exists(resumed["payload_path"])
+
+        failed = await jobs.get(lost["job_id"])
+        assert failed["status"] == "failed"
+        assert "payload is no longer available" in failed["error"]
+    finally:
+        await jobs.stop()
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize("text", ["", "   \n\t  "])
+async def test_text_without_content_is_rejected_with_400(client, manager, collection, text):
+    response = await client.post(
+        "/api/v1/rag/process-text",
+        json={"text": text, "source": "empty.txt", "collection_id": collection}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No text content"
+    assert manager.count(collection) == 0
+
+
+def test_sync_text_ingestion_raises_for_empty_text(service, collection):
+    with pytest.raises(ValueError, match="No text content"):
+        service.process_text("", "empty.txt", collection_id=collection)
+
+
+async def test_text_is_chunked_and_stored(client, manager, collection):
+    response = await client.post(
+        "/api/v1/rag/process-text",
+        json={"text": "Attention is all you need. " * 200, "source": "paper.txt", "collection_id": collection}
+    )
+    assert response.status_code == 200
+    assert response.json()["chunks_created"] == manager.count(collection) > 0
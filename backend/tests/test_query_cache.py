@@ -0,0 +1,80 @@
+import random
+from app.core.rag.query_cache import ENTRY_OVERHEAD_BYTES, QueryEmbeddingCache, SearchResultMemo
+from benchmarks.common import synthetic_text
+
+
+def index_paper(service, manager, collection: str, seed: int) -> str:
+    documents = service.document_processor.process_text(synthetic_text(random.Random(seed), 800), f"paper-{seed}.txt")
+    manager.index_documents(documents, collection_id=collection)
+    return documents[0].metadata["document_id"]
+
+
+def test_query_embeddings_are_evicted_by_size():
+    # Room for two four-float entries keyed by one-character queries
+    cache = QueryEmbeddingCache(max_bytes=2 * (1 + 4 * 4 + ENTRY_OVERHEAD_BYTES))
+    cache.put("model", "a", [0.5, 0.25, 1.0, 2.0])
+    cache.put("model", "b", [1.0, 1.0, 1.0, 1.0])
+    assert cache.get("model", "a") == [0.5, 0.25, 1.0, 2.0]
+    assert cache.get("other-model", "a") is None
+
+    cache.put("model", "c", [0.0, 0.0, 0.0, 0.0])
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") is not None
+    stats = cache.get_stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+
+    # An entry larger than the whole cache is not stored rather than emptying it
+    cache.put("model", "d" * 1000, [1.0])
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_result_memo_keys_cover_everything_that_changes_the_hits():
+    key = SearchResultMemo.make_key([0.1, 0.2], 5, {"source": "a.pdf"}, 3, "papers")
+    assert key == SearchResultMemo.make_key([0.1, 0.2], 5, {"source": "a.pdf"}, 3, "papers")
+    assert len({
+        key,
+        SearchResultMemo.make_key([0.1, 0.3], 5, {"source": "a.pdf"}, 3, "papers"),
+        SearchResultMemo.make_key([0.1, 0.2], 4, {"source": "a.pdf"}, 3, "papers"),
+        SearchResultMemo.make_key([0.1, 0.2], 5, {"source": "b.pdf"}, 3, "papers"),
+        SearchResultMemo.make_key([0.1, 0.2], 5, {"source": "a.pdf"}, 4, "papers"),
+        SearchResultMemo.make_key([0.1, 0.2], 5, {"source": "a.pdf"}, 3, "notes")
+    }) == 6
+
+    memo = SearchResultMemo(max_entries=1)
+    memo.put(key, [("chunk-1", 0.2)])
+    assert memo.get(key) == [("chunk-1", 0.2)]
+    memo.put("other", [])
+    assert memo.get(key) is None
+    assert memo.get_stats()["evictions"] == 1
+
+
+def test_repeated_search_reuses_the_embedding_and_hits(service, manager, collection, monkeypatch):
+    index_paper(service, manager, collection, 301)
+    with manager._use(collection) as handle:
+        backend = handle.backend
+        engine = manager._engine(handle.embedding_model)
+    queries = []
+    query = backend.query
+    monkeypatch.setattr(backend, "query", lambda *args: (queries.append(args[1]), query(*args))[1])
+    requests = engine.get_stats()["requests"]
+    memo_hits = manager.result_memo.get_stats()["hits"]
+
+    question = "Which layers share their attention weights?"
+    first = manager.similarity_search_with_score(question, k=50, collection_id=collection)
+    second = manager.similarity_search_with_score(question, k=50, collection_id=collection)
+    assert [(doc.id, doc.page_content, score) for doc, score in second] == [
+        (doc.id, doc.page_content, score) for doc, score in first
+    ]
+    assert engine.get_stats()["requests"] == requests + 1
+    assert queries == [50]
+    assert manager.result_memo.get_stats()["hits"] == memo_hits + 1
+
+    # A new document bumps the corpus version: the cached embedding is reused, the search runs again
+    added = index_paper(service, manager, collection, 302)
+    requests = engine.get_stats()["requests"]
+    third = manager.similarity_search_with_score(question, k=50, collection_id=collection)
+    assert engine.get_stats()["requests"] == requests
+    assert queries == [50, 50]
+    assert added in {doc.metadata["document_id"] for doc, _ in third}
@@ -0,0 +1,80 @@
+import random
+import uuid
+import pytest
+from langchain_core.runnables import RunnableLambda
+from app.config import settings
+from app.core.rag.rag_chain import is_follow_up
+from benchmarks.common import synthetic_text
+
+FIRST_QUESTION = "How does sparse attention reduce the quadratic cost of transformers?"
+STANDALONE = "Which benchmarks are used to evaluate long document summarization models?"
+
+
+@pytest.fixture
+def condensed(service, monkeypatch):
+    # Stands in for the condense call and records the questions it was asked to rewrite
+    calls = []
+
+    def condense(inputs):
+        calls.append(inputs["question"])
+        return STANDALONE
+
+    monkeypatch.setattr(service.rag_chain, "condense_chain", RunnableLambda(condense))
+    return calls
+
+
+@pytest.fixture
+def session(service):
+    session_id = f"session-{uuid.uuid4().hex}"
+    yield session_id
+    service.clear_conversation(session_id)
+
+
+@pytest.fixture
+def papers(service, manager, collection):
+    for seed in (601, 602):
+        documents = service.document_processor.process_text(synthetic_text(random.Random(seed), 800), f"paper-{seed}.txt")
+        manager.index_documents(documents, collection_id=collection)
+    return collection
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What about its memory cost?", True),
+    ("And for longer inputs?", True),
+    ("Why?", True),
+    ("How do these compare with the former approach", True),
+    ("Can you explain that in more detail please", False),
+    (STANDALONE, False),
+    ("How are positional encodings added to token embeddings in transformers?", False)
+])
+def test_follow_ups_are_recognised(question, expected):
+    assert is_follow_up(question) is expected
+
+
+def test_standalone_questions_skip_the_condense_call(service, papers, session, condensed):
+    service.query_documents(FIRST_QUESTION, session_id=session, collection_id=papers)
+    response = service.query_documents(STANDALONE, session_id=session, collection_id=papers)
+
+    assert condensed == []
+    assert "condense_ms" not in response["timings"]
+    assert [turn["question"] for turn in service.get_conversation_history(session)] == [FIRST_QUESTION, STANDALONE]
+
+
+async def test_follow_ups_are_condensed_once(service, papers, session, condensed):
+    await service.aquery_documents(FIRST_QUESTION, session_id=session, collection_id=papers)
+    assert condensed == []
+
+    response = await service.aquery_documents("What about its memory cost?", session_id=session, collection_id=papers)
+    assert condensed == ["What about its memory cost?"]
+    assert "condense_ms" in response["timings"]
+    # The answer and history keep the question as it was asked
+    assert response["question"] == "What about its memory cost?"
+    assert service.get_conversation_history(session)[-1]["question"] == "What about its memory cost?"
+
+
+@pytest.mark.parametrize("mode, calls", [("always", 1), ("never", 0)])
+async def test_condense_mode_overrides_the_check(service, papers, session, condensed, monkeypatch, mode, calls):
+    monkeypatch.setattr(settings, "CONDENSE_MODE", mode)
+    await service.aquery_documents(FIRST_QUESTION, session_id=session, collection_id=papers)
+    await service.aquery_documents(STANDALONE if mode == "always" else "And why?", session_id=session, collection_id=papers)
+    assert len(condensed) == calls
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import pytest
+from langchain_core.embeddings import Embeddings
+from app.config import settings
+from app.core.rag.backends.numpy_backend import index_root
+from app.core.rag.document_processor import chunking_version
+from benchmarks.common import synthetic_text
+
+
+class SlowEmbeddings(Embeddings):
+    # Wraps the fake embeddings so overlapping requests can be counted
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(len(texts))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+@pytest.fixture
+def rechunked(manager, monkeypatch):
+    # Documents indexed before this fixture is applied become stale
+    monkeypatch.setattr(settings, "CHUNK_SIZE", settings.CHUNK_SIZE // 2)
+    monkeypatch.setattr(manager, "chunking_version", chunking_version())
+
+
+def index_paper(service, manager, collection: str, seed: int) -> str:
+    documents = service.document_processor.process_text(synthetic_text(random.Random(seed), 800), f"paper-{seed}.txt")
+    manager.index_documents(documents, collection_id=collection)
+    return documents[0].metadata["document_id"]
+
+
+def storage_of(manager, collection: str) -> dict:
+    return manager.registry.storages()[collection]
+
+
+def document_ids(manager, collection: str) -> set:
+    return {document["document_id"] for document in manager.list_documents(collection_id=collection)["documents"]}
+
+
+def assert_consistent(manager, collection: str):
+    with manager._use(collection) as handle:
+        assert manager.count_stale_documents(handle) == 0
+    assert manager.count(collection) == manager.chunk_counts()[collection]
+
+
+async def test_reindex_rechunks_stale_documents_into_new_storage(service, manager, collection, request):
+    papers = {index_paper(service, manager, collection, seed) for seed in (101, 102, 103)}
+    before = manager.count(collection)
+    old_storage = storage_of(manager, collection)["storage"]
+    request.getfixturevalue("rechunked")
+    with manager._use(collection) as handle:
+        assert manager.count_stale_documents(handle) == 3
+
+    result = await service.areindex(collection)
+    assert result["swapped"]
+    assert result["documents"] == 3
+    assert result["documents_rechunked"] == 3
+    assert result["storage"] != old_storage
+    assert storage_of(manager, collection) == {
+        "storage": result["storage"], "embedding_model": result["embedding_model"], "building": None
+    }
+    assert manager.count(collection) > before
+    assert document_ids(manager, collection) == papers
+    assert_consistent(manager, collection)
+    # Nothing was reading the old storage, so it is dropped with the swap
+    assert not os.path.exists(os.path.join(index_root(), old_storage))
+    assert manager.registry.count(old_storage)["chunks"] == 0
+
+    again = await service.areindex(collection)
+    assert not again["swapped"]
+    assert again["message"] == "Collection is already up to date"
+    assert storage_of(manager, collection)["storage"] == result["storage"]
+
+
+async def test_writes_during_reindex_are_carried_over_by_the_swap(service, manager, collection, rechunked, monkeypatch):
+    first, second, third = (index_paper(service, manager, collection, seed) for seed in (111, 112, 113))
+    with manager._use(collection) as old:
+        pass
+    added = []
+
+    async def write_between_steps(totals):
+        added.append(await asyncio.to_thread(index_paper, service, manager, collection, 114))
+
+    swap = manager.swap_reindex_storage
+
+    def write_before_swap(live, shadow, rebuilt, force=False):
+        # Both land after the last sync step, so only the catch-up inside the swap can carry them over
+        manager.delete_documents([second], collection_id=collection)
+        added.append(index_paper(service, manager, collection, 115))
+        assert added[-1] not in rebuilt
+        return swap(live, shadow, rebuilt, force)
+
+    monkeypatch.setattr(manager, "swap_reindex_storage", write_before_swap)
+    result = await service.areindex(collection, progress=write_between_steps)
+
+    assert result["swapped"]
+    assert result["documents_removed"] == 1
+    assert old.retired
+    assert document_ids(manager, collection) == {first, third, *added}
+    assert_consistent(manager, collection)
+    hits = manager.retrieve_with_score(synthetic_text(random.Random(115), 40), k=3, collection_id=collection)
+    assert hits
+
+
+async def test_cancelled_reindex_discards_its_storage(service, manager, collection, monkeypatch):
+    # Nothing is stale, so a forced re-index rebuilds the same chunks
+    papers = {index_paper(service, manager, collection, seed) for seed in (121, 122)}
+    before = manager.count(collection)
+    storage = storage_of(manager, collection)["storage"]
+
+    synced, release = threading.Event(), threading.Event()
+    sync = manager.sync_reindex_storage
+
+    def blocking_sync(*args):
+        step = sync(*args)
+        synced.set()
+        release.wait(10)
+        return step
+
+    monkeypatch.setattr(manager, "sync_reindex_storage", blocking_sync)
+    task = asyncio.create_task(service.areindex(collection, force=True))
+    while not synced.is_set():
+        await asyncio.sleep(0.01)
+    building = storage_of(manager, collection)["building"]
+    assert building is not None
+    assert manager.registry.count(building)["chunks"] == before
+
+    task.cancel()
+    release.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert storage_of(manager, collection)["storage"] == storage
+    assert storage_of(manager, collection)["building"] is None
+    assert manager.registry.count(building)["chunks"] == 0
+    assert not os.path.exists(os.path.join(index_root(), building))
+    assert manager.count(collection) == before
+    assert document_ids(manager, collection) == papers
+
+    monkeypatch.setattr(manager, "sync_reindex_storage", sync)
+    result = await service.areindex(collection, force=True)
+    assert result["swapped"]
+    assert result["storage"] != building
+    assert manager.count(collection) == before
+
+
+async def test_embedding_model_change_reembeds_batches_concurrently(service, manager, collection, monkeypatch):
+    papers = {index_paper(service, manager, collection, seed) for seed in (131, 132, 133)}
+    before = manager.count(collection)
+    monkeypatch.setattr(manager, "embedding_model", "fake-16")
+    engine = manager._engine("fake-16")
+    monkeypatch.setattr(engine, "max_batch_size", 4)
+
+    slow = SlowEmbeddings(engine.embeddings)
+    monkeypatch.setattr(engine, "embeddings", slow)
+    with manager._use(collection) as handle:
+        assert manager.count_stale_documents(handle) == 3
+
+    result = await service.areindex(collection)
+    assert result["swapped"]
+    assert result["embedding_model"] == "fake-16"
+    assert sum(slow.batches) == before
+    # Re-index steps run on a worker thread, yet their batches still share the engine's concurrency
+    assert 1 < slow.peak <= engine.limiter.max_limit
+    assert document_ids(manager, collection) == papers
+    assert_consistent(manager, collection)
+    assert manager.retrieve_with_score("attention", k=3, collection_id=collection)
@@ -0,0 +1,80 @@
+import random
+from app.core.rag.filters import build_where
+from benchmarks.common import synthetic_pdf, synthetic_text
+
+
+def index_paper(service, manager, collection: str, seed: int) -> str:
+    documents = service.document_processor.process_text(synthetic_text(random.Random(seed), 1500), f"paper-{seed}.txt")
+    manager.index_documents(documents, collection_id=collection)
+    return documents[0].metadata["document_id"]
+
+
+async def search(client, collection: str, **body) -> list:
+    response = await client.post("/api/v1/rag/search", json={"query": "attention", "collection_id": collection, **body})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_filters_build_one_clause_per_restriction():
+    assert build_where() is None
+    assert build_where(document_ids=["a"]) == {"document_id": {"$in": ["a"]}}
+    assert build_where(sources=["a.pdf"], page_from=2, page_to=4) == {"$and": [
+        {"source": {"$in": ["a.pdf"]}},
+        {"page_end": {"$gte": 2}},
+        {"page_start": {"$lte": 4}}
+    ]}
+
+
+async def test_search_returns_k_results_from_the_requested_documents(client, service, manager, collection):
+    papers = [index_paper(service, manager, collection, seed) for seed in (401, 402, 403)]
+    assert manager.count(collection) > 6
+
+    assert len(await search(client, collection, k=6)) == 6
+    assert len(await search(client, collection, k=2)) == 2
+
+    results = await search(client, collection, k=50, filters={"document_ids": papers[:2]})
+    assert {result["metadata"]["document_id"] for result in results} == set(papers[:2])
+    results = await search(client, collection, k=50, filters={"sources": ["paper-403.txt"]})
+    assert {result["metadata"]["document_id"] for result in results} == {papers[2]}
+    assert await search(client, collection, filters={"document_ids": ["missing"]}) == []
+
+    # Other collections are not searched
+    others = await search(client, None, k=50, filters={"document_ids": papers})
+    assert others == []
+
+
+async def test_search_honours_the_page_range(client, service, manager, collection):
+    service.process_pdf_file(synthetic_pdf(6, seed=17), "pages.pdf", collection_id=collection)
+
+    results = await search(client, collection, k=50, filters={"page_from": 2, "page_to": 3})
+    assert results
+    for result in results:
+        assert result["metadata"]["page_end"] >= 2
+        assert result["metadata"]["page_start"] <= 3
+    everything = await search(client, collection, k=50)
+    assert len(everything) > len(results)
+
+
+async def test_invalid_filters_and_unknown_collections_are_rejected(client):
+    response = await client.post("/api/v1/rag/search", json={"query": "attention", "filters": {"page_from": 4, "page_to": 2}})
+    assert response.status_code == 422
+    response = await client.post("/api/v1/rag/search", json={"query": "attention", "k": 0})
+    assert response.status_code == 422
+    response = await client.post("/api/v1/rag/search", json={"query": "attention", "collection_id": "no-such-collection"})
+    assert response.status_code == 404
+
+
+async def test_query_cites_only_k_chunks_from_the_filtered_documents(client, service, manager, collection):
+    papers = [index_paper(service, manager, collection, seed) for seed in (411, 412)]
+
+    response = await client.post("/api/v1/rag/query", json={
+        "question": "How does sparse attention lower the cost?",
+        "collection_id": collection,
+        "use_conversation": False,
+        "k": 2,
+        "filters": {"document_ids": [papers[1]]}
+    })
+    assert response.status_code == 200, response.text
+    sources = response.json()["sources"]
+    assert 0 < len(sources) <= 2
+    assert {source["metadata"]["document_id"] for source in sources} == {papers[1]}
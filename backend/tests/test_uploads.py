@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import os
+import httpx
+import pytest
+from app.config import settings
+from app.core.rag.jobs import JOB_QUEUED, JOB_RUNNING
+from benchmarks.common import synthetic_pdf
+
+BOUNDARY = "test-boundary"
+
+
+def multipart_body(filename: str, data: bytes, field: str = "file") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def chunked(body: bytes, size: int = 4096):
+    # No content-length, so only the streaming checks can reject the upload
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def staged(service) -> set:
+    return set(os.listdir(service.jobs.payload_dir)) if os.path.isdir(service.jobs.payload_dir) else set()
+
+
+async def post_upload(client: httpx.AsyncClient, body):
+    return await client.post(
+        "/api/v1/rag/upload",
+        content=body,
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+
+
+async def test_upload_is_ingested_from_its_staged_payload(client, service):
+    pdf = synthetic_pdf(2)
+    response = await post_upload(client, multipart_body("paper.pdf", pdf))
+    assert response.status_code == 202
+    job = response.json()
+    assert job["document_id"] == hashlib.sha256(pdf).hexdigest()
+
+    for _ in range(500):
+        job = await service.jobs.get(job["job_id"])
+        if job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+            break
+        await asyncio.sleep(0.02)
+    assert job["status"] == "completed", job["error"]
+    assert job["result"]["chunks_created"] + job["result"]["duplicate_chunks"] > 0
+    assert not os.path.exists(job["payload_path"])
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+async def test_oversized_upload_is_rejected_with_413(client, service, monkeypatch, streamed):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 0.05)
+    before = staged(service)
+    body = multipart_body("big.pdf", synthetic_pdf(120))
+    assert len(body) > 64 * 1024 + settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+    response = await post_upload(client, chunked(body) if streamed else body)
+    assert response.status_code == 413
+    assert staged(service) == before
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+async def test_content_without_pdf_magic_bytes_is_rejected(client, service, streamed):
+    before = staged(service)
+    body = multipart_body("paper.pdf", b"<html>not a pdf</html>" * 100)
+
+    response = await post_upload(client, chunked(body, 7) if streamed else body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File is not a valid PDF"
+    assert staged(service) == before
+
+
+async def test_upload_must_be_named_pdf(client, service):
+    before = staged(service)
+    response = await post_upload(client, multipart_body("paper.txt", synthetic_pdf(1)))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Only PDF files are supported"
+    assert staged(service) == before
+
+
+async def test_upload_without_file_field_is_rejected(client, service):
+    response = await post_upload(client, multipart_body("paper.pdf", synthetic_pdf(1), field="attachment"))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing 'file' file field"
+
+
+async def test_non_multipart_request_is_rejected(client):
+    response = await client.post("/api/v1/rag/upload", content=b"%PDF-1.7", headers={"content-type": "application/pdf"})
+    assert response.status_code == 400